@@ -5,12 +5,31 @@ Handles real file uploads, creates complete packages, generates certificates
 """
 
 import os
+import sys
+import glob
 import json
-import random
-import shutil
+import math
+import threading
+import time
+import multiprocessing
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-import re
+
+from package_catalog import PackageCatalog
+from lexicon_store import LexiconStore
+from search_index import SearchIndex, TermCounter, count_terms
+from similarity_index import MIN_SIMILARITY, NEAREST, MinHashSketch, SimilarityIndex, similarity
+from blob_store import BlobStore, hash_file
+from package_writer import PackageBatch, PackageWriter
+from package_archive import PackageArchive
+from ingest_transfer import TRANSFER_MODES
+from profiling import profile_call
+from content_extractors import ExtractedTextCache
+from symbol_classifier import SymbolClassifier, head_text
+from lexeme_stream import iter_text_chunks, sample_chunks, sample_text
 
 # Directories
 BASE_DIR = Path(__file__).parent
@@ -20,6 +39,16 @@ JOURNEY = BASE_DIR / "JOURNEY"
 
 # Complete package structure
 COMPLETE_PACKAGES = INTERNAL / "complete_packages"
+STAGING = INTERNAL / "staging"
+ARCHIVE_DIR = INTERNAL / "archive"
+ARCHIVE_DB = INTERNAL / "archive.sqlite3"
+CATALOG_DB = INTERNAL / "catalog.sqlite3"
+LEXICON_DB = INTERNAL / "lexicon.sqlite3"
+SEARCH_INDEX_DIR = INTERNAL / "search_index"
+BLOBS_DIR = INTERNAL / "blobs"
+BLOBS_DB = INTERNAL / "blobs.sqlite3"
+SIMILARITY_DB = INTERNAL / "similarity.sqlite3"
+TEXT_CACHE_DIR = INTERNAL / "extracted_text"
 
 # Economic symbols
 ECONOMIC_SYMBOLS = {
@@ -42,12 +71,261 @@ ECONOMIC_SYMBOLS = {
     'general': '∰'       # System-wide default
 }
 
+# Keyword rules for every category, compiled once per process
+SYMBOL_CLASSIFIER = SymbolClassifier(ECONOMIC_SYMBOLS)
+
+# Documents per group commit in process_batch
+GROUP_COMMIT_SIZE = 32
+
+# The six stages of the journey, in order
+STAGES = ['incoming', 'processing', 'transformation', 'transition', 'verification', 'completion']
+
+# Receives stage events from processors in this process (see set_stage_listener)
+_stage_listener = None
+
+# Called with ('start' | 'end', span) around every phase (see add_span_hook)
+_span_hooks = []
+
+# Last issued document ID timestamp (microseconds), kept monotonic per process
+_last_id_us = 0
+_id_lock = threading.Lock()
+
+
+def generate_doc_id():
+    """Generate a time-sortable document ID: DOC-YYYYMMDD-HHMMSS-uuuuuu-rrrr"""
+    global _last_id_us
+
+    with _id_lock:
+        now_us = time.time_ns() // 1000
+        if now_us <= _last_id_us:
+            now_us = _last_id_us + 1
+        _last_id_us = now_us
+
+    # Random suffix separates processes that hit the same microsecond
+    stamp = datetime.fromtimestamp(now_us // 1_000_000).strftime('%Y%m%d-%H%M%S')
+    return f"DOC-{stamp}-{now_us % 1_000_000:06d}-{os.urandom(2).hex()}"
+
+# Package catalog shared by every processor in this process
+_catalog = None
+_stores_lock = threading.RLock()
+
+
+def get_catalog():
+    """Return this process's connection to the package catalog"""
+    global _catalog
+
+    with _stores_lock:
+        if _catalog is None:
+            _catalog = PackageCatalog(CATALOG_DB, COMPLETE_PACKAGES, get_package_archive())
+        return _catalog
+
+
+# Packed packages shared by every processor in this process
+_package_archive = None
+
+
+def get_package_archive():
+    """Return this process's handle on the package archive"""
+    global _package_archive
+
+    with _stores_lock:
+        if _package_archive is None:
+            _package_archive = PackageArchive(ARCHIVE_DIR, ARCHIVE_DB)
+        return _package_archive
+
+
+# Global lexicon shared by every processor in this process
+_lexicon = None
+
+
+def get_lexicon():
+    """Return this process's connection to the lexicon"""
+    global _lexicon
+
+    with _stores_lock:
+        if _lexicon is None:
+            _lexicon = LexiconStore(LEXICON_DB)
+        return _lexicon
+
+
+# Content-addressed store of originals shared by every processor in this process
+_blob_store = None
+
+
+def get_blob_store():
+    """Return this process's handle on the blob store"""
+    global _blob_store
+
+    with _stores_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore(BLOBS_DIR, BLOBS_DB)
+        return _blob_store
+
+
+# Package writer shared by every processor in this process
+_package_writer = None
+
+
+def get_package_writer():
+    """Return this process's package writer"""
+    global _package_writer
+
+    with _stores_lock:
+        if _package_writer is None:
+            _package_writer = PackageWriter(COMPLETE_PACKAGES, STAGING)
+        return _package_writer
+
+
+# Full-text search index shared by every processor in this process
+_search_index = None
+
+
+def get_search_index():
+    """Return this process's handle on the search index"""
+    global _search_index
+
+    with _stores_lock:
+        if _search_index is None:
+            _search_index = SearchIndex(SEARCH_INDEX_DIR)
+        return _search_index
+
+
+# MinHash/LSH index of document text shared by every processor in this process
+_similarity_index = None
+
+
+def get_similarity_index():
+    """Return this process's connection to the similarity index"""
+    global _similarity_index
+
+    with _stores_lock:
+        if _similarity_index is None:
+            _similarity_index = SimilarityIndex(SIMILARITY_DB)
+        return _similarity_index
+
+
+# Text extracted from originals, keyed by content hash
+_text_cache = None
+
+
+def get_text_cache():
+    """Return this process's extracted text cache"""
+    global _text_cache
+
+    with _stores_lock:
+        if _text_cache is None:
+            _text_cache = ExtractedTextCache(TEXT_CACHE_DIR)
+        return _text_cache
+
+
+def document_text(original_path, name=None, digest=None):
+    """Text contents of an original, in chunks (nothing for unsupported types)
+
+    name gives the file type when the path does not (a blob, for example).
+    Extracted text is cached by digest (computed when needed and not given).
+    """
+    try:
+        text_path = get_text_cache().text_path(original_path, digest, name)
+        if text_path is not None:
+            yield from iter_text_chunks(text_path)
+    except OSError:
+        pass
+
+
+def original_texts(original_path, name=None, digest=None):
+    """Searchable text of an original: its name, plus its contents"""
+    yield (name or Path(original_path).name).replace('_', ' ')
+    yield from document_text(original_path, name, digest)
+
+
+def package_original(doc_id):
+    """(path, name) of a package's original, from its directory or the archive"""
+    package_dir = COMPLETE_PACKAGES / doc_id
+    if package_dir.is_dir():
+        for path in sorted(package_dir.iterdir()):
+            if not path.name.startswith(doc_id):
+                return path, path.name
+        return None, None
+
+    entry = get_package_archive().find(doc_id)
+    if entry is None:
+        return None, None
+    return get_blob_store().path(entry['sha256']), entry['name']
+
+
+def package_artifact(doc_id, suffix):
+    """Bytes of a generated artifact (e.g. '_ADVENTURE.md'), or None"""
+    try:
+        return (COMPLETE_PACKAGES / doc_id / f"{doc_id}{suffix}").read_bytes()
+    except FileNotFoundError:
+        pass
+    archive = get_package_archive()
+    entry = archive.find(doc_id, suffix)
+    return archive.read(entry) if entry else None
+
+
+def package_texts(doc_id):
+    """Searchable text of a finished package: original, ADVENTURE and LEARNING"""
+    path, name = package_original(doc_id)
+    if path is not None:
+        yield from original_texts(path, name)
+    for suffix in ('_ADVENTURE.md', '_LEARNING.md'):
+        data = package_artifact(doc_id, suffix)
+        if data is not None:
+            yield data.decode('utf-8', errors='ignore')
+
+
+def set_stage_listener(listener):
+    """Send stage events from every processor in this process to listener(event)"""
+    global _stage_listener
+    _stage_listener = listener
+
+
+def add_span_hook(hook):
+    """Call hook(event, span) when any processor in this process starts or ends a phase
+
+    event is 'start' or 'end'; span holds name, doc_id, filename, size,
+    type, start (epoch seconds), pid and tid, plus duration once ended.
+    """
+    _span_hooks.append(hook)
+
+
+def remove_span_hook(hook):
+    """Stop calling a hook added with add_span_hook"""
+    if hook in _span_hooks:
+        _span_hooks.remove(hook)
+
+
+def init_worker(events=None, quiet=False):
+    """Process pool initializer: forward stage events to a multiprocessing queue
+
+    With quiet, the worker's progress prints are discarded.
+    """
+    if events is not None:
+        set_stage_listener(events.put)
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+
+def determine_economic_symbol(filename, path=None, text=None):
+    """Determine economic symbol from file name, folder and (optionally) content"""
+    return SYMBOL_CLASSIFIER.classify(filename, path, text)
+
+
+def determine_economic_symbols(filenames, paths=None):
+    """Economic symbols for a whole listing of file names in one pass"""
+    return SYMBOL_CLASSIFIER.classify_many(filenames, paths)
+
 
 class DocumentProcessor:
     """Advanced document processor with learning capabilities"""
 
     def __init__(self):
         self.learned_words = []
+        self.timings = {}  # phase -> seconds, for the document being processed
+        self.spans = []  # Finished spans of the document being processed
+        self.span_context = {}  # doc_id, filename, size and type attached to each span
+        self.restore_original = None  # Gives a moved source back until its package is published
         self.create_directories()
 
     def create_directories(self):
@@ -55,125 +333,276 @@ class DocumentProcessor:
         for dir_path in [EXTERNAL, INTERNAL, COMPLETE_PACKAGES, JOURNEY]:
             dir_path.mkdir(parents=True, exist_ok=True)
 
-    def determine_economic_symbol(self, filename):
-        """Determine economic symbol based on file type"""
-        ext = Path(filename).suffix.lower().lstrip('.')
-
-        # Check extension mapping
-        if ext in ECONOMIC_SYMBOLS:
-            return ECONOMIC_SYMBOLS[ext]
-
-        # Check filename patterns
-        filename_lower = filename.lower()
-        for keyword, symbol in ECONOMIC_SYMBOLS.items():
-            if keyword in filename_lower:
-                return symbol
-
-        # Default
-        return ECONOMIC_SYMBOLS['general']
-
-    def extract_random_word(self, text, stage_name):
-        """Extract a random meaningful word from text"""
-        # Remove special characters and split into words
-        words = re.findall(r'\b[a-zA-Z]{4,}\b', text)
-
-        # Filter out common words
-        common_words = {'this', 'that', 'with', 'from', 'have', 'been', 'were',
-                       'their', 'there', 'about', 'would', 'could', 'should'}
-        meaningful_words = [w for w in words if w.lower() not in common_words]
-
-        if meaningful_words:
-            word = random.choice(meaningful_words)
-            self.learned_words.append({
-                'word': word,
-                'stage': stage_name,
+    def determine_economic_symbol(self, filename, path=None, text=None):
+        """Determine economic symbol from file name, folder and content"""
+        return determine_economic_symbol(filename, path, text)
+
+    def create_package_dir(self):
+        """Claim a new doc_id and return its StagedPackage"""
+        while True:
+            try:
+                return get_package_writer().stage(generate_doc_id())
+            except FileExistsError:
+                continue
+
+    @contextmanager
+    def phase(self, name):
+        """Time one phase of process_document into self.timings and a span"""
+        span = dict(self.span_context, name=name, start=time.time(),
+                    pid=os.getpid(), tid=threading.get_ident())
+        self.emit_span('start', span)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            span['duration'] = elapsed
+            self.spans.append(span)
+            self.emit_span('end', span)
+
+    def emit_span(self, event, span):
+        """Pass a span to every span hook"""
+        for hook in _span_hooks:
+            try:
+                hook(event, span)
+            except Exception:
+                pass  # Tracing never fails a document
+
+    def report_stage(self, doc_id, filename, stage):
+        """Tell the stage listener that a document reached a stage"""
+        if _stage_listener is None:
+            return
+
+        step = STAGES.index(stage) + 1
+        try:
+            _stage_listener({
+                'type': 'stage',
+                'doc_id': doc_id,
+                'filename': filename,
+                'stage': stage,
+                'step': step,
+                'of': len(STAGES),
+                'progress': round(step * 100 / len(STAGES)),
                 'timestamp': datetime.now().isoformat()
             })
-            return word
-        return None
+        except Exception:
+            pass  # Progress reporting never fails a document
 
-    def process_document(self, source_path):
-        """Process a document through all stages"""
+    def extract_random_word(self, text, stage_name):
+        """Extract a random meaningful word from text"""
+        return self.learn_word(sample_text(text)[0], stage_name)
+
+    def sample_lexemes(self, source_path, stages, digest=None, tap=None):
+        """Pick one lexeme per stage from a document's text in a single streaming pass
+
+        tap wraps the stream of chunks, letting other readers share the pass.
+        """
+        chunks = document_text(source_path, digest=digest)
+        lexemes = sample_chunks(tap(chunks) if tap else chunks, len(stages))
+        if lexemes[0] is None:
+            return sample_text(source_path.name, len(stages))  # Use filename if no text
+        return lexemes
+
+    def learn_word(self, word, stage_name):
+        """Record a learned word for a stage"""
+        if word is None:
+            return None
+        self.learned_words.append({
+            'word': word,
+            'stage': stage_name,
+            'timestamp': datetime.now().isoformat()
+        })
+        return word
+
+    def process_document(self, source_path, transfer='copy', skip_duplicates=False, batch=None):
+        """Process a document through all stages
+
+        transfer decides how the original enters the blob store: 'copy'
+        keeps the source and stores an independent copy ('link' is an
+        alias of it), 'move' renames it in (and removes it from incoming).
+        With skip_duplicates, bytes that were ingested before are not
+        processed again.
+
+        The package is built in a staging directory and appears in
+        COMPLETE_PACKAGES in one rename. With a DocumentBatch it is
+        published at the batch's commit instead of immediately.
+        """
         source_path = Path(source_path)
 
         if not source_path.exists():
             return {'success': False, 'error': 'File not found'}
 
-        # Generate IDs
-        doc_id = f"DOC-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        # Identify the content before doing any work on it
+        self.timings = {}
+        self.spans = []
+        self.restore_original = None
+        self.span_context = {'doc_id': None, 'filename': source_path.name,
+                             'size': source_path.stat().st_size,
+                             'type': source_path.suffix.lower().lstrip('.') or 'none'}
+        blobs = get_blob_store()
+        with self.phase('hash'):
+            digest = hash_file(source_path)
+        if skip_duplicates:
+            known = blobs.lookup(digest)
+            first_doc = known['first_doc'] if known else None
+            if first_doc is None and batch is not None:
+                first_doc = batch.digests.get(digest)  # Queued earlier in this group
+            if first_doc:
+                print(f"♻️ Duplicate of {first_doc} - {source_path.name}")
+                return self.duplicate_result(source_path, digest, first_doc)
+
+        # Generate IDs and claim a staging directory nobody else owns
+        staged = self.create_package_dir()
+        self.span_context['doc_id'] = staged.doc_id
+        try:
+            return self.build_package(staged, source_path, digest, transfer, batch)
+        except BaseException:
+            get_package_writer().discard(staged)
+            self.give_back_original(source_path)
+            raise
+
+    def give_back_original(self, source_path):
+        """Put a moved source back in place after a failure, so it is not lost"""
+        restore, self.restore_original = self.restore_original, None
+        if restore is None:
+            return
+        try:
+            restore()
+            print(f"↩️ Returned {source_path.name} to {source_path.parent}")
+        except OSError as e:
+            print(f"⚠️ Could not return {source_path.name}: {e}")
+
+    def build_package(self, staged, source_path, digest, transfer, batch):
+        """Run the stages and write every artifact into a staged package"""
+        blobs = get_blob_store()
+        doc_id, package_dir = staged.doc_id, staged.final_path
         journey_id = f"JOURNEY-{datetime.now().strftime('%Y%m%d')}-{os.urandom(4).hex()}"
 
-        # Determine economic symbol
-        symbol = self.determine_economic_symbol(source_path.name)
-
-        # Create complete package directory
-        package_dir = COMPLETE_PACKAGES / doc_id
-        package_dir.mkdir(parents=True, exist_ok=True)
-
-        # Read file content for learning
-        try:
-            if source_path.suffix in ['.txt', '.md', '.py', '.js']:
-                with open(source_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-            else:
-                content = source_path.name  # Use filename if can't read
-        except:
-            content = source_path.name
+        # Extract the text of non-text types once; later stages read the cache
+        with self.phase('extract_text'):
+            get_text_cache().text_path(source_path, digest)
+
+        # One pass over the text samples the lexemes for both learning stages,
+        # counts search terms and builds the MinHash sketch
+        with self.phase('lexemes'):
+            counter = TermCounter()
+            counter.update(source_path.name.replace('_', ' '))
+            sketch = MinHashSketch()
+            lexemes = self.sample_lexemes(source_path, ['processing', 'transformation'], digest,
+                                          tap=lambda chunks: counter.tap(sketch.tap(chunks)))
+            terms, length = counter.result()
+            signature = sketch.signature()
+
+        # Determine economic symbol from the name, its folder and the start of the text
+        with self.phase('classify'):
+            symbol = self.determine_economic_symbol(
+                source_path.name, source_path.parent.name,
+                head_text(document_text(source_path, digest=digest)))
 
         # Stage 1: Incoming
         print(f"📬 Stage 1: Incoming - {source_path.name}")
+        self.report_stage(doc_id, source_path.name, 'incoming')
 
         # Stage 2: Processing
         print(f"⚙️ Stage 2: Processing...")
-        word1 = self.extract_random_word(content, 'processing')
+        self.report_stage(doc_id, source_path.name, 'processing')
+        word1 = self.learn_word(lexemes[0], 'processing')
         if word1:
             print(f"🧠 Learned: '{word1}'")
 
         # Stage 3: Transformation
         print(f"✨ Stage 3: Transformation...")
-        word2 = self.extract_random_word(content, 'transformation')
+        self.report_stage(doc_id, source_path.name, 'transformation')
+        word2 = self.learn_word(lexemes[1], 'transformation')
         if word2:
             print(f"🧠 Learned: '{word2}'")
 
         # Stage 4: Transition
         print(f"🌉 Stage 4: Transition...")
+        self.report_stage(doc_id, source_path.name, 'transition')
 
         # Stage 5: Verification
         print(f"✓ Stage 5: Verification...")
+        self.report_stage(doc_id, source_path.name, 'verification')
 
         # Create complete package
         print(f"📦 Creating complete package...")
 
-        # 1. Copy original document
-        shutil.copy2(source_path, package_dir / source_path.name)
-        print(f"  ✓ Original: {source_path.name}")
+        # 1. Store the original once by content and reference it from the package
+        original_path = staged.add(source_path.name)
+        with self.phase('store_original'):
+            mode = source_path.stat().st_mode & 0o7777
+            blob, method = blobs.put(source_path, digest, transfer)
+            if transfer == 'move':
+                self.restore_original = partial(blobs.restore, blob, source_path, mode)
+            blobs.link_into(blob, original_path)
+        print(f"  ✓ Original: {source_path.name} ({method}, sha256 {digest[:12]})")
+
+        with self.phase('similar'):
+            similar = get_similarity_index().nearest(signature) if signature else []
+            if signature and batch is not None:
+                similar = sorted(similar + batch.nearest(signature),
+                                 key=lambda m: (-m['similarity'], m['doc_id']))[:NEAREST]
+        for match in similar:
+            print(f"  ≈ Similar to {match['doc_id']} ({match['similarity']:.0%})")
 
         # 2. Create adventure chronicle
-        adventure = self.create_adventure(source_path.name, journey_id, symbol, content)
-        with open(package_dir / f"{doc_id}_ADVENTURE.md", 'w') as f:
-            f.write(adventure)
+        with self.phase('write_adventure'):
+            adventure = self.create_adventure(source_path.name, journey_id, symbol, source_path.name)
+            staged.write(f"{doc_id}_ADVENTURE.md", adventure)
         print(f"  ✓ Adventure: {doc_id}_ADVENTURE.md")
 
         # 3. Create journey metadata
-        metadata = self.create_metadata(source_path, doc_id, journey_id, symbol)
-        with open(package_dir / f"{doc_id}_METADATA.json", 'w') as f:
-            json.dump(metadata, f, indent=2)
+        with self.phase('create_metadata'):
+            metadata = self.create_metadata(original_path, doc_id, journey_id, symbol)
+            metadata['sha256'] = digest
+            metadata['similar'] = similar
+        with self.phase('write_metadata'):
+            staged.write(f"{doc_id}_METADATA.json", json.dumps(metadata, indent=2))
         print(f"  ✓ Metadata: {doc_id}_METADATA.json")
 
-        # 4. Create learning report
-        learning_report = self.create_learning_report(source_path.name)
-        with open(package_dir / f"{doc_id}_LEARNING.md", 'w') as f:
-            f.write(learning_report)
+        # 4. Report on this document's words (the lexicon records them once published)
+        recent_words = self.learned_words[-2:] if len(self.learned_words) >= 2 else self.learned_words
+        with self.phase('write_learning'):
+            learning_report = self.create_learning_report(
+                source_path.name, get_lexicon().vocabulary_size(recent_words))
+            staged.write(f"{doc_id}_LEARNING.md", learning_report)
         print(f"  ✓ Learning: {doc_id}_LEARNING.md")
 
         # 5. Generate certificate
-        certificate = self.generate_certificate(source_path.name, doc_id, symbol)
-        with open(package_dir / f"{doc_id}_CERTIFICATE.md", 'w') as f:
-            f.write(certificate)
+        with self.phase('write_certificate'):
+            certificate = self.generate_certificate(source_path.name, doc_id, symbol)
+            staged.write(f"{doc_id}_CERTIFICATE.md", certificate)
         print(f"  ✓ Certificate: {doc_id}_CERTIFICATE.md")
 
-        print(f"\n✅ Complete package created: {package_dir}")
-        print(f"📍 Location: portofentry_internal/complete_packages/{doc_id}/")
+        artifact_terms, artifact_length = count_terms([adventure, learning_report])
+        terms.update(artifact_terms)
+
+        def register():
+            # 6. Once published: search index, similarity index, blob and completion
+            with self.phase('register'):
+                blobs.record(digest, metadata['file_size'], doc_id)
+                get_search_index().add_counts(doc_id, terms, length + artifact_length)
+                if signature:
+                    get_similarity_index().add(doc_id, signature)
+            self.report_stage(doc_id, source_path.name, 'completion')
+
+        if batch is None:
+            with self.phase('publish'):
+                get_package_writer().publish(staged)
+                self.restore_original = None  # The package owns the original now
+                get_catalog().add(metadata)
+            with self.phase('lexicon'):
+                get_lexicon().record(doc_id, recent_words)
+            register()
+            print(f"\n✅ Complete package created: {package_dir}")
+            print(f"📍 Location: portofentry_internal/complete_packages/{doc_id}/")
+        else:
+            batch.add(staged, metadata, register, self.restore_original)
+            batch.remember(doc_id, digest, signature, recent_words)
+            self.restore_original = None  # The batch gives it back if the group is discarded
+            print(f"\n📦 Package staged for group commit: {doc_id}")
 
         return {
             'success': True,
@@ -181,9 +610,30 @@ class DocumentProcessor:
             'journey_id': journey_id,
             'symbol': symbol,
             'package_dir': str(package_dir),
+            'sha256': digest,
+            'similar': similar,
+            'file_size': metadata['file_size'],
+            'timings': self.timings,  # Filled in further by register() after a group commit
+            'spans': self.spans,
             'learned_words': self.learned_words[-2:] if len(self.learned_words) >= 2 else self.learned_words
         }
 
+    def duplicate_result(self, source_path, digest, doc_id):
+        """Result for a document whose bytes are already in a package"""
+        return {
+            'success': True,
+            'duplicate': True,
+            'duplicate_of': doc_id,
+            'doc_id': doc_id,
+            'journey_id': None,
+            'symbol': self.determine_economic_symbol(source_path.name),
+            'package_dir': str(COMPLETE_PACKAGES / doc_id),
+            'sha256': digest,
+            'timings': self.timings,
+            'spans': self.spans,
+            'learned_words': []
+        }
+
     def create_adventure(self, filename, journey_id, symbol, content):
         """Create adventure chronicle"""
         return f"""# The Adventure of {filename}
@@ -299,8 +749,11 @@ Knowledge has been extracted, learned, and integrated.
             'package_location': f'portofentry_internal/complete_packages/{doc_id}/'
         }
 
-    def create_learning_report(self, filename):
+    def create_learning_report(self, filename, vocabulary_size=None):
         """Create learning report with lexemes"""
+        if vocabulary_size is None:
+            vocabulary_size = len(self.learned_words)
+
         report = f"""# Learning Analysis Report
 **Document:** {filename}
 **Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -331,7 +784,7 @@ and expanded its understanding of the domain.
 
 ## Total Vocabulary Expansion
 
-The entity has now learned **{len(self.learned_words)}** unique lexemes across all processed documents.
+The entity has now learned **{vocabulary_size}** unique lexemes across all processed documents.
 
 ## Knowledge Integration
 
@@ -408,18 +861,264 @@ STATUS: Active and integrated
 """
 
 
+def process_path(source_path, transfer='copy', skip_duplicates=False, profile=False):
+    """Process one document with a fresh processor (process pool entry point)
+
+    With profile, the work runs under cProfile and the raw statistics are
+    returned in result['profile'].
+    """
+    processor = DocumentProcessor()
+    if not profile:
+        return processor.process_document(source_path, transfer, skip_duplicates)
+    result, stats = profile_call(processor.process_document, source_path, transfer, skip_duplicates)
+    result['profile'] = stats
+    return result
+
+
+def process_group(paths, transfer='copy', skip_duplicates=False):
+    """Process several documents and publish their packages in one group commit
+
+    Returns [(path, result)]. Results are returned only after the commit,
+    so a reported package is durable.
+    """
+    results = []
+    with DocumentBatch(get_package_writer(), get_catalog(), get_lexicon()) as batch:
+        for path in paths:
+            try:
+                result = DocumentProcessor().process_document(path, transfer,
+                                                              skip_duplicates, batch)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            results.append((str(path), result))
+
+        # Every document of the group waited for the same commit
+        started = time.perf_counter()
+        batch.commit()
+        elapsed = time.perf_counter() - started
+        for _, result in results:
+            if 'timings' in result:
+                result['timings']['publish'] = elapsed
+    return results
+
+
+class DocumentBatch(PackageBatch):
+    """A group commit that also knows the content of the documents queued in it
+
+    Blobs and signatures are registered only when the group is published,
+    so duplicates and near-duplicates inside one group are found here.
+    Learned words go to the lexicon in one transaction after the commit.
+    """
+
+    def __init__(self, writer, catalog=None, lexicon=None):
+        super().__init__(writer, catalog)
+        self.lexicon = lexicon
+        self.digests = {}  # sha256 -> first doc_id queued with it
+        self.signatures = {}  # doc_id -> MinHash signature
+        self.words = []  # (doc_id, learned_words) for LexiconStore.record_many
+
+    def remember(self, doc_id, digest, signature, learned_words=()):
+        """Note a queued document's content and learned words"""
+        self.digests.setdefault(digest, doc_id)
+        if signature:
+            self.signatures[doc_id] = signature
+        self.words.append((doc_id, list(learned_words)))
+
+    def nearest(self, signature, limit=NEAREST, min_similarity=MIN_SIMILARITY):
+        """Most similar queued documents: [{'doc_id', 'similarity'}]"""
+        matches = []
+        for doc_id, other in self.signatures.items():
+            score = similarity(signature, other)
+            if score >= min_similarity:
+                matches.append({'doc_id': doc_id, 'similarity': round(score, 3)})
+        matches.sort(key=lambda m: (-m['similarity'], m['doc_id']))
+        return matches[:limit]
+
+    def commit(self):
+        published = super().commit()
+        words, self.words = self.words, []
+        if self.lexicon is not None:
+            self.lexicon.record_many(words)
+        self.digests.clear()
+        self.signatures.clear()
+        return published
+
+    def discard(self):
+        super().discard()
+        self.words = []
+        self.digests.clear()
+        self.signatures.clear()
+
+
+def create_process_pool(workers=None, events=None, quiet=False):
+    """Create a process pool for document processing
+
+    With events (a spawn-context multiprocessing queue), stage events from
+    the workers are put on that queue; with quiet, workers print nothing.
+    """
+    # spawn keeps workers independent of the parent's threads and locks
+    options = {}
+    if events is not None or quiet:
+        options = {'initializer': init_worker, 'initargs': (events, quiet)}
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context('spawn'),
+                               **options)
+
+
+def batch_groups(paths, workers, group_size=GROUP_COMMIT_SIZE):
+    """Split paths into group commits small enough that every worker gets one"""
+    size = max(1, min(group_size, math.ceil(len(paths) / max(1, workers))))
+    return [paths[i:i + size] for i in range(0, len(paths), size)]
+
+
+def process_batch(paths, workers=None, transfer='copy', skip_duplicates=False,
+                  group_size=GROUP_COMMIT_SIZE, quiet=False):
+    """Process documents across worker processes, yielding (path, result) as each finishes
+
+    Each worker task is one group commit of up to group_size documents
+    (see process_group), paying for durability once per group. Small
+    batches use smaller groups, so every worker has documents to process
+    and results arrive as each group finishes.
+    """
+    paths = [str(path) for path in paths]
+    workers = workers or os.cpu_count() or 1
+    groups = batch_groups(paths, workers, group_size)
+
+    with create_process_pool(workers, quiet=quiet) as pool:
+        futures = {pool.submit(process_group, group, transfer, skip_duplicates): group
+                   for group in groups}
+
+        for future in as_completed(futures):
+            try:
+                yield from future.result()
+            except Exception as e:
+                for path in futures[future]:
+                    yield path, {'success': False, 'error': str(e)}
+
+
+def expand_inputs(inputs):
+    """Files named by paths, directories (recursively) and glob patterns, sorted and unique"""
+    files = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_file():
+            files.add(path)
+        elif path.is_dir():
+            files.update(p for p in path.rglob('*')
+                         if p.is_file() and not any(part.startswith('.') for part in p.relative_to(path).parts))
+        else:
+            files.update(Path(match) for match in glob.glob(item, recursive=True)
+                         if os.path.isfile(match))
+    return sorted(files)
+
+
+class BatchCheckpoint:
+    """Append-only record of documents a batch run has already packaged
+
+    One line per document: size, mtime (ns) and path, tab separated. A
+    file that changes after being packaged no longer matches, so it is
+    processed again; failed documents are not recorded and are retried.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.done = set()
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                self.done = {line.rstrip('\n') for line in f if line.strip()}
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def key(path):
+        stat = os.stat(path)
+        return f"{stat.st_size}\t{stat.st_mtime_ns}\t{os.path.abspath(path)}"
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def record(self, key):
+        self.file.write(key + '\n')
+        self.file.flush()  # A killed run resumes from the last finished document
+        self.done.add(key)
+
+    def close(self):
+        self.file.close()
+
+
+def run_batch(args):
+    """Process many documents and write one NDJSON line per document; returns error count"""
+    paths = expand_inputs(args.paths)
+    missing = [item for item in args.paths
+               if not os.path.exists(item) and not glob.glob(item, recursive=True)]
+    for item in missing:
+        print(f"No such file, directory or match: {item}", file=sys.stderr)
+    checkpoint = BatchCheckpoint(args.checkpoint) if args.checkpoint else None
+    keys = {}
+    pending = []
+    for path in paths:
+        try:
+            key = BatchCheckpoint.key(path)
+        except OSError:
+            continue  # Gone since it was listed
+        if checkpoint is not None and key in checkpoint:
+            continue
+        keys[str(path)] = key
+        pending.append(path)
+    if args.limit:
+        pending = pending[:args.limit]
+
+    print(f"{len(paths)} files, {len(paths) - len(keys)} already done, "
+          f"{len(pending)} to process", file=sys.stderr)
+    failures = duplicates = 0
+    started = time.perf_counter()
+    try:
+        for path, result in process_batch(pending, args.workers, args.transfer,
+                                          args.skip_duplicates, quiet=True):
+            result.pop('spans', None)
+            sys.stdout.write(json.dumps({'path': path, **result}, default=str) + '\n')
+            sys.stdout.flush()
+            if result.get('success'):
+                duplicates += bool(result.get('duplicate'))
+                if checkpoint is not None:
+                    checkpoint.record(keys[path])
+            else:
+                failures += 1
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    print(f"{len(pending) - failures - duplicates} packaged, {duplicates} duplicates skipped, "
+          f"{failures} failed in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return failures + len(missing)
+
+
 def main():
     """Main entry point"""
-    import sys
-
-    if len(sys.argv) < 2:
-        print("Usage: python3 advanced_processor.py <file_path>")
-        print("\nExample:")
-        print("  python3 advanced_processor.py document.pdf")
-        sys.exit(1)
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Process documents into complete packages",
+        epilog="One file prints a summary; several files, directories or globs "
+               "(or any batch option) print one NDJSON line per document.")
+    parser.add_argument('paths', nargs='+', help="files, directories or glob patterns")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--transfer', choices=TRANSFER_MODES, default='copy',
+                        help="how originals enter their packages ('link' is an alias of 'copy')")
+    parser.add_argument('--skip-duplicates', action='store_true',
+                        help="do not package content that is already stored")
+    parser.add_argument('--checkpoint', help="resume file: packaged documents are recorded "
+                                             "here and skipped on the next run")
+    parser.add_argument('--limit', type=int, default=0,
+                        help="process at most this many new documents")
+    parser.add_argument('--ndjson', action='store_true',
+                        help="NDJSON output even for a single file")
+    args = parser.parse_args()
+
+    batch_options = args.workers or args.checkpoint or args.limit or args.ndjson
+    if len(args.paths) > 1 or not Path(args.paths[0]).is_file() or batch_options:
+        sys.exit(1 if run_batch(args) else 0)
 
     processor = DocumentProcessor()
-    result = processor.process_document(sys.argv[1])
+    result = processor.process_document(args.paths[0], args.transfer, args.skip_duplicates)
 
     if result['success']:
         print("\n" + "="*60)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Artifact Cache
+Byte-budgeted LRU of ready-to-send package artifact responses
+"""
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_BUDGET = 64 * 1024 * 1024
+ENTRY_FRACTION = 8  # No single body may take more than this share of the budget
+
+
+class ArtifactCache:
+    """Serialized response bodies by key, each stamped with the version it was built from
+
+    A lookup only hits when the caller's version (e.g. the file's mtime)
+    still matches, so a rewritten or repacked artifact is rebuilt rather
+    than served stale; the outdated body is dropped on that miss. Least
+    recently used bodies are evicted once their total size passes the
+    budget. One lock guards everything and is never held during I/O.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET):
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entry = self.max_bytes // ENTRY_FRACTION
+        self.entries = OrderedDict()  # key -> (version, body)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        """The body cached for key at version, or None"""
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            if cached is not None:
+                self.discard(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, version, body):
+        """Cache body for key at version, evicting the least recently used as needed"""
+        size = len(body)
+        if size > self.max_entry:
+            return False
+        with self.lock:
+            if key in self.entries:
+                self.discard(key)
+            self.entries[key] = (version, body)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+        return True
+
+    def discard(self, key):
+        """Drop one entry (lock held)"""
+        _, body = self.entries.pop(key)
+        self.bytes -= len(body)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Size, budget and hit counts"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
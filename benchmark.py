@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Benchmark
+Synthetic corpora driven through DocumentProcessor and the HTTP API, reported as JSON
+
+Every run works in a scratch directory: the corpus is generated there and
+the application modules are copied next to it, so packages, blobs and
+indexes never touch the real portofentry_internal.
+
+    python3 benchmark.py --docs 200 --types txt=40,md=20,pdf=25,xlsx=15 \\
+        --sizes 1KB=50,32KB=35,1MB=14,16MB=1 --mode all --output bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from symbol_classifier import CATEGORY_KEYWORDS
+
+BASE_DIR = Path(__file__).parent
+
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+DEFAULT_TYPES = 'txt=40,md=20,pdf=25,xlsx=15'
+DEFAULT_SIZES = '1KB=50,32KB=35,1MB=14,16MB=1'
+
+BLOCK_CHARS = 64 * 1024
+BLOCK_POOL = 16  # Distinct text blocks per corpus; large files cycle through them
+FILLER_WORDS = ('market', 'export', 'growth', 'labour', 'capital', 'yield', 'harbour',
+                'vessel', 'cargo', 'customs', 'manifest', 'journey', 'passage', 'quarter',
+                'report', 'review', 'summary', 'analysis', 'figure', 'appendix')
+
+READ_ENDPOINTS = ('/api/documents', '/api/complete?limit=50', '/api/stats',
+                  '/api/package/{doc_id}/metadata', '/api/search?q={word}', '/api/metrics')
+
+
+def parse_size(text):
+    """'64KB' -> 65536"""
+    text = text.strip().upper()
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * SIZE_UNITS[unit])
+    return int(text)
+
+
+def parse_mix(text, parse=str):
+    """'a=3,b=1' -> [(a, 3.0), (b, 1.0)]"""
+    mix = []
+    for part in text.split(','):
+        value, _, weight = part.partition('=')
+        mix.append((parse(value.strip()), float(weight or 1)))
+    return mix
+
+
+def percentile(values, q):
+    """q-th percentile by linear interpolation (values sorted)"""
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def latency_summary(seconds):
+    """Count, mean and p50/p95/p99/max in milliseconds"""
+    values = sorted(seconds)
+    if not values:
+        return {'count': 0}
+    summary = {'count': len(values), 'mean_ms': round(sum(values) / len(values) * 1000, 3)}
+    for q in (50, 95, 99):
+        summary[f'p{q}_ms'] = round(percentile(values, q) * 1000, 3)
+    summary['max_ms'] = round(values[-1] * 1000, 3)
+    return summary
+
+
+# Corpus
+
+class CorpusGenerator:
+    """Deterministic synthetic documents: the same seed gives the same corpus"""
+
+    def __init__(self, directory, seed=1):
+        self.directory = Path(directory)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.vocabulary = sorted({word for words in CATEGORY_KEYWORDS.values() for word in words}
+                                 | set(CATEGORY_KEYWORDS) | set(FILLER_WORDS))
+        self.blocks = [self.text_block(random.Random(seed * 1000 + i)) for i in range(BLOCK_POOL)]
+
+    def text_block(self, rng, chars=BLOCK_CHARS):
+        """About chars characters of words in short lines"""
+        words = []
+        length = 0
+        while length < chars:
+            line = ' '.join(rng.choice(self.vocabulary) for _ in range(rng.randint(6, 14)))
+            words.append(line)
+            length += len(line) + 1
+        return '\n'.join(words) + '\n'
+
+    def text(self, rng, size):
+        """Yield text chunks adding up to size bytes"""
+        while size > 0:
+            chunk = rng.choice(self.blocks)[:size]
+            size -= len(chunk)
+            yield chunk
+
+    def write_text(self, path, size, rng):
+        with open(path, 'w') as f:
+            for chunk in self.text(rng, size):
+                f.write(chunk)
+
+    def write_md(self, path, size, rng):
+        with open(path, 'w') as f:
+            f.write(f"# {rng.choice(self.vocabulary).title()} notes\n\n")
+            for chunk in self.text(rng, max(0, size - f.tell())):
+                f.write(chunk)
+
+    def write_pdf(self, path, size, rng):
+        """A PDF of Flate content streams showing lines of text, until size is reached"""
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.4\n')
+            number = 1
+            while True:
+                lines = self.text_block(rng, min(BLOCK_CHARS, max(256, size))).splitlines()
+                content = 'BT /F1 10 Tf 72 720 Td\n' + ''.join(
+                    f"({line}) Tj T*\n" for line in lines) + 'ET\n'
+                stream = zlib.compress(content.encode('latin-1'))
+                f.write(f"{number} 0 obj\n<< /Length {len(stream)} /Filter /FlateDecode >>\n"
+                        f"stream\n".encode('ascii'))
+                f.write(stream)
+                f.write(b'\nendstream\nendobj\n')
+                number += 1
+                if f.tell() >= size:
+                    break
+            f.write(b'trailer\n<< >>\n%%EOF\n')
+
+    def write_xlsx(self, path, size, rng):
+        """A workbook of one sheet whose compressed size reaches size"""
+        strings = self.vocabulary
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            archive.writestr('xl/sharedStrings.xml',
+                             '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                             + ''.join(f'<si><t>{word}</t></si>' for word in strings) + '</sst>')
+            with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+                sheet.write(b'<worksheet xmlns="http://schemas.openxmlformats.org/'
+                            b'spreadsheetml/2006/main"><sheetData>')
+                row = 1
+                while archive.fp.tell() < size:
+                    rows = []
+                    for _ in range(500):
+                        rows.append(f'<row r="{row}"><c t="s"><v>{rng.randrange(len(strings))}</v></c>'
+                                    f'<c><v>{rng.randint(1, 10 ** 6)}</v></c>'
+                                    f'<c t="s"><v>{rng.randrange(len(strings))}</v></c></row>')
+                        row += 1
+                    sheet.write(''.join(rows).encode('utf-8'))
+                    if size < 64 * 1024:
+                        break  # Small sheets: one batch of rows is plenty
+                sheet.write(b'</sheetData></worksheet>')
+
+    def generate(self, count, types, sizes):
+        """Write count documents; returns the manifest [{name, type, size}]"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        type_values, type_weights = zip(*types)
+        size_values, size_weights = zip(*sizes)
+        manifest = []
+        for index in range(count):
+            kind = self.rng.choices(type_values, type_weights)[0]
+            size = self.rng.choices(size_values, size_weights)[0]
+            rng = random.Random(self.seed * 1_000_003 + index)
+            path = self.directory / f"{rng.choice(self.vocabulary)}_{index:06d}.{kind}"
+            writer = {'txt': self.write_text, 'md': self.write_md,
+                      'pdf': self.write_pdf, 'xlsx': self.write_xlsx}[kind]
+            writer(path, size, rng)
+            manifest.append({'name': path.name, 'type': kind, 'size': path.stat().st_size})
+        return manifest
+
+
+# Measurement
+
+def tree_bytes(path):
+    """Bytes allocated on disk under path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+def proc_status(pid, field):
+    """A kB field of /proc/<pid>/status in bytes, or None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_tree(pid):
+    """pid and all of its descendants (Linux)"""
+    pids = [pid]
+    for parent in pids:
+        try:
+            for task in os.listdir(f'/proc/{parent}/task'):
+                with open(f'/proc/{parent}/task/{task}/children') as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+class RssSampler:
+    """Peak resident memory of a process tree, sampled in the background"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            sizes = [proc_status(pid, 'VmRSS') for pid in process_tree(self.pid)]
+            sizes = [size for size in sizes if size is not None]
+            if sizes:
+                self.peak = max(self.peak or 0, sum(sizes))
+            self.stop_event.wait(self.interval)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def io_write_bytes():
+    """Bytes this process has caused to be written to storage, or None"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('write_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# Workspace
+
+def prepare_workspace(root):
+    """Copy the application modules into root/app; returns that directory"""
+    app = Path(root) / 'app'
+    app.mkdir(parents=True)
+    for source in BASE_DIR.glob('*.py'):
+        shutil.copy2(source, app / source.name)
+    return app
+
+
+def link_corpus(corpus, incoming):
+    """Give a run its own incoming directory holding the corpus (hardlinks when possible)"""
+    incoming.mkdir(parents=True)
+    for path in sorted(corpus.iterdir()):
+        try:
+            os.link(path, incoming / path.name)
+        except OSError:
+            shutil.copy2(path, incoming / path.name)
+    return sorted(str(path) for path in incoming.iterdir())
+
+
+def free_port():
+    with contextlib.closing(socket.socket()) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# Processor benchmark
+
+def processor_worker(incoming, transfer):
+    """Child process: run every document through DocumentProcessor, report JSON on stdout"""
+    from advanced_processor import DocumentProcessor
+
+    paths = sorted(str(path) for path in Path(incoming).iterdir())
+    latencies = []
+    failures = 0
+    io_before = io_write_bytes()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        for path in paths:
+            begin = time.perf_counter()
+            try:
+                ok = DocumentProcessor().process_document(path, transfer)['success']
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - begin)
+            failures += not ok
+    elapsed = time.perf_counter() - started
+    io_after = io_write_bytes()
+    json.dump({
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'failures': failures,
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'io_write_bytes': None if io_before is None else io_after - io_before
+    }, sys.stdout)
+
+
+def bench_processor(workdir, corpus, transfer):
+    """DocumentProcessor.process_document called directly, one document at a time"""
+    run = workdir / 'processor'
+    app = prepare_workspace(run)
+    paths = link_corpus(corpus, run / 'incoming')
+    print(f"⚙️ Processor: {len(paths)} documents", file=sys.stderr)
+
+    output = subprocess.run([sys.executable, str(app / 'benchmark.py'), '--worker', 'processor',
+                             '--incoming', str(run / 'incoming'), '--transfer', transfer],
+                            cwd=app, capture_output=True, text=True, check=True).stdout
+    data = json.loads(output)
+    documents = len(data['latencies'])
+    written = tree_bytes(app / 'portofentry_internal')
+    return {
+        'documents': documents,
+        'failures': data['failures'],
+        'elapsed_s': round(data['elapsed'], 3),
+        'docs_per_s': round(documents / data['elapsed'], 2) if data['elapsed'] else None,
+        'latency': latency_summary(data['latencies']),
+        'peak_rss_bytes': data['peak_rss_bytes'],
+        'disk_bytes_per_doc': round(written / documents) if documents else None,
+        'io_write_bytes_per_doc': (round(data['io_write_bytes'] / documents)
+                                   if documents and data['io_write_bytes'] is not None else None)
+    }
+
+
+# HTTP benchmark
+
+def request(url, data=None, timeout=600):
+    """One HTTP request; returns (status, body bytes, seconds)"""
+    begin = time.perf_counter()
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=timeout) as response:
+            content = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        content = e.read()
+        status = e.code
+    return status, content, time.perf_counter() - begin
+
+
+def wait_for_server(base, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            request(base + '/api/stats', timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def bench_http(workdir, corpus, transfer, clients, process_workers, read_seconds):
+    """port_server_v0 over HTTP: concurrent /api/process, then a read mix"""
+    run = workdir / 'http'
+    app = prepare_workspace(run)
+    paths = link_corpus(corpus, run / 'incoming')
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    print(f"🌐 HTTP: {len(paths)} documents, {clients} clients", file=sys.stderr)
+
+    command = [sys.executable, str(app / 'port_server_v0.py'), '--port', str(port),
+               '--transfer', transfer, '--http-workers', str(max(16, clients * 2))]
+    if process_workers:
+        command += ['--process-workers', str(process_workers)]
+    env = dict(os.environ, PORTOFENTRY_INCOMING=str(run / 'incoming'))
+    server = subprocess.Popen(command, cwd=app, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(base, server)
+        with RssSampler(server.pid) as rss:
+            # Ingest: every document through POST /api/process
+            ingest = []
+            doc_ids = []
+            failures = 0
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                for status, content, seconds in pool.map(
+                        lambda path: request(base + '/api/process', {'path': path}), paths):
+                    ingest.append(seconds)
+                    if status == 200:
+                        doc_ids.append(json.loads(content)['doc_id'])
+                    else:
+                        failures += 1
+            ingest_elapsed = time.perf_counter() - started
+
+            # Reads: the console's endpoints, round robin, for read_seconds
+            reads = {endpoint.split('?')[0]: [] for endpoint in READ_ENDPOINTS}
+            read_errors = 0
+            deadline = time.monotonic() + read_seconds
+            words = sorted(CATEGORY_KEYWORDS)
+
+            def reader(offset):
+                nonlocal read_errors
+                rng = random.Random(offset)
+                index = offset
+                while time.monotonic() < deadline:
+                    endpoint = READ_ENDPOINTS[index % len(READ_ENDPOINTS)]
+                    index += 1
+                    url = base + endpoint.format(doc_id=rng.choice(doc_ids) if doc_ids else 'none',
+                                                 word=rng.choice(words))
+                    status, _, seconds = request(url)
+                    reads[endpoint.split('?')[0]].append(seconds)
+                    read_errors += status >= 400
+
+            read_started = time.perf_counter()
+            if read_seconds > 0:
+                with ThreadPoolExecutor(max_workers=clients) as pool:
+                    list(pool.map(reader, range(clients)))
+            read_elapsed = time.perf_counter() - read_started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    documents = len(doc_ids)
+    written = tree_bytes(app / 'portofentry_internal')
+    total_reads = sum(len(latencies) for latencies in reads.values())
+    return {
+        'clients': clients,
+        'documents': documents,
+        'failures': failures,
+        'ingest_elapsed_s': round(ingest_elapsed, 3),
+        'docs_per_s': round(documents / ingest_elapsed, 2) if ingest_elapsed else None,
+        'ingest_latency': latency_summary(ingest),
+        'reads': {
+            'elapsed_s': round(read_elapsed, 3),
+            'requests': total_reads,
+            'errors': read_errors,
+            'requests_per_s': round(total_reads / read_elapsed, 2) if read_elapsed else None,
+            'latency': {endpoint: latency_summary(latencies)
+                        for endpoint, latencies in reads.items()}
+        },
+        'peak_rss_bytes': rss.peak,
+        'disk_bytes_per_doc': round(written / documents) if documents else None
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Port of Entry benchmark")
+    parser.add_argument('--docs', type=int, default=200, help="documents in the corpus")
+    parser.add_argument('--types', default=DEFAULT_TYPES,
+                        help=f"type mix, e.g. {DEFAULT_TYPES}")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"size mix (B, KB, MB, GB), e.g. {DEFAULT_SIZES}")
+    parser.add_argument('--seed', type=int, default=1, help="corpus seed")
+    parser.add_argument('--mode', choices=['processor', 'http', 'all'], default='all')
+    parser.add_argument('--clients', type=int, default=8, help="concurrent HTTP clients")
+    parser.add_argument('--process-workers', type=int, default=0,
+                        help="server processing workers (default: the server's default)")
+    parser.add_argument('--read-seconds', type=float, default=10.0,
+                        help="length of the HTTP read phase")
+    parser.add_argument('--transfer', choices=['copy', 'move'], default='copy',
+                        help="how originals enter packages (each run moves hardlinks, "
+                             "never the corpus itself)")
+    parser.add_argument('--workdir', help="scratch directory (default: a new temp dir)")
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directory")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--incoming', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    """Generate a corpus, run the benchmarks and print the JSON report"""
+    args = parse_args()
+    if args.worker == 'processor':
+        processor_worker(args.incoming, args.transfer)
+        return
+
+    types = parse_mix(args.types)
+    sizes = parse_mix(args.sizes, parse_size)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='portofentry-bench-'))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        print(f"🧪 Generating {args.docs} documents in {workdir}", file=sys.stderr)
+        started = time.perf_counter()
+        manifest = CorpusGenerator(workdir / 'corpus', args.seed).generate(args.docs, types, sizes)
+        corpus_bytes = sum(doc['size'] for doc in manifest)
+
+        report = {
+            'benchmark': 'portofentry',
+            'timestamp': datetime.now().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'corpus': {
+                'documents': len(manifest),
+                'bytes': corpus_bytes,
+                'seed': args.seed,
+                'types': args.types,
+                'sizes': args.sizes,
+                'by_type': {kind: sum(1 for doc in manifest if doc['type'] == kind)
+                            for kind, _ in types},
+                'generate_s': round(time.perf_counter() - started, 3)
+            },
+            'transfer': args.transfer
+        }
+        if args.mode in ('processor', 'all'):
+            report['processor'] = bench_processor(workdir, workdir / 'corpus', args.transfer)
+        if args.mode in ('http', 'all'):
+            report['http'] = bench_http(workdir, workdir / 'corpus', args.transfer, args.clients,
+                                        args.process_workers, args.read_seconds)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n')
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
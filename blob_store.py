@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Blob Store
+Content-addressed storage of originals: identical bytes are stored once
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from ingest_transfer import copy_file, transfer_file
+
+HASH_BUFFER = 1024 * 1024
+
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file"""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(HASH_BUFFER), b''):
+            digest.update(block)
+        return digest.hexdigest()
+
+
+class BlobStore:
+    """Blobs under root/ab/<sha256>, with the first document of each in SQLite
+
+    Packages hardlink their original to the blob, so a blob's link count is
+    its number of references plus one.
+    """
+
+    def __init__(self, root, db_path):
+        self.root = Path(root)
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the blobs table"""
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER,
+                    first_doc TEXT,
+                    created TEXT
+                )
+            """)
+            self.conn.commit()
+
+    def path(self, digest):
+        """Where the blob for a digest lives"""
+        return self.root / digest[:2] / digest
+
+    def lookup(self, digest):
+        """Return the blob row for a digest if its file is present, else None"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM blobs WHERE sha256 = ?",
+                                    (digest,)).fetchone()
+        if row is None or not self.path(digest).exists():
+            return None
+        return dict(row)
+
+    def put(self, source, digest, transfer='copy'):
+        """Store source under its digest; returns (blob path, method used)
+
+        'move' takes the source's inode; 'copy' and 'link' leave the source
+        untouched and store an independent copy (reflinked where supported).
+
+        When the blob already exists the source is not stored again (and is
+        removed for transfer='move'). A moved source can be given back with
+        restore() until the document is published.
+        """
+        source = Path(source)
+        blob = self.path(digest)
+
+        if blob.exists():
+            if transfer == 'move':
+                source.unlink()
+            return blob, 'dedup'
+
+        blob.parent.mkdir(exist_ok=True)
+        temp = blob.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}")
+        # A source that stays in place must not share the blob's inode: a later
+        # edit would change the stored original of every package using it
+        method = transfer_file(source, temp, 'move' if transfer == 'move' else 'copy')
+        os.chmod(temp, 0o444)  # Shared by every package that references it
+        try:
+            os.link(temp, blob)  # Never replaces a blob stored concurrently
+        except FileExistsError:
+            method = 'dedup'
+        finally:
+            temp.unlink()
+        return blob, method
+
+    def restore(self, blob, destination, mode=None):
+        """Give back a source that put() consumed, for a document that was not published
+
+        The blob is copied rather than renamed: a concurrent document with
+        the same bytes may already reference it. An unreferenced blob is
+        left for collect_garbage.
+        """
+        destination = Path(destination)
+        if destination.exists():
+            return
+        temp = destination.with_name(f".{destination.name}.{os.getpid()}.restore")
+        copy_file(blob, temp)
+        if mode is not None:
+            os.chmod(temp, mode)
+        os.rename(temp, destination)
+
+    def link_into(self, blob, destination):
+        """Reference a blob from a package, copying if it cannot be linked"""
+        try:
+            os.link(blob, destination)
+            return 'hardlink'
+        except OSError:
+            return copy_file(blob, destination)
+
+    def record(self, digest, size, doc_id):
+        """Remember the first document stored with a digest"""
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                              (digest, size, doc_id, datetime.now().isoformat()))
+            self.conn.commit()
+
+    def stats(self):
+        """Return blob count, stored bytes and bytes saved by deduplication"""
+        blobs = stored = saved = references = 0
+        for blob in self.root.glob('??/*'):
+            if blob.name.startswith('.'):
+                continue
+            stat = blob.stat()
+            blobs += 1
+            stored += stat.st_size
+            references += stat.st_nlink - 1
+            saved += stat.st_size * max(0, stat.st_nlink - 2)
+        return {'blobs': blobs, 'references': references,
+                'stored_bytes': stored, 'saved_bytes': saved}
+
+    def collect_garbage(self, referenced=()):
+        """Remove blobs no package references; returns the number removed
+
+        referenced holds digests used without a hardlink (archived packages).
+        """
+        removed = []
+        for blob in self.root.glob('??/*'):
+            if blob.name.startswith('.') or blob.name in referenced:
+                continue
+            if blob.stat().st_nlink == 1:
+                blob.unlink()
+                removed.append(blob.name)
+        with self.lock:
+            self.conn.executemany("DELETE FROM blobs WHERE sha256 = ?",
+                                  [(digest,) for digest in removed])
+            self.conn.commit()
+        return len(removed)
+
+
+def main():
+    """Blob store maintenance: stats | gc"""
+    from advanced_processor import BLOBS_DIR, BLOBS_DB, get_package_archive
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('stats', 'gc'):
+        print("Usage: python3 blob_store.py stats|gc")
+        sys.exit(1)
+
+    store = BlobStore(BLOBS_DIR, BLOBS_DB)
+
+    if sys.argv[1] == 'stats':
+        for key, value in store.stats().items():
+            print(f"{key + ':':<15} {value}")
+    else:
+        removed = store.collect_garbage(get_package_archive().blob_digests())
+        print(f"✅ Removed {removed} unreferenced blobs")
+
+
+if __name__ == '__main__':
+    main()
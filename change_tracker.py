@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Change Tracker
+Versioned snapshot of a listing that remembers recent changes for delta responses
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class ChangeTracker:
+    """Keyed listing with a version token and a bounded change history"""
+
+    def __init__(self, history=10000):
+        # The epoch keeps tokens from a previous server run from matching
+        self.epoch = os.urandom(4).hex()
+        self.version = 0
+        self.modified = time.time()
+        self.items = {}
+        self.changes = deque(maxlen=history)
+        self.dropped_through = 0
+        self.lock = threading.Lock()
+
+    def token(self):
+        """Return the current version token"""
+        with self.lock:
+            return f"{self.epoch}.{self.version}"
+
+    def replace(self, items):
+        """Replace the listing (key -> item) and record what changed"""
+        with self.lock:
+            changed = [key for key, item in items.items()
+                       if self.items.get(key) != item]
+            removed = [key for key in self.items if key not in items]
+
+            if changed or removed:
+                self.version += 1
+                self.modified = time.time()
+                for key in changed:
+                    self.record(key)
+                for key in removed:
+                    self.record(key)
+                self.items = dict(items)
+
+            return f"{self.epoch}.{self.version}"
+
+    def apply(self, changed, removed):
+        """Record known changes ({key: item} changed, [keys] removed) without a full compare"""
+        with self.lock:
+            if changed or removed:
+                self.version += 1
+                self.modified = time.time()
+                for key, item in changed.items():
+                    self.items[key] = item
+                    self.record(key)
+                for key in removed:
+                    self.items.pop(key, None)
+                    self.record(key)
+
+            return f"{self.epoch}.{self.version}"
+
+    def bump(self):
+        """Advance the version without a keyed change"""
+        with self.lock:
+            self.version += 1
+            self.modified = time.time()
+            return f"{self.epoch}.{self.version}"
+
+    def record(self, key):
+        """Append a change, remembering what falls out of the history"""
+        if len(self.changes) == self.changes.maxlen:
+            self.dropped_through = self.changes[0][0]
+        self.changes.append((self.version, key))
+
+    def changes_since(self, token):
+        """Return (changed items, removed keys) since token, or None for a full listing"""
+        try:
+            epoch, version = token.split('.')
+            version = int(version)
+        except ValueError:
+            return None
+
+        with self.lock:
+            if epoch != self.epoch or version > self.version:
+                return None
+            if version < self.dropped_through:
+                return None
+
+            keys = {key for changed_at, key in self.changes if changed_at > version}
+            changed = [self.items[key] for key in sorted(keys) if key in self.items]
+            removed = sorted(key for key in keys if key not in self.items)
+
+        return changed, removed
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Content Extractors
+Plain text out of DOCX, XLSX, CSV and PDF originals, cached once per content hash
+"""
+
+import codecs
+import csv
+import mmap
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from collections import namedtuple
+from pathlib import Path
+from xml.etree import ElementTree
+
+from blob_store import hash_file
+from lexeme_stream import TEXT_SUFFIXES
+
+CHUNK_CHARS = 64 * 1024
+MAX_TEXT_CHARS = 16 * 1024 * 1024  # Extracted text kept per document
+
+# function(path, max_bytes) yields text chunks; max_bytes bounds what it may read or inflate
+Extractor = namedtuple('Extractor', 'function max_bytes max_seconds')
+
+EXTRACTORS = {}
+
+
+class ExtractionError(ValueError):
+    """The document cannot be read within its extractor's budget"""
+
+
+# What a malformed or oversized document can raise while being extracted
+EXTRACTION_ERRORS = (ExtractionError, zipfile.BadZipFile, KeyError, ElementTree.ParseError,
+                     csv.Error, ValueError, OSError)
+
+
+def register(*suffixes, max_bytes=64 * 1024 * 1024, max_seconds=10.0):
+    """Decorator: use a function as the extractor for file suffixes"""
+    def decorate(function):
+        for suffix in suffixes:
+            EXTRACTORS[suffix] = Extractor(function, max_bytes, max_seconds)
+        return function
+    return decorate
+
+
+def extractor_for(name):
+    """The Extractor for a file name, or None"""
+    return EXTRACTORS.get(Path(name).suffix.lower())
+
+
+def chunked(pieces, size=CHUNK_CHARS):
+    """Join small text pieces into chunks of about size characters"""
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def extract(path, name=None):
+    """Yield the text of a document within its extractor's size and time budgets
+
+    Text beyond the time budget or MAX_TEXT_CHARS is dropped; the chunks
+    already produced are kept.
+    """
+    extractor = extractor_for(name or Path(path).name)
+    if extractor is None:
+        return
+    if os.path.getsize(path) > extractor.max_bytes:
+        raise ExtractionError(f"larger than {extractor.max_bytes} bytes")
+
+    deadline = time.monotonic() + extractor.max_seconds
+    produced = 0
+    for chunk in extractor.function(path, extractor.max_bytes):
+        chunk = chunk[:MAX_TEXT_CHARS - produced]
+        produced += len(chunk)
+        yield chunk
+        if produced >= MAX_TEXT_CHARS or time.monotonic() > deadline:
+            print(f"⏱️ Extraction budget reached for {name or Path(path).name}")
+            return
+
+
+# Office Open XML
+
+def local_name(tag):
+    """Tag without its XML namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def zip_member(archive, member, max_bytes):
+    """Open a member of a zip, refusing members that inflate past max_bytes"""
+    info = archive.getinfo(member)
+    if info.file_size > max_bytes:
+        raise ExtractionError(f"{member} inflates to {info.file_size} bytes")
+    return archive.open(info)
+
+
+@register('.docx')
+def extract_docx(path, max_bytes):
+    """Paragraph text of word/document.xml"""
+    def pieces(stream):
+        for event, elem in ElementTree.iterparse(stream, events=('end',)):
+            tag = local_name(elem.tag)
+            if tag == 't' and elem.text:
+                yield elem.text
+            elif tag == 'tab':
+                yield '\t'
+            elif tag == 'p':
+                yield '\n'
+                elem.clear()
+
+    with zipfile.ZipFile(path) as archive:
+        with zip_member(archive, 'word/document.xml', max_bytes) as stream:
+            yield from chunked(pieces(stream))
+
+
+@register('.xlsx')
+def extract_xlsx(path, max_bytes):
+    """Cell values of every worksheet, one row per line"""
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        shared = []
+        if 'xl/sharedStrings.xml' in names:
+            with zip_member(archive, 'xl/sharedStrings.xml', max_bytes) as stream:
+                for event, elem in ElementTree.iterparse(stream, events=('end',)):
+                    if local_name(elem.tag) == 'si':
+                        shared.append(''.join(t.text or '' for t in elem.iter()
+                                              if local_name(t.tag) == 't'))
+                        elem.clear()
+
+        def rows(stream):
+            cells = []
+            for event, elem in ElementTree.iterparse(stream, events=('end',)):
+                tag = local_name(elem.tag)
+                if tag == 'c':
+                    kind = elem.get('t')
+                    if kind == 'inlineStr':
+                        value = ''.join(t.text or '' for t in elem.iter() if local_name(t.tag) == 't')
+                    else:
+                        value = next((v.text or '' for v in elem if local_name(v.tag) == 'v'), '')
+                        if kind == 's' and value.isdigit() and int(value) < len(shared):
+                            value = shared[int(value)]
+                    if value:
+                        cells.append(value)
+                elif tag == 'row':
+                    if cells:
+                        yield '\t'.join(cells) + '\n'
+                    cells = []
+                    elem.clear()
+
+        sheets = sorted((n for n in names if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', n)),
+                        key=lambda n: int(re.search(r'\d+', n.rsplit('/', 1)[1]).group()))
+        for sheet in sheets:
+            with zip_member(archive, sheet, max_bytes) as stream:
+                yield from chunked(rows(stream))
+
+
+# Delimited text
+
+@register('.csv', '.tsv', max_bytes=1024 * 1024 * 1024, max_seconds=30.0)
+def extract_csv(path, max_bytes):
+    """Fields of each record, tab separated, read as a stream"""
+    with open(path, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+        except csv.Error:
+            dialect = csv.excel_tab if str(path).endswith('.tsv') else csv.excel
+        csv.field_size_limit(max(csv.field_size_limit(), CHUNK_CHARS))
+        yield from chunked('\t'.join(field for field in record if field) + '\n'
+                           for record in csv.reader(f, dialect))
+
+
+# PDF
+
+PDF_STREAM = re.compile(rb'(?<!end)stream\r?\n')
+PDF_TEXT_BLOCK = re.compile(rb'BT\b(.*?)\bET\b', re.S)
+PDF_TEXT_TOKEN = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|-\d{3,}|T[dD*](?![A-Za-z])|\'', re.S)
+PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+PDF_ESCAPE = re.compile(rb'\\([0-7]{1,3}|\r?\n|.)', re.S)
+
+
+def pdf_string(token):
+    """Decode a literal (...) or hex <...> PDF string"""
+    if token.startswith(b'('):
+        def unescape(match):
+            code = match.group(1)
+            if code[:1].isdigit():
+                return bytes([int(code, 8) & 0xFF])
+            if code in (b'\n', b'\r\n'):
+                return b''
+            return PDF_ESCAPES.get(code, code)
+        data = PDF_ESCAPE.sub(unescape, token[1:-1])
+    else:
+        digits = re.sub(rb'\s', b'', token[1:-1])
+        data = bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii'))
+    if data.startswith(codecs.BOM_UTF16_BE):
+        return data[2:].decode('utf-16-be', errors='ignore')
+    return data.decode('latin-1')
+
+
+def pdf_streams(data, max_bytes):
+    """Contents of each stream object, inflated when Flate encoded"""
+    for match in PDF_STREAM.finditer(data):
+        start = match.end()
+        end = data.find(b'endstream', start)
+        if end < 0:
+            return
+        dictionary = data[max(0, match.start() - 512):match.start()].rsplit(b'obj', 1)[-1]
+        body = data[start:end]
+        if b'/FlateDecode' in dictionary:
+            try:
+                body = zlib.decompressobj().decompress(body, max_bytes)
+            except zlib.error:
+                continue
+        elif b'/Filter' in dictionary:
+            continue  # Images and other encodings carry no text
+        yield body
+
+
+@register('.pdf', max_bytes=256 * 1024 * 1024, max_seconds=20.0)
+def extract_pdf(path, max_bytes):
+    """Strings shown by the text operators of each content stream"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for stream in pdf_streams(data, max_bytes):
+                pieces = []
+                for block in PDF_TEXT_BLOCK.finditer(stream):
+                    for token in PDF_TEXT_TOKEN.findall(block.group(1)):
+                        if token[:1] in b'(<':
+                            pieces.append(pdf_string(token))
+                        elif token[:1] == b'-':
+                            pieces.append(' ')  # A wide TJ adjustment separates words
+                        else:
+                            pieces.append('\n')  # Td, TD, T* and ' start a new line
+                    pieces.append('\n')
+                if pieces:
+                    yield ''.join(pieces)
+
+
+class ExtractedTextCache:
+    """Extracted text stored under root/ab/<sha256>.txt, written once per content"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest):
+        """Where the text for a digest lives"""
+        return self.root / digest[:2] / f"{digest}.txt"
+
+    def text_path(self, source, digest=None, name=None):
+        """A plain-text file with the contents of source, or None
+
+        Text files are their own text. Other supported types are extracted
+        on first use; a document that fails to extract caches empty text,
+        so it is not parsed again.
+        """
+        name = name or Path(source).name
+        if Path(name).suffix.lower() in TEXT_SUFFIXES:
+            return Path(source)
+        if extractor_for(name) is None:
+            return None
+
+        digest = digest or hash_file(source)
+        cached = self.path(digest)
+        if cached.exists():
+            return cached
+
+        cached.parent.mkdir(exist_ok=True)
+        temp = cached.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}")
+        try:
+            with open(temp, 'w', encoding='utf-8') as f:
+                try:
+                    for chunk in extract(source, name):
+                        f.write(chunk)
+                except EXTRACTION_ERRORS as e:
+                    print(f"⚠️ Could not extract text from {name}: {e}")
+            os.replace(temp, cached)
+        finally:
+            if temp.exists():
+                temp.unlink()
+        return cached
+
+    def stats(self):
+        """Cached documents and their total text size"""
+        files = list(self.root.glob('??/*.txt'))
+        return {'documents': len(files), 'text_bytes': sum(p.stat().st_size for p in files)}
+
+    def clear(self):
+        """Remove every cached text (it is re-extracted on demand)"""
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+
+def main():
+    """Extracted text maintenance: stats | clear | extract <file>"""
+    from advanced_processor import TEXT_CACHE_DIR
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('stats', 'clear', 'extract') or \
+            (sys.argv[1] == 'extract' and len(sys.argv) < 3):
+        print("Usage: python3 content_extractors.py stats|clear|extract <file>")
+        sys.exit(1)
+
+    cache = ExtractedTextCache(TEXT_CACHE_DIR)
+
+    if sys.argv[1] == 'stats':
+        for key, value in cache.stats().items():
+            print(f"{key + ':':<15} {value}")
+    elif sys.argv[1] == 'clear':
+        cache.clear()
+        print("✅ Extracted text cache cleared")
+    else:
+        try:
+            for chunk in extract(sys.argv[2]):
+                sys.stdout.write(chunk)
+        except EXTRACTION_ERRORS as e:
+            print(f"❌ Could not extract text: {e}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Event Stream
+In-process publish/subscribe bus behind the /api/events Server-Sent Events endpoint
+"""
+
+import json
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class EventBus:
+    """Fan events out to subscribers and keep a short replay buffer"""
+
+    def __init__(self, history=500, subscriber_queue=1000, max_subscribers=8):
+        self.next_id = 1
+        self.history = deque(maxlen=history)
+        self.subscriber_queue = subscriber_queue
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def publish(self, event_type, data):
+        """Publish an event to every subscriber"""
+        with self.lock:
+            event = {
+                'id': self.next_id,
+                'type': event_type,
+                'data': dict(data, timestamp=data.get('timestamp') or datetime.now().isoformat())
+            }
+            self.next_id += 1
+            self.history.append(event)
+
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.put_nowait(event)
+                except queue.Full:
+                    # A client that stopped reading is cut off
+                    self.subscribers.discard(subscriber)
+
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """Return a queue of events, primed with any missed since last_event_id"""
+        subscriber = queue.Queue(maxsize=self.subscriber_queue)
+
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id is not None:
+                for event in self.history:
+                    if event['id'] > last_event_id and not subscriber.full():
+                        subscriber.put_nowait(event)
+            self.subscribers.add(subscriber)
+
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Stop delivering events to a subscriber"""
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def is_subscribed(self, subscriber):
+        """False once a subscriber has been cut off"""
+        with self.lock:
+            return subscriber in self.subscribers
+
+
+def format_event(event):
+    """Encode an event in text/event-stream format"""
+    return (f"id: {event['id']}\n"
+            f"event: {event['type']}\n"
+            f"data: {json.dumps(event['data'])}\n\n").encode('utf-8')
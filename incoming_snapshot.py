@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Incoming Snapshot
+Cached scandir listing of a directory that only re-describes entries that changed
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from pathlib import Path
+
+
+class IncomingSnapshot:
+    """Listing of the visible files in a directory, kept in name order
+
+    Each entry is cached with its (inode, size, mtime) signature, its
+    description and that description serialized as JSON, so listings are
+    assembled from stored bytes.
+    """
+
+    def __init__(self, directory, describe, max_age=10.0):
+        self.directory = Path(directory)
+        self.describe = describe  # describe([(name, path, stat)]) -> [dict], one call per refresh
+        self.max_age = max_age
+        self.entries = {}  # name -> (signature, item, line)
+        self.names = []
+        self.directory_mtime = None
+        self.statted_at = 0.0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Bring the snapshot up to date; returns ({name: item} changed, [removed names])
+
+        When the directory mtime moves (files added, removed or renamed)
+        only names and inodes are read, and only new inodes are stat'ed.
+        Every max_age seconds every entry is stat'ed to catch files
+        written in place.
+        """
+        with self.lock:
+            try:
+                directory_mtime = os.stat(self.directory).st_mtime_ns
+            except FileNotFoundError:
+                directory_mtime = None
+
+            full = time.monotonic() - self.statted_at >= self.max_age
+            if directory_mtime == self.directory_mtime and not full:
+                return {}, []
+            self.directory_mtime = directory_mtime
+            if full:
+                self.statted_at = time.monotonic()
+
+            entries = {}
+            changed = {}
+            pending = []  # (name, path, stat) of entries to describe
+            if directory_mtime is not None:
+                with os.scandir(self.directory) as scan:
+                    for entry in scan:
+                        if entry.name.startswith('.'):
+                            continue
+                        cached = self.entries.get(entry.name)
+                        if cached and not full and cached[0][0] == entry.inode():
+                            entries[entry.name] = cached
+                            continue
+
+                        try:
+                            if not entry.is_file():
+                                continue
+                            stat = entry.stat()
+                        except OSError:
+                            continue  # Removed while scanning
+
+                        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                        if cached and cached[0] == signature:
+                            entries[entry.name] = cached
+                            continue
+
+                        pending.append((entry.name, entry.path, stat))
+
+            # New and changed entries are described together, in one batch
+            for (name, path, stat), item in zip(pending, self.describe(pending) if pending else []):
+                signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                entries[name] = (signature, item, json.dumps(item).encode('utf-8'))
+                changed[name] = item
+
+            removed = [name for name in self.entries if name not in entries]
+            added = [name for name in changed if name not in self.entries]
+            if len(removed) + len(added) > len(entries) // 10:
+                self.names = sorted(entries)
+            else:
+                # Small changes keep the sorted name list in place
+                for name in removed:
+                    del self.names[bisect_left(self.names, name)]
+                for name in added:
+                    insort(self.names, name)
+            self.entries = entries
+            return changed, removed
+
+    def count(self):
+        """Number of files in the snapshot"""
+        with self.lock:
+            return len(self.names)
+
+    def names_from(self, offset=0, limit=None, after=None):
+        """A page of names, starting at offset or just after a name"""
+        with self.lock:
+            start = bisect_left(self.names, after) if after is not None else offset
+            if after is not None and start < len(self.names) and self.names[start] == after:
+                start += 1
+            end = len(self.names) if limit is None else start + limit
+            return self.names[start:end]
+
+    def items(self, names):
+        """Descriptions of the named entries"""
+        with self.lock:
+            return [self.entries[name][1] for name in names if name in self.entries]
+
+    def lines(self, names):
+        """JSON encodings of the named entries"""
+        with self.lock:
+            return [self.entries[name][2] for name in names if name in self.entries]
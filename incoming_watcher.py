@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Incoming Watcher
+Detects new, settled files in the incoming directory and hands them to a callback
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def file_signature(path):
+    """Return (inode, size, mtime) of a regular file, or None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if not (stat.st_mode & 0o170000 == 0o100000):
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def is_candidate(name):
+    """Hidden files (including in-progress uploads) are never ingested"""
+    return not name.startswith('.')
+
+
+class InotifySource:
+    """Directory change source backed by Linux inotify"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout):
+        """Return (changed names, removed names, overflowed) after up to timeout seconds"""
+        changed, removed, overflow = set(), set(), False
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed, removed, overflow
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed, removed, overflow
+
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                removed.add(name)
+                changed.discard(name)
+            elif name:
+                changed.add(name)
+                removed.discard(name)
+
+        return changed, removed, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Directory change source that rescans only when the directory mtime moves"""
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.dir_mtime = None
+        self.known = {}
+
+    def wait(self, timeout):
+        """Return (changed names, removed names, overflowed) after timeout seconds"""
+        time.sleep(timeout)
+
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return set(), set(), False
+        if dir_mtime == self.dir_mtime:
+            return set(), set(), False
+        self.dir_mtime = dir_mtime
+
+        # A file replaced under the same name may get its predecessor's inode
+        current = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    current[entry.name] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+        changed = {name for name, signature in current.items()
+                   if self.known.get(name) != signature}
+        removed = set(self.known) - set(current)
+        self.known = current
+        return changed, removed, False
+
+    def close(self):
+        pass
+
+
+class IncomingWatcher:
+    """Watch a directory and report files once they stop changing"""
+
+    def __init__(self, directory, on_ready, settle=2.0, interval=0.5,
+                 rescan_interval=60.0, use_inotify=True):
+        self.directory = Path(directory)
+        self.on_ready = on_ready
+        self.settle = settle
+        self.interval = interval
+        self.rescan_interval = rescan_interval
+        self.use_inotify = use_inotify and sys.platform.startswith('linux')
+
+        self.pending = {}   # name -> (signature, unchanged since)
+        self.reported = {}  # name -> signature handed to on_ready
+        self.source = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    @property
+    def backend(self):
+        """Name of the active change source"""
+        return 'inotify' if isinstance(self.source, InotifySource) else 'polling'
+
+    def start(self):
+        """Start watching in a background thread"""
+        self.source = None
+        if self.use_inotify:
+            try:
+                self.source = InotifySource(self.directory)
+            except (OSError, AttributeError):
+                self.source = None
+        if self.source is None:
+            self.source = PollingSource(self.directory)
+
+        # Files already waiting are picked up like new arrivals
+        self.rescan()
+
+        self.thread = threading.Thread(target=self.run, name='incoming-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self.stopping.set()
+        if self.thread:
+            self.thread.join()
+        if self.source:
+            self.source.close()
+
+    def rescan(self):
+        """Mark every file in the directory as a candidate"""
+        names = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    names.add(entry.name)
+
+        for name in set(self.reported) - names:
+            del self.reported[name]
+        self.changed(names)
+
+    def changed(self, names):
+        """Start (or restart) the settle timer for changed files"""
+        now = time.monotonic()
+        for name in names:
+            if is_candidate(name):
+                signature = file_signature(self.directory / name)
+                if signature is None or signature == self.reported.get(name):
+                    continue
+                if name in self.pending and self.pending[name][0] == signature:
+                    continue
+                self.pending[name] = (signature, now)
+
+    def removed(self, names):
+        """Forget files that left the directory"""
+        for name in names:
+            self.pending.pop(name, None)
+            self.reported.pop(name, None)
+
+    def settled(self):
+        """Return paths whose signature has not changed for the settle time"""
+        now = time.monotonic()
+        ready = []
+
+        for name, (signature, since) in list(self.pending.items()):
+            current = file_signature(self.directory / name)
+            if current is None:
+                del self.pending[name]
+            elif current != signature:
+                self.pending[name] = (current, now)
+            elif now - since >= self.settle:
+                del self.pending[name]
+                self.reported[name] = current
+                ready.append(str(self.directory / name))
+
+        return ready
+
+    def run(self):
+        """Watch loop"""
+        last_rescan = time.monotonic()
+
+        while not self.stopping.is_set():
+            try:
+                changed, removed, overflow = self.source.wait(self.interval)
+                self.removed(removed)
+                self.changed(changed)
+
+                if overflow or time.monotonic() - last_rescan >= self.rescan_interval:
+                    self.rescan()
+                    last_rescan = time.monotonic()
+
+                ready = self.settled()
+                if ready:
+                    self.on_ready(sorted(ready))
+            except Exception as e:
+                print(f"⚠️ Incoming watcher error: {e}")
+                time.sleep(self.interval)
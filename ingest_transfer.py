@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Ingest Transfer
+Moves originals into packages with metadata operations where the filesystem allows
+"""
+
+import errno
+import os
+import shutil
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# ioctl that clones file extents (Btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+COPY_CHUNK = 64 * 1024 * 1024
+
+# Errors meaning "this mechanism is not available here", not "the copy failed"
+UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+               errno.ENOTTY, errno.EPERM, errno.EBADF}
+
+# Modes accepted by --transfer. For originals entering the blob store 'link' is an
+# alias of 'copy': a blob never shares its inode with a file left in place
+TRANSFER_MODES = ('move', 'link', 'copy')
+
+
+def transfer_file(source, destination, mode='copy'):
+    """Place source at destination as cheaply as possible and return the method used
+
+    move: rename on the same filesystem, otherwise copy and remove the source
+    link: hardlink on the same filesystem, otherwise copy (source shares the inode)
+    copy: independent copy, reflinked where supported
+    """
+    source, destination = Path(source), Path(destination)
+
+    if mode == 'move':
+        try:
+            os.rename(source, destination)
+            return 'rename'
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        method = copy_file(source, destination)
+        source.unlink()
+        return method
+
+    if mode == 'link':
+        try:
+            os.link(source, destination)
+            return 'hardlink'
+        except OSError as e:
+            if e.errno not in UNSUPPORTED:
+                raise
+
+    return copy_file(source, destination)
+
+
+def copy_file(source, destination):
+    """Copy data and metadata, returning the method used"""
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        method = reflink(src, dst) or kernel_copy(src, dst)
+        if method is None:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            method = 'copy'
+    shutil.copystat(source, destination)
+    return method
+
+
+def reflink(src, dst):
+    """Share the source extents with dst (copy-on-write), or return None"""
+    if fcntl is None:
+        return None
+    try:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return 'reflink'
+    except OSError as e:
+        if e.errno in UNSUPPORTED:
+            return None
+        raise
+
+
+def kernel_copy(src, dst):
+    """Copy inside the kernel with copy_file_range or sendfile, or return None"""
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    size = os.fstat(src_fd).st_size
+
+    if hasattr(os, 'copy_file_range'):
+        copied = 0
+        try:
+            while True:
+                sent = os.copy_file_range(src_fd, dst_fd, COPY_CHUNK)
+                if sent == 0:
+                    return 'copy_file_range'
+                copied += sent
+        except OSError as e:
+            if e.errno not in UNSUPPORTED or copied:
+                raise
+
+    if hasattr(os, 'sendfile'):
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(dst_fd, src_fd, offset, min(COPY_CHUNK, size - offset))
+                if sent == 0:
+                    break
+                offset += sent
+            return 'sendfile'
+        except OSError as e:
+            if e.errno not in UNSUPPORTED or offset:
+                raise
+
+    return None
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Job Queue
+Persistent work queue drained by a pool of worker threads
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class JobQueue:
+    """SQLite-backed job queue with a fixed pool of worker threads"""
+
+    def __init__(self, db_path, handler, workers=2):
+        self.db_path = Path(db_path)
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.pending = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the jobs table"""
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    name TEXT,
+                    status TEXT NOT NULL,
+                    submitted_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_path ON jobs (path)")
+            self.conn.commit()
+
+    def start(self):
+        """Requeue unfinished jobs and start the worker threads"""
+        with self.lock:
+            # Jobs that were running when the server stopped start over
+            self.conn.execute("UPDATE jobs SET status = ?, started_at = NULL "
+                              "WHERE status = ?", (QUEUED, RUNNING))
+            self.conn.commit()
+            rows = self.conn.execute(
+                "SELECT job_id FROM jobs WHERE status = ? ORDER BY rowid",
+                (QUEUED,)).fetchall()
+
+        for row in rows:
+            self.pending.put(row['job_id'])
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.worker, name=f'job-{i}',
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        return len(rows)
+
+    def stop(self):
+        """Stop the workers after their current job"""
+        for _ in self.threads:
+            self.pending.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def submit(self, paths):
+        """Queue documents and return one job per path"""
+        jobs = []
+        now = datetime.now().isoformat()
+
+        with self.lock:
+            for path in paths:
+                path = str(path)
+
+                # A document that is already waiting keeps its job
+                row = self.conn.execute(
+                    "SELECT job_id FROM jobs WHERE path = ? AND status IN (?, ?)",
+                    (path, *ACTIVE_STATES)).fetchone()
+                if row:
+                    jobs.append({'job_id': row['job_id'], 'path': path,
+                                 'queued': False})
+                    continue
+
+                job_id = f"JOB-{datetime.now().strftime('%Y%m%d')}-{os.urandom(6).hex()}"
+                self.conn.execute(
+                    "INSERT INTO jobs (job_id, path, name, status, submitted_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (job_id, path, Path(path).name, QUEUED, now))
+                jobs.append({'job_id': job_id, 'path': path, 'queued': True})
+            self.conn.commit()
+
+        for job in jobs:
+            if job['queued']:
+                self.pending.put(job['job_id'])
+
+        return jobs
+
+    def worker(self):
+        """Drain the queue until stopped"""
+        while True:
+            job_id = self.pending.get()
+            if job_id is None:
+                break
+
+            row = self.update(job_id, QUEUED, status=RUNNING,
+                              started_at=datetime.now().isoformat())
+            if row is None:
+                continue  # Already picked up or removed
+
+            try:
+                result = self.handler(row['path'])
+                if result.get('success'):
+                    self.update(job_id, RUNNING, status=DONE,
+                                finished_at=datetime.now().isoformat(),
+                                result=json.dumps(result))
+                else:
+                    self.update(job_id, RUNNING, status=FAILED,
+                                finished_at=datetime.now().isoformat(),
+                                error=result.get('error', 'Processing failed'))
+            except Exception as e:
+                self.update(job_id, RUNNING, status=FAILED,
+                            finished_at=datetime.now().isoformat(),
+                            error=str(e))
+
+    def update(self, job_id, expected_status, **fields):
+        """Update a job if it is still in the expected state"""
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self.lock:
+            cursor = self.conn.execute(
+                f"UPDATE jobs SET {columns} WHERE job_id = ? AND status = ?",
+                (*fields.values(), job_id, expected_status))
+            self.conn.commit()
+            if cursor.rowcount == 0:
+                return None
+            return self.conn.execute("SELECT * FROM jobs WHERE job_id = ?",
+                                     (job_id,)).fetchone()
+
+    def get(self, job_id):
+        """Return a job as a dict, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE job_id = ?",
+                                    (job_id,)).fetchone()
+        return self.to_dict(row) if row else None
+
+    def get_many(self, job_ids):
+        """Return the jobs that exist among job_ids, in the given order"""
+        found = {}
+        job_ids = list(job_ids)
+        with self.lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(job_ids), 500):
+                chunk = job_ids[start:start + 500]
+                marks = ', '.join('?' * len(chunk))
+                for row in self.conn.execute(
+                        f"SELECT * FROM jobs WHERE job_id IN ({marks})", chunk):
+                    found[row['job_id']] = self.to_dict(row)
+        return [found[job_id] for job_id in job_ids if job_id in found]
+
+    def recent(self, limit=50, status=None):
+        """Return the most recently submitted jobs"""
+        with self.lock:
+            if status:
+                rows = self.conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY rowid DESC LIMIT ?",
+                    (status, limit)).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT * FROM jobs ORDER BY rowid DESC LIMIT ?",
+                    (limit,)).fetchall()
+        return [self.to_dict(row) for row in rows]
+
+    def counts(self):
+        """Return the number of jobs in each state"""
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        with self.lock:
+            for row in self.conn.execute(
+                    "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+                counts[row['status']] = row['n']
+        return counts
+
+    def to_dict(self, row):
+        """Convert a jobs row to a response dict"""
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Lexeme Stream
+Single-pass, bounded-memory word sampling for documents of any size
+"""
+
+import math
+import random
+import re
+
+WORD_PATTERN = re.compile(r'\b[a-zA-Z]{4,}\b')
+
+COMMON_WORDS = frozenset({'this', 'that', 'with', 'from', 'have', 'been', 'were',
+                          'their', 'there', 'about', 'would', 'could', 'should'})
+
+CHUNK_CHARS = 1024 * 1024
+MAX_TAIL = 64 * 1024
+
+TEXT_SUFFIXES = ('.txt', '.md', '.py', '.js')
+
+
+def split_tail(text):
+    """Return the index where the trailing run of word characters starts"""
+    index = len(text)
+    while index > 0 and (text[index - 1].isalnum() or text[index - 1] == '_'):
+        index -= 1
+    return index
+
+
+def iter_text_chunks(path, chunk_chars=CHUNK_CHARS):
+    """Yield the text of a file in chunks that never split a word"""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        tail = ''
+        while True:
+            block = f.read(chunk_chars)
+            if not block:
+                break
+
+            text = tail + block
+            cut = split_tail(text)
+            if cut == 0 and len(text) > MAX_TAIL:
+                # One enormous run of word characters: no real word to protect
+                cut = len(text)
+            tail = text[cut:]
+            if cut:
+                yield text[:cut]
+
+        if tail:
+            yield tail
+
+
+def meaningful_words(text):
+    """Words of four or more letters that are not common words"""
+    return [w for w in WORD_PATTERN.findall(text) if w.lower() not in COMMON_WORDS]
+
+
+class LexemeSampler:
+    """Independent uniform picks from a stream of words, one per slot
+
+    Each slot is a size-one reservoir using Li's Algorithm L: it jumps
+    straight to the next word that replaces its pick, so the cost per word
+    is a counter increment rather than a random draw.
+    """
+
+    def __init__(self, slots, rng=None):
+        self.rng = rng or random
+        self.count = 0
+        self.picks = [None] * slots
+        self.next_index = [0] * slots
+        self.weight = [1.0] * slots
+
+    def uniform(self):
+        """Uniform float in (0, 1]"""
+        return 1.0 - self.rng.random()
+
+    def skip(self, weight):
+        """Number of words to pass over before the next replacement"""
+        if weight >= 1.0:
+            return 0
+        return int(math.log(self.uniform()) / math.log(1.0 - weight))
+
+    def feed(self, words):
+        """Consider the next batch of words"""
+        end = self.count + len(words)
+
+        for slot in range(len(self.picks)):
+            while self.next_index[slot] < end:
+                index = self.next_index[slot]
+                self.picks[slot] = words[index - self.count]
+                self.weight[slot] *= self.uniform()
+                self.next_index[slot] = index + self.skip(self.weight[slot]) + 1
+
+        self.count = end
+
+
+def sample_text(text, slots=1, rng=None):
+    """Pick `slots` lexemes from an in-memory string"""
+    sampler = LexemeSampler(slots, rng)
+    sampler.feed(meaningful_words(text))
+    return sampler.picks
+
+
+def sample_chunks(chunks, slots=1, rng=None):
+    """Pick `slots` lexemes from a stream of text chunks; None picks if it has no words"""
+    sampler = LexemeSampler(slots, rng)
+    for chunk in chunks:
+        sampler.feed(meaningful_words(chunk))
+    return sampler.picks
+
+
+def sample_file(path, slots=1, rng=None, chunk_chars=CHUNK_CHARS):
+    """Pick `slots` lexemes from a text file in one streaming pass"""
+    return sample_chunks(iter_text_chunks(path, chunk_chars), slots, rng)
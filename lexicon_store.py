@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Lexicon Store
+Persistent vocabulary of learned words: counts, first sighting, stages and documents
+"""
+
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+class LexiconStore:
+    """Global lexicon backed by SQLite, safe for concurrent writer processes"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the words, word_stages and doc_words tables"""
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS words (
+                    word TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    first_doc TEXT,
+                    first_seen TEXT,
+                    last_seen TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS words_count ON words (count DESC)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS word_stages (
+                    word TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (word, stage)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS doc_words (
+                    doc_id TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    stage TEXT,
+                    timestamp TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS doc_words_doc ON doc_words (doc_id)")
+            self.conn.commit()
+
+    def record(self, doc_id, learned_words):
+        """Add the words learned from one document"""
+        self.record_many([(doc_id, learned_words)])
+
+    def record_many(self, batch):
+        """Add words from many documents, [(doc_id, learned_words)], in one transaction"""
+        rows = []
+        for doc_id, learned_words in batch:
+            for item in learned_words:
+                timestamp = item.get('timestamp') or datetime.now().isoformat()
+                rows.append((item['word'].lower(), item.get('stage'), doc_id, timestamp))
+        if not rows:
+            return
+
+        with self.lock:
+            self.conn.executemany("""
+                INSERT INTO words (word, count, first_doc, first_seen, last_seen)
+                VALUES (?, 1, ?, ?, ?)
+                ON CONFLICT (word) DO UPDATE SET
+                    count = count + 1,
+                    last_seen = MAX(last_seen, excluded.last_seen)
+            """, [(word, doc_id, ts, ts) for word, _, doc_id, ts in rows])
+            self.conn.executemany("""
+                INSERT INTO word_stages (word, stage, count) VALUES (?, ?, 1)
+                ON CONFLICT (word, stage) DO UPDATE SET count = count + 1
+            """, [(word, stage or '') for word, stage, _, _ in rows])
+            self.conn.executemany(
+                "INSERT INTO doc_words (doc_id, word, stage, timestamp) VALUES (?, ?, ?, ?)",
+                [(doc_id, word, stage, ts) for word, stage, doc_id, ts in rows])
+            self.conn.commit()
+
+    def summary(self):
+        """Return distinct words, total occurrences and documents seen"""
+        with self.lock:
+            distinct, occurrences = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(count), 0) FROM words").fetchone()
+            documents = self.conn.execute(
+                "SELECT COUNT(DISTINCT doc_id) FROM doc_words").fetchone()[0]
+        return {'distinct_words': distinct, 'occurrences': occurrences,
+                'documents': documents}
+
+    def vocabulary_size(self, learned_words=()):
+        """Number of distinct words learned, counting learned_words not recorded yet"""
+        words = sorted({item['word'].lower() for item in learned_words})
+        with self.lock:
+            total = self.conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+            if not words:
+                return total
+            known = self.conn.execute(
+                f"SELECT COUNT(*) FROM words WHERE word IN ({','.join('?' * len(words))})",
+                words).fetchone()[0]
+        return total + len(words) - known
+
+    def top(self, limit=20, stage=None):
+        """Most frequent words, optionally for one stage"""
+        with self.lock:
+            if stage:
+                rows = self.conn.execute("""
+                    SELECT w.word, s.count, w.first_doc, w.first_seen
+                    FROM word_stages s JOIN words w ON w.word = s.word
+                    WHERE s.stage = ? ORDER BY s.count DESC, s.word LIMIT ?
+                """, (stage, limit)).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT word, count, first_doc, first_seen FROM words "
+                    "ORDER BY count DESC, word LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def prefix(self, prefix, limit=20):
+        """Words starting with prefix, alphabetically"""
+        prefix = prefix.lower()
+        with self.lock:
+            # A range scan on the primary key instead of LIKE
+            rows = self.conn.execute(
+                "SELECT word, count, first_doc, first_seen FROM words "
+                "WHERE word >= ? AND word < ? ORDER BY word LIMIT ?",
+                (prefix, prefix + '\uffff', limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def word(self, word):
+        """One word with its per-stage counts, or None"""
+        word = word.lower()
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM words WHERE word = ?", (word,)).fetchone()
+            if row is None:
+                return None
+            stages = {r['stage']: r['count'] for r in self.conn.execute(
+                "SELECT stage, count FROM word_stages WHERE word = ?", (word,))}
+        return dict(row, stages=stages)
+
+    def document(self, doc_id):
+        """Words learned from one document"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT word, stage, timestamp FROM doc_words WHERE doc_id = ? ORDER BY rowid",
+                (doc_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear(self):
+        """Remove every word"""
+        with self.lock:
+            for table in ('words', 'word_stages', 'doc_words'):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.commit()
+
+
+def main():
+    """Lexicon maintenance: rebuild | top [N]"""
+    from advanced_processor import LEXICON_DB, get_catalog
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('rebuild', 'top'):
+        print("Usage: python3 lexicon_store.py rebuild|top [N]")
+        sys.exit(1)
+
+    lexicon = LexiconStore(LEXICON_DB)
+
+    if sys.argv[1] == 'rebuild':
+        # Replay learned_words from every package's METADATA
+        lexicon.clear()
+        batch = []
+        for doc_id, metadata in get_catalog().scan_packages():
+            if metadata:
+                batch.append((metadata.get('document_id', doc_id),
+                              metadata.get('learned_words', [])))
+            if len(batch) >= 1000:
+                lexicon.record_many(batch)
+                batch = []
+        lexicon.record_many(batch)
+        summary = lexicon.summary()
+        print(f"✅ Lexicon rebuilt: {summary['distinct_words']} words "
+              f"from {summary['documents']} documents")
+    else:
+        limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        for entry in lexicon.top(limit):
+            print(f"{entry['count']:>8}  {entry['word']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Metrics
+Counters, gauges and histograms rendered in the Prometheus text format
+"""
+
+import math
+import threading
+from bisect import bisect_left
+
+# Seconds; spans sub-millisecond API hits up to minute-long documents
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def label_key(labels):
+    """Hashable, ordered form of a label dict"""
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key, extra=()):
+    """{name="value",...} with Prometheus escaping, or '' without labels"""
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    """Sample value as Prometheus writes it"""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Metrics whose updates go to a per-thread shard
+
+    A thread only ever writes its own shard, so recording takes no lock;
+    a scrape copies and sums the shards of every thread.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.shards = []
+        self.local = threading.local()
+        self.lock = threading.Lock()  # Only taken when a thread creates its shard
+
+    def shard(self):
+        """This thread's {(metric, labels): value} dict"""
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def merged(self, metric):
+        """{labels: value} of one metric, summed over every shard"""
+        with self.lock:
+            shards = list(self.shards)
+        totals = {}
+        for shard in shards:
+            for (name, labels), value in shard.copy().items():
+                if name == metric.name:
+                    totals[labels] = metric.merge(totals.get(labels), value)
+        return totals
+
+    def counter(self, name, help):
+        return self.register(Counter(self, name, help))
+
+    def gauge(self, name, help, function=None):
+        return self.register(Gauge(self, name, help, function))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(self, name, help, buckets))
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    """Monotonic count, optionally split by labels"""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, help):
+        self.registry = registry
+        self.name = name
+        self.help = help
+
+    def inc(self, value=1, **labels):
+        shard = self.registry.shard()
+        key = (self.name, label_key(labels))
+        shard[key] = shard.get(key, 0) + value
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def values(self):
+        """{labels: value} as of now"""
+        return self.registry.merged(self)
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield f"{self.name}{format_labels(labels)} {format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that goes up and down, or is read from function() at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help, function=None):
+        super().__init__(registry, name, help)
+        self.function = function  # () -> number, or [(labels dict, number)]
+
+    def dec(self, value=1, **labels):
+        self.inc(-value, **labels)
+
+    def values(self):
+        if self.function is None:
+            return super().values()
+        try:
+            value = self.function()
+        except Exception:
+            return {}
+        if isinstance(value, list):
+            return {label_key(labels): number for labels, number in value}
+        return {(): value}
+
+
+class Histogram(Counter):
+    """Distribution of observations in cumulative buckets, with sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self.registry.shard()
+        key = (self.name, label_key(labels))
+        counts = shard.get(key)
+        if counts is None:
+            # One slot per bucket plus +Inf, then sum and count
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def merge(self, total, value):
+        value = list(value)
+        if total is None:
+            return value
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self):
+        for labels, counts in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (f"{self.name}_bucket{format_labels(labels, [('le', format_value(bound))])} "
+                       f"{cumulative}")
+            yield f"{self.name}_sum{format_labels(labels)} {format_value(counts[-2])}"
+            yield f"{self.name}_count{format_labels(labels)} {counts[-1]}"
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Package Archive
+Append-only segment files that hold completed packages instead of one directory each
+
+Generated artifacts are concatenated into archive/<date>-<n>.pack and
+located through an offset index in SQLite. Originals stay in the blob
+store and are referenced by digest, so an archived package costs no
+inodes of its own.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from blob_store import hash_file
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+SEGMENT_LIMIT = 1024 * 1024 * 1024
+ARTIFACT_SUFFIXES = ('_METADATA.json', '_ADVENTURE.md', '_LEARNING.md', '_CERTIFICATE.md')
+MIGRATE_BATCH = 500
+COMPACT_RATIO = 0.5  # Rewrite segments that are less than half live
+
+
+class PackageArchive:
+    """Segments of packed artifacts with an (doc_id, name) -> location index"""
+
+    def __init__(self, directory, db_path):
+        self.directory = Path(directory)
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+        self.maps = {}  # segment -> (file, mmap)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the entries table"""
+        with self.lock:
+            # segment is NULL for originals, which live in the blob store (sha256)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    doc_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    segment TEXT,
+                    offset INTEGER,
+                    size INTEGER NOT NULL,
+                    mtime REAL,
+                    sha256 TEXT,
+                    PRIMARY KEY (doc_id, name)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_segment ON entries (segment)")
+            self.conn.commit()
+
+    # Writing
+
+    def current_segment(self, incoming, avoid=None):
+        """Name of the segment to append incoming bytes to"""
+        today = datetime.now().strftime('%Y%m%d')
+        existing = sorted(self.directory.glob(f'{today}-*.pack'))
+        if (existing and existing[-1].name != avoid
+                and existing[-1].stat().st_size + incoming <= SEGMENT_LIMIT):
+            return existing[-1].name
+        number = int(existing[-1].stem.split('-')[1]) + 1 if existing else 1
+        return f"{today}-{number:04d}.pack"
+
+    def append(self, packages, avoid=None):
+        """Pack packages [(doc_id, [(name, bytes, mtime)], [(name, size, mtime, sha256)])]
+
+        Artifacts are appended to one segment and fsynced once; the index
+        rows for the whole batch are committed in one transaction.
+        """
+        if not packages:
+            return
+        incoming = sum(len(data) for _, artifacts, _ in packages for _, data, _ in artifacts)
+        rows = []
+
+        lock_fd = os.open(self.directory / '.append.lock', os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)  # One appender across processes
+            segment = self.current_segment(incoming, avoid)
+            with open(self.directory / segment, 'ab') as f:
+                offset = f.tell()
+                for doc_id, artifacts, originals in packages:
+                    for name, data, mtime in artifacts:
+                        f.write(data)
+                        rows.append((doc_id, name, segment, offset, len(data), mtime, None))
+                        offset += len(data)
+                    for name, size, mtime, sha256 in originals:
+                        rows.append((doc_id, name, None, None, size, mtime, sha256))
+                f.flush()
+                os.fsync(f.fileno())
+
+            with self.lock:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self.conn.commit()
+        finally:
+            os.close(lock_fd)
+
+    def remove(self, doc_ids):
+        """Drop packages from the index (their bytes become dead space)"""
+        with self.lock:
+            self.conn.executemany("DELETE FROM entries WHERE doc_id = ?",
+                                  [(doc_id,) for doc_id in doc_ids])
+            self.conn.commit()
+
+    # Reading
+
+    def has(self, doc_id):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM entries WHERE doc_id = ? LIMIT 1",
+                                     (doc_id,)).fetchone() is not None
+
+    def entries(self, doc_id):
+        """Index rows of one package"""
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(
+                "SELECT * FROM entries WHERE doc_id = ? ORDER BY name", (doc_id,))]
+
+    def find(self, doc_id, suffix=None):
+        """The artifact ending in suffix, or the original when suffix is None"""
+        for entry in self.entries(doc_id):
+            if suffix is None and entry['segment'] is None:
+                return entry
+            if suffix is not None and entry['name'].endswith(suffix):
+                return entry
+        return None
+
+    def segment_path(self, entry):
+        return self.directory / entry['segment']
+
+    def read(self, entry):
+        """Bytes of a packed artifact, sliced from the segment's memory map"""
+        with self.lock:
+            mapped = self.maps.get(entry['segment'])
+            end = entry['offset'] + entry['size']
+            if mapped is None or len(mapped[1]) < end:
+                # Segments only grow, so a short map is replaced by a longer one
+                if mapped:
+                    mapped[1].close()
+                    mapped[0].close()
+                f = open(self.segment_path(entry), 'rb')
+                mapped = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                self.maps[entry['segment']] = mapped
+            return mapped[1][entry['offset']:end]
+
+    def scan(self):
+        """Yield (doc_id, metadata) for every archived package"""
+        with self.lock:
+            entries = [dict(row) for row in self.conn.execute(
+                "SELECT * FROM entries WHERE name LIKE '%\\_METADATA.json' ESCAPE '\\'")]
+        for entry in entries:
+            try:
+                yield entry['doc_id'], json.loads(self.read(entry))
+            except (OSError, ValueError):
+                yield entry['doc_id'], None
+
+    def blob_digests(self):
+        """Digests of every original the archive references"""
+        with self.lock:
+            return {row[0] for row in self.conn.execute(
+                "SELECT sha256 FROM entries WHERE sha256 IS NOT NULL")}
+
+    def close_maps(self):
+        with self.lock:
+            for f, mapped in self.maps.values():
+                mapped.close()
+                f.close()
+            self.maps = {}
+
+    # Maintenance
+
+    def migrate(self, packages_dir, blobs, older_than=0):
+        """Pack package directories older than older_than seconds, then remove them
+
+        Returns the number of packages migrated.
+        """
+        cutoff = time.time() - older_than
+        migrated = 0
+        batch = []
+        directories = []
+
+        def flush():
+            nonlocal migrated
+            self.append(batch)
+            for package_dir in directories:
+                shutil.rmtree(package_dir)
+            migrated += len(directories)
+            batch.clear()
+            directories.clear()
+
+        packages_dir = Path(packages_dir)
+        for package_dir in sorted(packages_dir.iterdir()) if packages_dir.is_dir() else []:
+            if not package_dir.is_dir() or package_dir.stat().st_mtime > cutoff:
+                continue
+            if self.has(package_dir.name):
+                directories.append(package_dir)  # Packed before a crash; just remove it
+                continue
+
+            artifacts = []
+            originals = []
+            for path in sorted(package_dir.iterdir()):
+                stat = path.stat()
+                if path.name.endswith(ARTIFACT_SUFFIXES):
+                    artifacts.append((path.name, path.read_bytes(), stat.st_mtime))
+                else:
+                    digest = hash_file(path)
+                    # The package directory is removed below, so its original
+                    # can be renamed into the store rather than copied
+                    blobs.put(path, digest, 'move')
+                    blobs.record(digest, stat.st_size, package_dir.name)
+                    originals.append((path.name, stat.st_size, stat.st_mtime, digest))
+
+            batch.append((package_dir.name, artifacts, originals))
+            directories.append(package_dir)
+            if len(directories) >= MIGRATE_BATCH:
+                flush()
+
+        flush()
+        return migrated
+
+    def compact(self, ratio=COMPACT_RATIO):
+        """Rewrite segments whose live bytes fall below ratio; returns bytes reclaimed"""
+        reclaimed = 0
+        for path in sorted(self.directory.glob('*.pack')):
+            with self.lock:
+                live = [dict(row) for row in self.conn.execute(
+                    "SELECT * FROM entries WHERE segment = ? ORDER BY offset", (path.name,))]
+            size = path.stat().st_size
+            live_bytes = sum(entry['size'] for entry in live)
+            if size == 0 or live_bytes / size >= ratio:
+                continue
+
+            # Copy live artifacts into a fresh segment, then retire the old one
+            by_doc = {}
+            for entry in live:
+                by_doc.setdefault(entry['doc_id'], []).append(
+                    (entry['name'], self.read(entry), entry['mtime']))
+            self.append([(doc_id, artifacts, []) for doc_id, artifacts in by_doc.items()],
+                        avoid=path.name)
+
+            with self.lock:
+                mapped = self.maps.pop(path.name, None)
+                if mapped:
+                    mapped[1].close()
+                    mapped[0].close()
+            path.unlink()
+            reclaimed += size - live_bytes
+        return reclaimed
+
+    def stats(self):
+        """Packages, segments and bytes held by the archive"""
+        with self.lock:
+            packages, artifacts, live = self.conn.execute(
+                "SELECT COUNT(DISTINCT doc_id), COUNT(segment), "
+                "COALESCE(SUM(CASE WHEN segment IS NOT NULL THEN size END), 0) "
+                "FROM entries").fetchone()
+        segments = list(self.directory.glob('*.pack'))
+        return {
+            'packages': packages,
+            'artifacts': artifacts,
+            'segments': len(segments),
+            'segment_bytes': sum(p.stat().st_size for p in segments),
+            'live_bytes': live
+        }
+
+
+def main():
+    """Archive maintenance: migrate [--older-than HOURS] | compact | stats"""
+    from advanced_processor import COMPLETE_PACKAGES, get_blob_store, get_package_archive
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('migrate', 'compact', 'stats'):
+        print("Usage: python3 package_archive.py migrate [--older-than HOURS] | compact | stats")
+        sys.exit(1)
+
+    archive = get_package_archive()
+
+    if sys.argv[1] == 'migrate':
+        hours = 0.0
+        if '--older-than' in sys.argv:
+            hours = float(sys.argv[sys.argv.index('--older-than') + 1])
+        count = archive.migrate(COMPLETE_PACKAGES, get_blob_store(), hours * 3600)
+        print(f"✅ Migrated {count} packages into the archive")
+    elif sys.argv[1] == 'compact':
+        print(f"✅ Reclaimed {archive.compact()} bytes")
+    else:
+        for key, value in archive.stats().items():
+            print(f"{key + ':':<15} {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Package Catalog
+SQLite index of completed packages, kept up to date as packages are written
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+SORT_COLUMNS = ('processed_at', 'doc_id', 'filename', 'symbol', 'learned_words', 'file_size')
+
+
+class PackageCatalog:
+    """Catalog of completed packages backed by SQLite"""
+
+    def __init__(self, db_path, packages_dir, archive=None):
+        self.db_path = Path(db_path)
+        self.packages_dir = Path(packages_dir)
+        self.archive = archive  # PackageArchive holding packed packages, if any
+        self.lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Worker processes write concurrently, so wait on locks and use WAL
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the packages, removed and meta tables"""
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS packages (
+                    doc_id TEXT PRIMARY KEY,
+                    journey_id TEXT,
+                    filename TEXT,
+                    symbol TEXT,
+                    processed_at TEXT,
+                    learned_words INTEGER,
+                    file_size INTEGER,
+                    file_type TEXT,
+                    seq INTEGER
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS packages_processed_at "
+                              "ON packages (processed_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS packages_symbol "
+                              "ON packages (symbol, processed_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS packages_seq "
+                              "ON packages (seq)")
+
+            # Removals are remembered so delta listings can report them
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS removed (
+                    doc_id TEXT PRIMARY KEY,
+                    seq INTEGER
+                )
+            """)
+
+            # generation changes on rebuild; seq counts write transactions
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('generation', ?)",
+                              (os.urandom(4).hex(),))
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('seq', '0')")
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('modified', ?)",
+                              (str(time.time()),))
+            self.conn.commit()
+
+    def next_seq(self):
+        """Start a write transaction and return its sequence number"""
+        # The UPDATE takes the write lock, so writers in other processes wait
+        self.conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 "
+                          "WHERE key = 'seq'")
+        self.conn.execute("UPDATE meta SET value = ? WHERE key = 'modified'",
+                          (str(time.time()),))
+        return int(self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'seq'").fetchone()[0])
+
+    def version(self):
+        """Return (version token, modified timestamp) of the catalog"""
+        with self.lock:
+            meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        return f"{meta['generation']}.{meta['seq']}", float(meta['modified'])
+
+    def row_from_metadata(self, metadata):
+        """Build a catalog row from a package METADATA dict"""
+        return (
+            metadata.get('document_id'),
+            metadata.get('journey_id'),
+            metadata.get('original_filename'),
+            metadata.get('economic_symbol'),
+            metadata.get('processed_at'),
+            len(metadata.get('learned_words', [])),
+            metadata.get('file_size'),
+            metadata.get('file_type'),
+        )
+
+    def to_listing(self, row):
+        """Convert a packages row to a listing entry"""
+        return {
+            'doc_id': row['doc_id'],
+            'filename': row['filename'],
+            'symbol': row['symbol'],
+            'processed_at': row['processed_at'],
+            'learned_words': row['learned_words']
+        }
+
+    def add(self, metadata):
+        """Add or replace one package"""
+        self.add_many([metadata])
+
+    def add_many(self, metadata_list):
+        """Add or replace many packages in one transaction"""
+        if not metadata_list:
+            return
+        rows = [self.row_from_metadata(m) for m in metadata_list]
+        with self.lock:
+            seq = self.next_seq()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO packages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*row, seq) for row in rows])
+            self.conn.executemany("DELETE FROM removed WHERE doc_id = ?",
+                                  [(row[0],) for row in rows])
+            self.conn.commit()
+
+    def remove(self, doc_ids):
+        """Remove packages from the catalog"""
+        if not doc_ids:
+            return
+        with self.lock:
+            seq = self.next_seq()
+            self.conn.executemany("DELETE FROM packages WHERE doc_id = ?",
+                                  [(doc_id,) for doc_id in doc_ids])
+            self.conn.executemany("INSERT OR REPLACE INTO removed VALUES (?, ?)",
+                                  [(doc_id, seq) for doc_id in doc_ids])
+            self.conn.commit()
+
+    def changes_since(self, token, symbol=None):
+        """Return (changed packages, removed doc_ids) since a version token
+
+        Returns None when the token belongs to another generation of the
+        catalog and the caller needs a full listing instead.
+        """
+        try:
+            generation, seq = token.split('.')
+            seq = int(seq)
+        except ValueError:
+            return None
+
+        with self.lock:
+            current = self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            if generation != current:
+                return None
+
+            if symbol:
+                rows = self.conn.execute(
+                    "SELECT * FROM packages WHERE seq > ? AND symbol = ? "
+                    "ORDER BY seq DESC, doc_id DESC", (seq, symbol)).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT * FROM packages WHERE seq > ? "
+                    "ORDER BY seq DESC, doc_id DESC", (seq,)).fetchall()
+            removed = [row[0] for row in self.conn.execute(
+                "SELECT doc_id FROM removed WHERE seq > ?", (seq,))]
+
+        return [self.to_listing(row) for row in rows], removed
+
+    def get_many(self, doc_ids):
+        """Return {doc_id: listing entry} for the cataloged doc_ids"""
+        found = {}
+        doc_ids = list(doc_ids)
+        with self.lock:
+            for start in range(0, len(doc_ids), 500):
+                chunk = doc_ids[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT * FROM packages WHERE doc_id IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                found.update((row['doc_id'], self.to_listing(row)) for row in rows)
+        return found
+
+    def count(self, symbol=None):
+        """Return the number of cataloged packages (with a symbol, if given)"""
+        with self.lock:
+            if symbol:
+                return self.conn.execute("SELECT COUNT(*) FROM packages WHERE symbol = ?",
+                                         (symbol,)).fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM packages").fetchone()[0]
+
+    def query(self, limit=100, offset=0, sort='processed_at', order='desc',
+              symbol=None, date_from=None, date_to=None):
+        """Return (packages, total) for one page of the catalog"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Invalid sort column: {sort}")
+        direction = 'ASC' if order == 'asc' else 'DESC'
+
+        where = []
+        params = []
+        if symbol:
+            where.append("symbol = ?")
+            params.append(symbol)
+        if date_from:
+            where.append("processed_at >= ?")
+            params.append(date_from)
+        if date_to:
+            # A bare date includes the whole day
+            where.append("processed_at <= ?")
+            params.append(date_to if 'T' in date_to else date_to + 'T99')
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self.lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM packages {clause}",
+                                      params).fetchone()[0]
+            rows = self.conn.execute(
+                f"SELECT * FROM packages {clause} "
+                f"ORDER BY {sort} {direction}, doc_id {direction} LIMIT ? OFFSET ?",
+                (*params, limit, offset)).fetchall()
+
+        return [self.to_listing(row) for row in rows], total
+
+    def read_metadata(self, package_dir):
+        """Read the METADATA file of a package directory, or None"""
+        metadata_files = list(package_dir.glob('*_METADATA.json'))
+        if not metadata_files:
+            return None
+        try:
+            with open(metadata_files[0], 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def scan_packages(self):
+        """Yield (doc_id, metadata) for every package on disk, directory or archived"""
+        seen = set()
+        if self.packages_dir.exists():
+            for package_dir in self.packages_dir.iterdir():
+                if package_dir.is_dir():
+                    seen.add(package_dir.name)
+                    yield package_dir.name, self.read_metadata(package_dir)
+        if self.archive is not None:
+            for doc_id, metadata in self.archive.scan():
+                if doc_id not in seen:
+                    yield doc_id, metadata
+
+    def rebuild(self):
+        """Rebuild the catalog from the package directories"""
+        batch = []
+        with self.lock:
+            # A new generation invalidates every outstanding version token
+            self.conn.execute("DELETE FROM packages")
+            self.conn.execute("DELETE FROM removed")
+            self.conn.execute("UPDATE meta SET value = ? WHERE key = 'generation'",
+                              (os.urandom(4).hex(),))
+            self.conn.commit()
+
+        for _, metadata in self.scan_packages():
+            if metadata:
+                batch.append(metadata)
+            if len(batch) >= 1000:
+                self.add_many(batch)
+                batch = []
+        if batch:
+            self.add_many(batch)
+
+        return self.count()
+
+    def verify(self, fix=False):
+        """Compare the catalog with the disk; optionally repair differences"""
+        with self.lock:
+            cataloged = {row[0] for row in
+                         self.conn.execute("SELECT doc_id FROM packages")}
+
+        on_disk = {}
+        unreadable = []
+        for doc_id, metadata in self.scan_packages():
+            if metadata:
+                on_disk[doc_id] = metadata
+            else:
+                unreadable.append(doc_id)
+
+        missing = sorted(set(on_disk) - cataloged)
+        stale = sorted(cataloged - set(on_disk))
+
+        if fix:
+            self.add_many([on_disk[doc_id] for doc_id in missing])
+            self.remove(stale)
+
+        return {
+            'cataloged': len(cataloged),
+            'on_disk': len(on_disk),
+            'missing_from_catalog': missing,
+            'missing_on_disk': stale,
+            'unreadable': sorted(unreadable),
+            'ok': not missing and not stale
+        }
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
+
+
+def main():
+    """Catalog maintenance: rebuild | verify [--fix]"""
+    from advanced_processor import get_catalog
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('rebuild', 'verify'):
+        print("Usage: python3 package_catalog.py rebuild|verify [--fix]")
+        sys.exit(1)
+
+    catalog = get_catalog()
+
+    if sys.argv[1] == 'rebuild':
+        print(f"✅ Catalog rebuilt: {catalog.rebuild()} packages")
+    else:
+        report = catalog.verify(fix='--fix' in sys.argv)
+        print(f"Cataloged:            {report['cataloged']}")
+        print(f"On disk:              {report['on_disk']}")
+        print(f"Missing from catalog: {len(report['missing_from_catalog'])}")
+        print(f"Missing on disk:      {len(report['missing_on_disk'])}")
+        print(f"Unreadable metadata:  {len(report['unreadable'])}")
+        if not report['ok'] and '--fix' not in sys.argv:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Package Writer
+Builds packages in a staging directory and publishes each with one atomic rename
+"""
+
+import ctypes
+import ctypes.util
+import os
+import shutil
+import time
+from pathlib import Path
+
+# Staging directories older than this are left over from a crash
+STALE_STAGING = 600
+
+
+def fsync_path(path, directory=False):
+    """fsync a file or directory by path"""
+    fd = os.open(path, os.O_RDONLY | (os.O_DIRECTORY if directory else 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_filesystem(path):
+    """Flush the whole filesystem holding path with syncfs(2); False if unavailable"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        syncfs = libc.syncfs
+    except (OSError, AttributeError):
+        return False
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return syncfs(fd) == 0
+    finally:
+        os.close(fd)
+
+
+class StagedPackage:
+    """A package being written, invisible until it is published"""
+
+    def __init__(self, doc_id, path, final_path):
+        self.doc_id = doc_id
+        self.path = Path(path)
+        self.final_path = Path(final_path)
+        self.files = []
+
+    def write(self, name, content):
+        """Write a text or bytes artifact into the package"""
+        target = self.path / name
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(target, mode) as f:
+            f.write(content)
+        self.files.append(target)
+        return target
+
+    def add(self, name):
+        """Register a file placed in the package by other means (e.g. a hardlink)"""
+        target = self.path / name
+        self.files.append(target)
+        return target
+
+
+class PackageWriter:
+    """Stages packages under staging_dir and renames them into packages_dir
+
+    Both directories must be on the same filesystem.
+    """
+
+    def __init__(self, packages_dir, staging_dir):
+        self.packages_dir = Path(packages_dir)
+        self.staging_dir = Path(staging_dir)
+        self.packages_dir.mkdir(parents=True, exist_ok=True)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def stage(self, doc_id):
+        """Claim a staging directory for doc_id (FileExistsError if taken)"""
+        if (self.packages_dir / doc_id).exists():
+            raise FileExistsError(doc_id)
+        path = self.staging_dir / doc_id
+        path.mkdir()
+        return StagedPackage(doc_id, path, self.packages_dir / doc_id)
+
+    def publish(self, staged):
+        """Make one package durable, then visible"""
+        for path in staged.files:
+            fsync_path(path)
+        fsync_path(staged.path, directory=True)
+        self.rename(staged)
+        fsync_path(self.packages_dir, directory=True)
+
+    def publish_many(self, staged_list):
+        """Group commit: one filesystem flush and one directory fsync for a batch"""
+        if not staged_list:
+            return
+        if not sync_filesystem(self.staging_dir):
+            for staged in staged_list:
+                for path in staged.files:
+                    fsync_path(path)
+                fsync_path(staged.path, directory=True)
+        for staged in staged_list:
+            self.rename(staged)
+        fsync_path(self.packages_dir, directory=True)
+
+    def rename(self, staged):
+        """Move a staged package into place; never replaces an existing package"""
+        # rename() onto a non-empty directory fails instead of overwriting it
+        os.rename(staged.path, staged.final_path)
+
+    def discard(self, staged):
+        """Throw away a staged package"""
+        shutil.rmtree(staged.path, ignore_errors=True)
+
+    def recover(self, max_age=STALE_STAGING):
+        """Remove staging directories abandoned by a crash; returns how many"""
+        removed = 0
+        cutoff = time.time() - max_age
+        for path in self.staging_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+class PackageBatch:
+    """Packages published together, with their catalog entries in one transaction"""
+
+    def __init__(self, writer, catalog=None):
+        self.writer = writer
+        self.catalog = catalog
+        self.pending = []  # (staged, metadata, on_publish, on_discard)
+
+    def add(self, staged, metadata=None, on_publish=None, on_discard=None):
+        """Queue a staged package for the next commit
+
+        on_publish runs after the commit, on_discard if the package is
+        thrown away instead.
+        """
+        self.pending.append((staged, metadata, on_publish, on_discard))
+
+    def commit(self):
+        """Publish every queued package; returns how many"""
+        pending, self.pending = self.pending, []
+        if not pending:
+            return 0
+        try:
+            self.writer.publish_many([staged for staged, _, _, _ in pending])
+        except BaseException:
+            self.pending = pending  # Left for discard()
+            raise
+        if self.catalog is not None:
+            self.catalog.add_many([metadata for _, metadata, _, _ in pending if metadata])
+        for _, _, on_publish, _ in pending:
+            if on_publish:
+                on_publish()
+        return len(pending)
+
+    def discard(self):
+        """Throw away every queued package that was not published"""
+        pending, self.pending = self.pending, []
+        for staged, _, _, on_discard in pending:
+            if not staged.path.exists():
+                continue  # Renamed into place before a commit failed
+            self.writer.discard(staged)
+            if on_discard:
+                try:
+                    on_discard()
+                except Exception as e:
+                    print(f"⚠️ Discarding {staged.doc_id}: {e}")
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
@@ -6,39 +6,350 @@ Connects the UI to real document processing
 
 import http.server
 import socketserver
+import argparse
+import errno
 import json
+import math
+import mimetypes
+import multiprocessing
 import os
+import pstats
+import queue
 import sys
 import threading
 import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import urllib.parse
-import shutil
+from email.utils import formatdate, parsedate_to_datetime
 
 # Add current directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
-from advanced_processor import DocumentProcessor
+from advanced_processor import (process_path, create_process_pool, determine_economic_symbols,
+                                get_catalog, get_lexicon, get_search_index,
+                                get_package_writer, get_package_archive, get_blob_store,
+                                set_stage_listener)
+from artifact_cache import ArtifactCache
+from job_queue import JobQueue
+from change_tracker import ChangeTracker
+from incoming_snapshot import IncomingSnapshot
+from incoming_watcher import IncomingWatcher
+from ingest_transfer import TRANSFER_MODES
+from event_stream import EventBus, format_event
+from metrics import MetricsRegistry
+from profiling import ProfileSession, SpanRecorder, chrome_trace
+from upload_stream import UploadError, iter_body, save_raw, save_multipart, multipart_boundary
 
 PORT = 8000
+SEND_CHUNK = 8 * 1024 * 1024  # bytes per os.sendfile call
 BASE_DIR = Path(__file__).parent.resolve()
 
 # Directories
-INCOMING = Path("/home/sauron/portofentry_external/incoming")
+INCOMING = Path(os.environ.get('PORTOFENTRY_INCOMING', "/home/sauron/portofentry_external/incoming"))
 INTERNAL = BASE_DIR / "portofentry_internal"
 COMPLETE_PACKAGES = INTERNAL / "complete_packages"
+JOBS_DB = INTERNAL / "jobs.sqlite3"
 
 # Ensure directories exist
 INCOMING.mkdir(parents=True, exist_ok=True)
 COMPLETE_PACKAGES.mkdir(parents=True, exist_ok=True)
 
+# Worker pools (override with --http-workers / --process-workers / --pool)
+HTTP_WORKERS = int(os.environ.get('PORTOFENTRY_HTTP_WORKERS', 16))
+PROCESS_WORKERS = int(os.environ.get('PORTOFENTRY_PROCESS_WORKERS', os.cpu_count() or 2))
+POOL_KIND = os.environ.get('PORTOFENTRY_POOL', 'process')
+
+# How originals enter packages: move (rename when possible), link or copy
+INGEST_TRANSFER = os.environ.get('PORTOFENTRY_TRANSFER', 'move')
+
+# Skip processing of files whose bytes were ingested before (--skip-duplicates)
+SKIP_DUPLICATES = os.environ.get('PORTOFENTRY_SKIP_DUPLICATES', '') == '1'
+
+# Largest accepted /api/upload file in bytes (0 = no limit)
+UPLOAD_MAX_BYTES = int(os.environ.get('PORTOFENTRY_UPLOAD_MAX', 0))
+
+# Automatic ingest of files landing in INCOMING (--watch / --settle)
+WATCH_INCOMING = os.environ.get('PORTOFENTRY_WATCH', '') == '1'
+WATCH_SETTLE = float(os.environ.get('PORTOFENTRY_WATCH_SETTLE', 2.0))
+
+# Memory for ready-to-send /api/package responses (--artifact-cache-mb; 0 disables)
+ARTIFACT_CACHE_BYTES = int(os.environ.get('PORTOFENTRY_ARTIFACT_CACHE', 64 * 1024 * 1024))
+
+# Document type shown in listings, by extension
+DOCUMENT_TYPES = {
+    'pdf': 'research',
+    'md': 'code',
+    'py': 'code',
+    'js': 'code',
+    'xlsx': 'financial',
+    'csv': 'financial',
+    'docx': 'legal',
+    'doc': 'legal',
+    'txt': 'creative'
+}
+
+# Where a package file's bytes are: a whole file, or a slice of an archive segment
+PackageFile = namedtuple('PackageFile', 'path offset size name mtime etag entry')
+
 # Stats
 stats = {
     'total_processed': 0,
     'session_processed': 0,
     'total_learned': 0,
+    'duplicates_skipped': 0,
     'server_started': datetime.now().isoformat()
 }
+stats_lock = threading.Lock()
+
+# Version stamps for conditional GET and ?since= deltas
+stats_tracker = ChangeTracker()
+documents_tracker = ChangeTracker()
+
+# Bounded pool that runs DocumentProcessor work, created in main()
+processing_pool = None
+
+# Persistent queue for asynchronous submissions, created in main()
+job_queue = None
+
+# Watcher that queues settled incoming files, created in main() with --watch
+incoming_watcher = None
+
+# Serialized /api/package/<doc_id>/<type> bodies, keyed by the file version
+artifact_cache = ArtifactCache(ARTIFACT_CACHE_BYTES)
+
+# Live events for /api/events (stage progress, new packages, stats)
+event_bus = EventBus()
+server_stopping = threading.Event()
+
+# Instrumentation behind /api/metrics; each thread records into its own shard
+metrics = MetricsRegistry()
+phase_seconds = metrics.histogram('portofentry_process_phase_seconds',
+                                  'Time spent in each phase of process_document')
+document_seconds = metrics.histogram('portofentry_ingest_seconds',
+                                     'Time to ingest one document, including the wait for a worker')
+documents_total = metrics.counter('portofentry_documents_total',
+                                  'Documents ingested, by outcome')
+ingested_bytes = metrics.counter('portofentry_ingested_bytes_total',
+                                 'Bytes of originals turned into packages')
+uploaded_bytes = metrics.counter('portofentry_uploaded_bytes_total',
+                                 'Bytes saved into incoming by /api/upload')
+request_seconds = metrics.histogram('portofentry_http_request_seconds',
+                                    'HTTP request latency by endpoint')
+requests_total = metrics.counter('portofentry_http_requests_total',
+                                 'HTTP requests by endpoint, method and status')
+ingest_in_flight = metrics.gauge('portofentry_ingest_in_flight',
+                                 'Documents being processed right now')
+metrics.gauge('portofentry_jobs', 'Jobs by status',
+              lambda: [({'status': status}, count) for status, count in job_queue.counts().items()])
+metrics.gauge('portofentry_job_backlog', 'Jobs waiting for a worker thread',
+              lambda: job_queue.pending.qsize())
+metrics.gauge('portofentry_incoming_documents', 'Files in incoming at the last listing',
+              lambda: incoming_snapshot.count())
+metrics.gauge('portofentry_search_pending_documents', 'Documents not yet compacted into a segment',
+              lambda: get_search_index().pending_count())
+metrics.gauge('portofentry_event_subscribers', 'Open /api/events streams',
+              lambda: len(event_bus.subscribers))
+metrics.gauge('portofentry_artifact_cache_bytes', 'Bytes of package responses held in memory',
+              lambda: artifact_cache.bytes)
+metrics.gauge('portofentry_artifact_cache_lookups', 'Package response cache lookups by result',
+              lambda: [({'result': 'hit'}, artifact_cache.hits),
+                       ({'result': 'miss'}, artifact_cache.misses)])
+metrics.gauge('portofentry_uptime_seconds', 'Seconds since the server started',
+              lambda: time.time() - SERVER_STARTED)
+
+# Recent process_document spans for /api/debug/trace
+span_recorder = SpanRecorder()
+
+# The /api/debug/profile window in progress, if any
+profile_session = None
+profile_lock = threading.Lock()
+
+# Endpoints reported by name; anything else is 'static' or 'other'
+METRIC_ENDPOINTS = {'documents', 'stats', 'complete', 'package', 'download', 'lexicon',
+                    'search', 'events', 'jobs', 'process', 'process_all', 'upload', 'metrics',
+                    'debug'}
+SERVER_STARTED = time.time()
+
+
+def endpoint_label(path):
+    """Bounded endpoint name for a request path: /api/<name>, static or other"""
+    path = urllib.parse.urlparse(path).path
+    if not path.startswith('/api/'):
+        return 'static'
+    name = path.split('/')[2]
+    return f'/api/{name}' if name in METRIC_ENDPOINTS else 'other'
+
+
+def record_ingest_metrics(result):
+    """Add a processing result's outcome, size and phase timings to the metrics"""
+    if not result.get('success'):
+        documents_total.inc(outcome='failed')
+        return
+    documents_total.inc(outcome='duplicate' if result.get('duplicate') else 'processed')
+    ingested_bytes.inc(result.get('file_size', 0))
+    for phase, seconds in result.get('timings', {}).items():
+        phase_seconds.observe(seconds, phase=phase)
+
+
+def record_processed(result):
+    """Add a successful processing result to the stats"""
+    with stats_lock:
+        if result.get('duplicate'):
+            stats['duplicates_skipped'] += 1
+            stats_tracker.bump()
+            return
+        stats['total_processed'] += 1
+        stats['session_processed'] += 1
+        stats['total_learned'] += len(result.get('learned_words', []))
+    stats_tracker.bump()
+
+
+def query_number(query, name, default, low=None, high=None, kind=int):
+    """Numeric query parameter clamped to [low, high]; ValueError naming it when malformed"""
+    raw = query.get(name, [''])[0]
+    if raw == '':
+        return default
+    try:
+        value = kind(raw)
+    except ValueError:
+        value = None
+    if value is None or not math.isfinite(value):
+        expected = 'an integer' if kind is int else 'a number'
+        raise ValueError(f"Invalid {name}: expected {expected}, got {raw[:40]!r}")
+    if low is not None:
+        value = max(low, value)
+    if high is not None:
+        value = min(high, value)
+    return value
+
+
+def format_size(bytes):
+    """Format file size"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if bytes < 1024.0:
+            return f"{bytes:.1f} {unit}"
+        bytes /= 1024.0
+    return f"{bytes:.1f} TB"
+
+
+def describe_documents(entries):
+    """Listing entries for incoming files [(name, path, stat)], classified in one batch"""
+    symbols = determine_economic_symbols([name for name, _, _ in entries])
+    return [{
+        'name': name,
+        'path': path,
+        'size': format_size(stat.st_size),
+        'type': DOCUMENT_TYPES.get(Path(name).suffix.lower().lstrip('.'), 'general'),
+        'symbol': symbol,
+        'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
+    } for (name, path, stat), symbol in zip(entries, symbols)]
+
+
+# Cached listing of INCOMING behind /api/documents
+incoming_snapshot = IncomingSnapshot(INCOMING, describe_documents)
+
+
+def publish_event(event):
+    """Publish a stage event dict from DocumentProcessor on the event bus"""
+    event = dict(event)
+    event_bus.publish(event.pop('type'), event)
+
+
+def relay_events(events):
+    """Move stage events from worker processes onto the event bus"""
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        publish_event(event)
+
+
+def snapshot_stats():
+    """Return a consistent copy of the stats"""
+    with stats_lock:
+        return dict(stats)
+
+
+def finish_ingest(doc_path, result):
+    """Remove a processed document from incoming and update stats"""
+    record_ingest_metrics(result)
+    span_recorder.record(result.pop('spans', []))
+    profile = result.pop('profile', None)
+    session = profile_session
+    if profile and session is not None:
+        session.add(profile)
+    if result['success']:
+        # Remove from incoming (already gone when the original was moved in)
+        try:
+            Path(doc_path).unlink()
+        except OSError:
+            pass
+
+        record_processed(result)
+        if result.get('duplicate'):
+            event_bus.publish('stats', {'stats': snapshot_stats(),
+                                        'version': stats_tracker.token()})
+            return result
+
+        event_bus.publish('package', {
+            'doc_id': result['doc_id'],
+            'filename': Path(doc_path).name,
+            'symbol': result['symbol'],
+            'learned_words': len(result.get('learned_words', []))
+        })
+        event_bus.publish('stats', {'stats': snapshot_stats(),
+                                    'version': stats_tracker.token()})
+
+        # Fold pending search documents into a segment once enough pile up
+        try:
+            get_search_index().maybe_compact()
+        except Exception as e:
+            print(f"⚠️ Search index compaction failed: {e}")
+
+    return result
+
+
+def run_ingest(doc_path):
+    """Process a document on the processing pool and wait for the result"""
+    started = time.perf_counter()
+    profile = profile_session is not None
+    ingest_in_flight.inc()
+    try:
+        if processing_pool is None:
+            result = process_path(str(doc_path), INGEST_TRANSFER, SKIP_DUPLICATES, profile)
+        else:
+            result = processing_pool.submit(process_path, str(doc_path), INGEST_TRANSFER,
+                                            SKIP_DUPLICATES, profile).result()
+    except Exception:
+        documents_total.inc(outcome='error')
+        raise
+    finally:
+        ingest_in_flight.dec()
+        document_seconds.observe(time.perf_counter() - started)
+    return finish_ingest(doc_path, result)
+
+
+class PooledHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """HTTP server that hands each connection to a fixed pool of threads"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=HTTP_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers,
+                                       thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        """Serve the connection on a pool thread"""
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
 
 
 class PortOfEntryServer(http.server.SimpleHTTPRequestHandler):
@@ -47,80 +358,168 @@ class PortOfEntryServer(http.server.SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=str(BASE_DIR), **kwargs)
 
+    def handle_one_request(self):
+        """Serve one request and record its latency and status"""
+        started = time.perf_counter()
+        self.command = None
+        self.status = None
+        super().handle_one_request()
+        if self.command is None:
+            return  # Connection closed or request line unreadable
+        endpoint = endpoint_label(self.path)
+        request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+        requests_total.inc(endpoint=endpoint, method=self.command, status=self.status or 0)
+
+    def send_response(self, code, message=None):
+        """Send the status line, remembering the status for the metrics"""
+        self.status = code
+        super().send_response(code, message)
+
     def do_GET(self):
         """Handle GET requests"""
         parsed_path = urllib.parse.urlparse(self.path)
 
         # API endpoints
         if parsed_path.path == '/api/documents':
-            self.list_documents()
+            self.list_documents(urllib.parse.parse_qs(parsed_path.query))
         elif parsed_path.path == '/api/stats':
             self.get_stats()
+        elif parsed_path.path == '/api/metrics':
+            self.get_metrics()
+        elif parsed_path.path == '/api/debug/profile':
+            self.run_profile(urllib.parse.parse_qs(parsed_path.query))
+        elif parsed_path.path == '/api/debug/trace':
+            self.export_trace(urllib.parse.parse_qs(parsed_path.query))
         elif parsed_path.path == '/api/complete':
-            self.list_complete()
+            self.list_complete(urllib.parse.parse_qs(parsed_path.query))
         elif parsed_path.path.startswith('/api/package/'):
             self.get_package_content(parsed_path.path)
+        elif parsed_path.path.startswith('/api/download/'):
+            self.download_package_file(parsed_path.path)
+        elif parsed_path.path == '/api/lexicon' or parsed_path.path.startswith('/api/lexicon/'):
+            self.query_lexicon(parsed_path.path, urllib.parse.parse_qs(parsed_path.query))
+        elif parsed_path.path == '/api/search':
+            self.search_packages(urllib.parse.parse_qs(parsed_path.query))
+        elif parsed_path.path == '/api/events':
+            self.stream_events()
+        elif parsed_path.path == '/api/jobs':
+            self.list_jobs(urllib.parse.parse_qs(parsed_path.query))
+        elif parsed_path.path.startswith('/api/jobs/'):
+            self.get_job(parsed_path.path)
         else:
             # Serve static files
             super().do_GET()
 
+    def do_HEAD(self):
+        """Handle HEAD requests"""
+        parsed_path = urllib.parse.urlparse(self.path)
+
+        if parsed_path.path.startswith('/api/download/'):
+            self.download_package_file(parsed_path.path, head=True)
+        else:
+            super().do_HEAD()
+
+    def do_PUT(self):
+        """Handle PUT requests"""
+        parsed_path = urllib.parse.urlparse(self.path)
+
+        if parsed_path.path == '/api/upload':
+            self.upload_document(urllib.parse.parse_qs(parsed_path.query))
+        else:
+            self.send_error(404, "API endpoint not found")
+
     def do_POST(self):
         """Handle POST requests"""
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
         parsed_path = urllib.parse.urlparse(self.path)
 
+        # Uploads are streamed, never read into memory
+        if parsed_path.path == '/api/upload':
+            self.upload_document(urllib.parse.parse_qs(parsed_path.query))
+            return
+
+        content_length = int(self.headers.get('Content-Length') or 0)
+        post_data = self.rfile.read(content_length)
+
         if parsed_path.path == '/api/process':
             self.process_document(post_data)
         elif parsed_path.path == '/api/process_all':
             self.process_all(post_data)
+        elif parsed_path.path == '/api/jobs':
+            self.bulk_job_status(post_data)
         else:
             self.send_error(404, "API endpoint not found")
 
-    def list_documents(self):
-        """List documents in incoming directory"""
+    def list_documents(self, query):
+        """List documents in incoming directory
+
+        ?since=<version> returns only changes; ?limit=&offset= (or &after=<name>)
+        returns one page; ?format=ndjson (or Accept: application/x-ndjson)
+        streams one document per line.
+        """
         try:
-            documents = []
-
-            if INCOMING.exists():
-                for file_path in sorted(INCOMING.iterdir()):
-                    if file_path.is_file() and not file_path.name.startswith('.'):
-                        # Get file info
-                        stat = file_path.stat()
-
-                        # Determine economic symbol
-                        processor = DocumentProcessor()
-                        symbol = processor.determine_economic_symbol(file_path.name)
-
-                        # Determine type
-                        ext = file_path.suffix.lower().lstrip('.')
-                        type_map = {
-                            'pdf': 'research',
-                            'md': 'code',
-                            'py': 'code',
-                            'js': 'code',
-                            'xlsx': 'financial',
-                            'csv': 'financial',
-                            'docx': 'legal',
-                            'doc': 'legal',
-                            'txt': 'creative'
-                        }
-                        doc_type = type_map.get(ext, 'general')
-
-                        documents.append({
-                            'name': file_path.name,
-                            'path': str(file_path),
-                            'size': self.format_size(stat.st_size),
-                            'type': doc_type,
-                            'symbol': symbol,
-                            'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
-                        })
+            changed, removed = incoming_snapshot.refresh()
+            version = documents_tracker.apply(changed, removed)
+            count = incoming_snapshot.count()
+            etag = f"{version}-{self.query_tag()}"
+
+            since = query.get('since', [None])[0]
+            delta = documents_tracker.changes_since(since) if since else None
+            if delta is not None:
+                changed, removed = delta
+                self.send_versioned_response({
+                    'success': True,
+                    'delta': True,
+                    'documents': changed,
+                    'removed': removed,
+                    'count': count,
+                    'version': version
+                }, etag, documents_tracker.modified)
+                return
+
+            limit = query_number(query, 'limit', None, low=0)
+            offset = query_number(query, 'offset', 0, low=0)
+            names = incoming_snapshot.names_from(offset, limit, query.get('after', [None])[0])
+            lines = incoming_snapshot.lines(names)
+
+            if self.not_modified(etag, documents_tracker.modified):
+                self.send_not_modified(etag, documents_tracker.modified)
+                return
+
+            headers = self.validator_headers(etag, documents_tracker.modified)
+            headers['X-Total-Count'] = str(count)
+            if (query.get('format', [''])[0] == 'ndjson'
+                    or 'application/x-ndjson' in self.headers.get('Accept', '')):
+                self.send_response(200)
+                self.send_header('Content-type', 'application/x-ndjson')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                for start in range(0, len(lines), 1000):
+                    self.wfile.write(b'\n'.join(lines[start:start + 1000]) + b'\n')
+                return
+
+            # The entries are already serialized; only the envelope is encoded here
+            envelope = {'success': True, 'count': count, 'version': version}
+            if limit is not None:
+                envelope.update(limit=limit, offset=offset, next=names[-1] if names else None)
+            body = json.dumps(envelope)[:-1].encode('utf-8')
+            body += b', "documents": [' + b', '.join(lines) + b']}'
 
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        except ValueError as e:
             self.send_json_response({
-                'success': True,
-                'documents': documents,
-                'count': len(documents)
-            })
+                'success': False,
+                'error': str(e)
+            }, status=400)
 
         except Exception as e:
             self.send_json_response({
@@ -137,22 +536,19 @@ class PortOfEntryServer(http.server.SimpleHTTPRequestHandler):
             if not doc_path or not Path(doc_path).exists():
                 raise ValueError("Invalid document path")
 
+            if data.get('async'):
+                job = job_queue.submit([doc_path])[0]
+                self.send_json_response({
+                    'success': True,
+                    'job_id': job['job_id'],
+                    'status': job_queue.get(job['job_id'])['status']
+                }, status=202)
+                return
+
             # Process the document
-            processor = DocumentProcessor()
-            result = processor.process_document(doc_path)
+            result = run_ingest(doc_path)
 
             if result['success']:
-                # Remove from incoming (move to processed)
-                try:
-                    Path(doc_path).unlink()
-                except:
-                    pass  # File might already be moved
-
-                # Update stats
-                stats['total_processed'] += 1
-                stats['session_processed'] += 1
-                stats['total_learned'] += len(result.get('learned_words', []))
-
                 self.send_json_response({
                     'success': True,
                     'message': f"Document processed successfully",
@@ -160,6 +556,8 @@ class PortOfEntryServer(http.server.SimpleHTTPRequestHandler):
                     'journey_id': result['journey_id'],
                     'symbol': result['symbol'],
                     'package_dir': result['package_dir'],
+                    'duplicate': result.get('duplicate', False),
+                    'similar': result.get('similar', []),
                     'learned_words': result.get('learned_words', [])
                 })
             else:
@@ -175,37 +573,31 @@ class PortOfEntryServer(http.server.SimpleHTTPRequestHandler):
             }, status=500)
 
     def process_all(self, post_data):
-        """Process all documents (batch of 5)"""
+        """Process all documents (batch of 5, or queue every one with async)"""
         try:
             data = json.loads(post_data.decode('utf-8'))
             documents = data.get('documents', [])
+
+            if data.get('async'):
+                self.queue_all(documents)
+                return
+
             batch_size = min(len(documents), 5)  # Process max 5 at a time
 
             results = []
-            processor = DocumentProcessor()
 
             for i in range(batch_size):
                 doc_path = documents[i]['path']
 
                 if Path(doc_path).exists():
-                    result = processor.process_document(doc_path)
+                    result = run_ingest(doc_path)
 
                     if result['success']:
-                        # Remove from incoming
-                        try:
-                            Path(doc_path).unlink()
-                        except:
-                            pass
-
-                        # Update stats
-                        stats['total_processed'] += 1
-                        stats['session_processed'] += 1
-                        stats['total_learned'] += len(result.get('learned_words', []))
-
                         results.append({
                             'name': documents[i]['name'],
                             'success': True,
-                            'doc_id': result['doc_id']
+                            'doc_id': result['doc_id'],
+                            'duplicate': result.get('duplicate', False)
                         })
                     else:
                         results.append({
@@ -226,34 +618,186 @@ class PortOfEntryServer(http.server.SimpleHTTPRequestHandler):
                 'error': str(e)
             }, status=500)
 
-    def list_complete(self):
-        """List completed packages"""
+    def upload_document(self, query):
+        """Stream an upload into incoming
+
+        Either multipart/form-data (one or more file parts) or a raw body
+        named by ?name= or an X-Filename header. Content-Length and chunked
+        bodies are both accepted. ?process=1 (or a "process" form field)
+        queues the saved files for processing.
+        """
         try:
-            packages = []
-
-            if COMPLETE_PACKAGES.exists():
-                for package_dir in sorted(COMPLETE_PACKAGES.iterdir(), reverse=True):
-                    if package_dir.is_dir():
-                        # Read metadata
-                        metadata_files = list(package_dir.glob('*_METADATA.json'))
-                        if metadata_files:
-                            with open(metadata_files[0], 'r') as f:
-                                metadata = json.load(f)
-
-                            packages.append({
-                                'doc_id': metadata.get('document_id'),
-                                'filename': metadata.get('original_filename'),
-                                'symbol': metadata.get('economic_symbol'),
-                                'processed_at': metadata.get('processed_at'),
-                                'learned_words': len(metadata.get('learned_words', []))
-                            })
+            declared = int(self.headers.get('Content-Length') or 0)
+            if UPLOAD_MAX_BYTES and declared > UPLOAD_MAX_BYTES:
+                raise UploadError(f"Upload exceeds {UPLOAD_MAX_BYTES} bytes", status=413)
+
+            blocks = iter_body(self.rfile, self.headers)
+            content_type = self.headers.get('Content-Type', '')
+
+            if content_type.startswith('multipart/form-data'):
+                files, fields = save_multipart(blocks, multipart_boundary(content_type),
+                                               INCOMING, UPLOAD_MAX_BYTES)
+                if not files:
+                    raise UploadError("No file parts in upload")
+            else:
+                name = query.get('name', [None])[0] or self.headers.get('X-Filename')
+                if not name:
+                    raise UploadError("Missing file name (?name= or X-Filename)")
+                files = [save_raw(blocks, name, INCOMING, UPLOAD_MAX_BYTES)]
+                fields = {}
+
+            process = query.get('process', [fields.get('process', '')])[0]
+            if process.lower() in ('1', 'true', 'yes'):
+                jobs = job_queue.submit([f['path'] for f in files])
+                for info, job in zip(files, jobs):
+                    info['job_id'] = job['job_id']
 
+            uploaded_bytes.inc(sum(f['size'] for f in files))
             self.send_json_response({
                 'success': True,
-                'packages': packages,
-                'count': len(packages)
+                'files': files,
+                'count': len(files)
+            }, status=201)
+
+        except UploadError as e:
+            self.close_connection = True
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=e.status)
+
+        except Exception as e:
+            self.close_connection = True
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    def queue_all(self, documents):
+        """Queue every document as a job and return the job IDs"""
+        paths = [doc['path'] for doc in documents if Path(doc['path']).exists()]
+        jobs = job_queue.submit(paths)
+
+        self.send_json_response({
+            'success': True,
+            'queued': sum(1 for job in jobs if job['queued']),
+            'skipped': len(documents) - len(paths),
+            'jobs': [{'job_id': job['job_id'], 'path': job['path']} for job in jobs]
+        }, status=202)
+
+    def get_job(self, path):
+        """Get the status of one job"""
+        job_id = path.split('/')[3] if len(path.split('/')) > 3 else ''
+        job = job_queue.get(job_id)
+
+        if job is None:
+            self.send_json_response({
+                'success': False,
+                'error': 'Job not found'
+            }, status=404)
+            return
+
+        self.send_json_response({'success': True, 'job': job})
+
+    def list_jobs(self, query):
+        """List jobs by ID (?ids=a,b) or the most recent ones (?status=&limit=)"""
+        try:
+            if 'ids' in query:
+                job_ids = [i for i in ','.join(query['ids']).split(',') if i]
+                jobs = job_queue.get_many(job_ids)
+            else:
+                limit = query_number(query, 'limit', 50, 0, 1000)
+                jobs = job_queue.recent(limit, query.get('status', [None])[0])
+
+            self.send_json_response({
+                'success': True,
+                'jobs': jobs,
+                'counts': job_queue.counts()
+            })
+
+        except Exception as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
+    def bulk_job_status(self, post_data):
+        """Get the status of many jobs: {"ids": [...]}"""
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            jobs = job_queue.get_many(data.get('ids', []))
+
+            self.send_json_response({
+                'success': True,
+                'jobs': jobs,
+                'counts': job_queue.counts()
             })
 
+        except Exception as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
+    def list_complete(self, query):
+        """List completed packages from the catalog
+
+        Query: limit, offset, sort, order (asc|desc), symbol, from, to,
+        since (version token: only packages changed after it)
+        """
+        try:
+            catalog = get_catalog()
+            version, modified = catalog.version()
+            etag = f"{version}-{self.query_tag()}"
+            if self.not_modified(etag, modified):
+                self.send_not_modified(etag, modified)
+                return
+
+            since = query.get('since', [None])[0]
+            symbol = query.get('symbol', [None])[0]
+            delta = catalog.changes_since(since, symbol) if since else None
+            if delta is not None:
+                changed, removed = delta
+                self.send_versioned_response({
+                    'success': True,
+                    'delta': True,
+                    'packages': changed,
+                    'removed': removed,
+                    'count': len(changed),
+                    'total': catalog.count(symbol),
+                    'version': version
+                }, etag, modified)
+                return
+
+            limit = query_number(query, 'limit', 1000, 0, 10000)
+            offset = query_number(query, 'offset', 0, low=0)
+
+            packages, total = catalog.query(
+                limit=limit,
+                offset=offset,
+                sort=query.get('sort', ['processed_at'])[0],
+                order=query.get('order', ['desc'])[0],
+                symbol=query.get('symbol', [None])[0],
+                date_from=query.get('from', [None])[0],
+                date_to=query.get('to', [None])[0]
+            )
+
+            self.send_versioned_response({
+                'success': True,
+                'packages': packages,
+                'count': len(packages),
+                'total': total,
+                'offset': offset,
+                'limit': limit,
+                'version': version
+            }, etag, modified)
+
+        except ValueError as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
         except Exception as e:
             self.send_json_response({
                 'success': False,
@@ -262,10 +806,268 @@ class PortOfEntryServer(http.server.SimpleHTTPRequestHandler):
 
     def get_stats(self):
         """Get server statistics"""
-        self.send_json_response({
+        version = stats_tracker.token()
+        self.send_versioned_response({
             'success': True,
-            'stats': stats
-        })
+            'stats': snapshot_stats(),
+            'version': version
+        }, version, stats_tracker.modified)
+
+    def get_metrics(self):
+        """Prometheus text-format metrics"""
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def run_profile(self, query):
+        """Profile for ?seconds= (default 30) and return the report
+
+        Documents ingested meanwhile run under cProfile and the server's
+        threads are sampled. ?sort= and ?limit= shape the pstats listing;
+        ?format=pstats returns marshalled stats for pstats or snakeviz.
+        """
+        global profile_session
+        try:
+            session = ProfileSession(query_number(query, 'seconds', 30.0, kind=float))
+            sort = query.get('sort', ['cumulative'])[0]
+            limit = query_number(query, 'limit', 40, 1, 500)
+            if sort not in pstats.Stats.sort_arg_dict_default:
+                raise ValueError(f"Unknown sort: {sort}")
+        except ValueError as e:
+            self.send_json_response({'success': False, 'error': str(e)}, status=400)
+            return
+
+        with profile_lock:
+            if profile_session is not None:
+                self.send_json_response({
+                    'success': False,
+                    'error': 'A profile is already running'
+                }, status=409)
+                return
+            profile_session = session
+        print(f"🔬 Profiling for {session.seconds:g} seconds")
+
+        try:
+            session.run(server_stopping)
+        finally:
+            with profile_lock:
+                profile_session = None
+
+        if query.get('format', ['text'])[0] == 'pstats':
+            body = session.dump()
+            content_type = 'application/octet-stream'
+        else:
+            body = session.report(sort, limit).encode('utf-8')
+            content_type = 'text/plain; charset=utf-8'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def export_trace(self, query):
+        """Recent process_document spans as a Chrome trace (?limit=, ?doc_id=)"""
+        try:
+            limit = query_number(query, 'limit', 0, low=0) or None
+        except ValueError as e:
+            self.send_json_response({'success': False, 'error': str(e)}, status=400)
+            return
+        spans = span_recorder.recent(limit, query.get('doc_id', [None])[0])
+        self.send_json_response(chrome_trace(spans), headers={
+            'Content-Disposition': 'attachment; filename="portofentry-trace.json"'})
+
+    def query_lexicon(self, path, query):
+        """Lexicon queries
+
+        /api/lexicon                    summary and top words
+        /api/lexicon/top?limit=&stage=  most frequent words
+        /api/lexicon/prefix/<prefix>    words starting with prefix
+        /api/lexicon/word/<word>        one word with per-stage counts
+        /api/lexicon/document/<doc_id>  words learned from one document
+        """
+        try:
+            lexicon = get_lexicon()
+            parts = [urllib.parse.unquote(part) for part in path.split('/')[3:]]
+            limit = query_number(query, 'limit', 20, 1, 1000)
+            action = parts[0] if parts else ''
+            argument = parts[1] if len(parts) > 1 else ''
+
+            if action == '':
+                data = {'summary': lexicon.summary(), 'words': lexicon.top(limit)}
+            elif action == 'top':
+                data = {'words': lexicon.top(limit, query.get('stage', [None])[0])}
+            elif action == 'prefix' and argument:
+                data = {'words': lexicon.prefix(argument, limit)}
+            elif action == 'word' and argument:
+                word = lexicon.word(argument)
+                if word is None:
+                    raise LookupError(f"Unknown word: {argument}")
+                data = {'word': word}
+            elif action == 'document' and argument:
+                data = {'doc_id': argument, 'words': lexicon.document(argument)}
+            else:
+                raise LookupError("Unknown lexicon query")
+
+            self.send_json_response(dict(success=True, **data))
+
+        except LookupError as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=404)
+
+        except ValueError as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
+        except Exception as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    def search_packages(self, query):
+        """Full-text search over originals, ADVENTURE and LEARNING (BM25 ranked)"""
+        try:
+            text = query.get('q', [''])[0].strip()
+            if not text:
+                raise ValueError("Missing search query: use ?q=")
+            limit = query_number(query, 'limit', 20, 1, 1000)
+            offset = query_number(query, 'offset', 0, low=0)
+
+            started = time.perf_counter()
+            results, total = get_search_index().search(text, limit, offset)
+            listings = get_catalog().get_many(r['doc_id'] for r in results)
+            for result in results:
+                result.update(listings.get(result['doc_id'], {}))
+
+            self.send_json_response({
+                'success': True,
+                'query': text,
+                'results': results,
+                'total': total,
+                'limit': limit,
+                'offset': offset,
+                'took_ms': round((time.perf_counter() - started) * 1000, 2)
+            })
+
+        except ValueError as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
+        except Exception as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    def stream_events(self):
+        """Stream events as Server-Sent Events until the client disconnects"""
+        last_id = self.headers.get('Last-Event-ID', '')
+        subscriber = event_bus.subscribe(int(last_id) if last_id.isdigit() else None)
+
+        if subscriber is None:
+            self.send_json_response({
+                'success': False,
+                'error': 'Too many event subscribers'
+            }, status=503)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        try:
+            self.wfile.write(b"retry: 3000\n\n")
+            idle = 0
+            while not server_stopping.is_set() and event_bus.is_subscribed(subscriber):
+                try:
+                    event = subscriber.get(timeout=1)
+                except queue.Empty:
+                    idle += 1
+                    if idle >= 15:
+                        self.wfile.write(b": keepalive\n\n")
+                        idle = 0
+                    continue
+                self.wfile.write(format_event(event))
+                idle = 0
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            event_bus.unsubscribe(subscriber)
+            self.close_connection = True
+
+    def find_package_file(self, doc_id, content_type):
+        """Locate one file of a package, in its directory or in the archive"""
+        # Find package directory
+        package_dir = COMPLETE_PACKAGES / doc_id
+        if package_dir.parent != COMPLETE_PACKAGES or doc_id in ('', '.', '..'):
+            raise ValueError("Invalid package path")
+
+        # Determine which file to read
+        suffix_map = {
+            'metadata': '_METADATA.json',
+            'adventure': '_ADVENTURE.md',
+            'learning': '_LEARNING.md',
+            'certificate': '_CERTIFICATE.md',
+        }
+        if content_type != 'original' and content_type not in suffix_map:
+            raise ValueError("Invalid content type")
+
+        if not package_dir.exists():
+            return self.find_archived_file(doc_id, content_type, suffix_map.get(content_type))
+
+        if content_type == 'original':
+            # Find the original file (not one of the generated files)
+            original_files = [f for f in package_dir.iterdir()
+                            if f.is_file() and not any(f.name.endswith(suffix)
+                            for suffix in suffix_map.values())]
+            if original_files:
+                target_file = original_files[0]
+            else:
+                raise ValueError("Original file not found")
+        else:
+            target_file = package_dir / f"{doc_id}{suffix_map[content_type]}"
+
+        if not target_file.exists():
+            raise ValueError(f"File not found: {target_file.name}")
+
+        stat = target_file.stat()
+        return PackageFile(target_file, 0, stat.st_size, target_file.name, stat.st_mtime,
+                           f"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}", None)
+
+    def find_archived_file(self, doc_id, content_type, suffix):
+        """Locate a file of a packed package: artifacts in a segment, the original as a blob"""
+        entry = get_package_archive().find(doc_id, suffix)
+        if entry is None:
+            raise ValueError("Package not found" if not get_package_archive().has(doc_id)
+                             else f"File not found: {content_type}")
+
+        if entry['segment'] is None:
+            path = get_blob_store().path(entry['sha256'])
+            return PackageFile(path, 0, entry['size'], entry['name'], entry['mtime'],
+                               entry['sha256'][:32], None)
+        return PackageFile(get_package_archive().segment_path(entry), entry['offset'],
+                           entry['size'], entry['name'], entry['mtime'],
+                           f"{entry['segment']}-{entry['offset']:x}-{entry['size']:x}", entry)
+
+    def read_package_file(self, package_file):
+        """Whole contents of a package file (archived artifacts come from the mmap)"""
+        if package_file.entry is not None:
+            return get_package_archive().read(package_file.entry)
+        return package_file.path.read_bytes()
 
     def get_package_content(self, path):
         """Get content from a specific package"""
@@ -277,74 +1079,197 @@ class PortOfEntryServer(http.server.SimpleHTTPRequestHandler):
 
             doc_id = parts[3]
             content_type = parts[4]
+            package_file = self.find_package_file(doc_id, content_type)
 
-            # Find package directory
-            package_dir = COMPLETE_PACKAGES / doc_id
-            if not package_dir.exists():
-                raise ValueError("Package not found")
-
-            # Determine which file to read
-            file_map = {
-                'metadata': f'{doc_id}_METADATA.json',
-                'adventure': f'{doc_id}_ADVENTURE.md',
-                'learning': f'{doc_id}_LEARNING.md',
-                'certificate': f'{doc_id}_CERTIFICATE.md',
-            }
-
-            if content_type == 'original':
-                # Find the original file (not one of the generated files)
-                original_files = [f for f in package_dir.iterdir()
-                                if f.is_file() and not any(f.name.endswith(suffix)
-                                for suffix in ['_METADATA.json', '_ADVENTURE.md',
-                                             '_LEARNING.md', '_CERTIFICATE.md'])]
-                if original_files:
-                    target_file = original_files[0]
-                else:
-                    raise ValueError("Original file not found")
-            else:
-                filename = file_map.get(content_type)
-                if not filename:
-                    raise ValueError("Invalid content type")
-                target_file = package_dir / filename
+            # Hot artifacts are served as stored; the ETag changes with the file's mtime
+            key = (doc_id, content_type)
+            body = artifact_cache.get(key, package_file.etag)
+            if body is None:
+                body = self.package_content_body(doc_id, content_type, package_file)
+                artifact_cache.put(key, package_file.etag, body)
+            self.send_json_body(body)
 
-            if not target_file.exists():
-                raise ValueError(f"File not found: {target_file.name}")
+        except Exception as e:
+            self.send_json_response({
+                'success': False,
+                'error': str(e)
+            }, status=404)
 
-            # Read and return content
-            with open(target_file, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+    def package_content_body(self, doc_id, content_type, package_file):
+        """Serialized /api/package response for one package file"""
+        content = self.read_package_file(package_file).decode('utf-8', errors='ignore')
 
-            # Determine response type
-            file_type = 'json' if target_file.suffix == '.json' else 'markdown'
+        # Determine response type
+        file_type = 'json' if package_file.name.endswith('.json') else 'markdown'
 
-            self.send_json_response({
-                'success': True,
-                'content': json.loads(content) if file_type == 'json' else content,
-                'type': file_type,
-                'filename': target_file.name
-            })
+        return json.dumps({
+            'success': True,
+            'content': json.loads(content) if file_type == 'json' else content,
+            'type': file_type,
+            'filename': package_file.name,
+            'download': f'/api/download/{doc_id}/{content_type}'
+        }).encode('utf-8')
 
-        except Exception as e:
+    def download_package_file(self, path, head=False):
+        """Stream a package file as raw bytes: /api/download/<doc_id>/<content_type>"""
+        try:
+            parts = path.split('/')
+            if len(parts) < 5:
+                raise ValueError("Invalid package path")
+            package_file = self.find_package_file(parts[3], parts[4])
+            f = open(package_file.path, 'rb')
+        except (ValueError, OSError) as e:
             self.send_json_response({
                 'success': False,
                 'error': str(e)
             }, status=404)
+            return
 
-    def format_size(self, bytes):
-        """Format file size"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if bytes < 1024.0:
-                return f"{bytes:.1f} {unit}"
-            bytes /= 1024.0
-        return f"{bytes:.1f} TB"
+        with f:
+            size = package_file.size
+            etag = package_file.etag
+            modified = package_file.mtime
 
-    def send_json_response(self, data, status=200):
+            if self.not_modified(etag, modified):
+                self.send_not_modified(etag, modified)
+                return
+
+            byte_range = self.parse_range(size)
+            if byte_range is False:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            content_type = mimetypes.guess_type(package_file.name)[0] or 'application/octet-stream'
+            if byte_range:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            else:
+                start, end = 0, size - 1
+                self.send_response(200)
+
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Disposition',
+                             f"attachment; filename*=UTF-8''{urllib.parse.quote(package_file.name)}")
+            self.send_header('Access-Control-Allow-Origin', '*')
+            for name, value in self.validator_headers(etag, modified).items():
+                self.send_header(name, value)
+            self.end_headers()
+
+            if not head:
+                try:
+                    # Archived artifacts start at their offset inside the segment
+                    self.send_file_range(f, package_file.offset + start, end - start + 1)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+    def parse_range(self, size):
+        """Parse a single-range Range header: (start, end), None for the whole file, False if unsatisfiable"""
+        header = self.headers.get('Range')
+        if not header or not header.startswith('bytes=') or ',' in header:
+            return None  # Absent, unknown unit or multi-range: send everything
+
+        first, _, last = header[6:].strip().partition('-')
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+            else:
+                start = max(0, size - int(last))  # bytes=-N is the last N bytes
+                end = size - 1
+        except ValueError:
+            return None
+
+        end = min(end, size - 1)
+        if start >= size or start > end:
+            return False
+        return start, end
+
+    def send_file_range(self, f, offset, length):
+        """Copy length bytes of f from offset to the client, with sendfile when possible"""
+        if hasattr(os, 'sendfile'):
+            socket_fd = self.connection.fileno()
+            try:
+                while length > 0:
+                    sent = os.sendfile(socket_fd, f.fileno(), offset, min(length, SEND_CHUNK))
+                    if sent == 0:
+                        return
+                    offset += sent
+                    length -= sent
+                return
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                    raise
+                # Not supported for this file or socket: fall back to copying
+
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(length, 64 * 1024))
+            if not chunk:
+                return
+            self.wfile.write(chunk)
+            length -= len(chunk)
+
+    def send_json_response(self, data, status=200, headers=None):
         """Send JSON response"""
+        self.send_json_body(json.dumps(data).encode('utf-8'), status, headers)
+
+    def send_json_body(self, body, status=200, headers=None):
+        """Send an already serialized JSON response"""
         self.send_response(status)
         self.send_header('Content-type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def query_tag(self):
+        """Short tag of the query string, so each query gets its own ETag"""
+        return format(zlib.crc32(urllib.parse.urlparse(self.path).query.encode()), '08x')
+
+    def validator_headers(self, etag, modified):
+        """ETag / Last-Modified headers for a versioned response"""
+        return {
+            'ETag': f'"{etag}"',
+            'Last-Modified': formatdate(modified, usegmt=True),
+            'Cache-Control': 'no-cache'
+        }
+
+    def not_modified(self, etag, modified):
+        """Check If-None-Match, then If-Modified-Since"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return f'"{etag}"' in tags or '*' in tags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_not_modified(self, etag, modified):
+        """Send 304 with the validators"""
+        self.send_response(304)
+        for name, value in self.validator_headers(etag, modified).items():
+            self.send_header(name, value)
+        self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+
+    def send_versioned_response(self, data, etag, modified):
+        """Send JSON with validators, or 304 if the client is current"""
+        if self.not_modified(etag, modified):
+            self.send_not_modified(etag, modified)
+        else:
+            self.send_json_response(data, headers=self.validator_headers(etag, modified))
 
     def log_message(self, format, *args):
         """Custom log format"""
@@ -362,23 +1287,111 @@ def print_banner():
     print(f"📂 Incoming:          {INCOMING}")
     print(f"📦 Complete Packages: {COMPLETE_PACKAGES}")
     print()
-    print("📺 Open UI: http://localhost:8000/document_processor_v4.html")
+    print(f"📺 Open UI: http://localhost:{PORT}/document_processor_v4.html")
+    print()
+    print(f"🧵 Workers:           {HTTP_WORKERS} http / {PROCESS_WORKERS} processing ({POOL_KIND})")
     print()
     print("Press Ctrl+C to stop the server")
     print("=" * 70)
     print()
 
 
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Port of Entry v0 API server")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--http-workers', type=int, default=HTTP_WORKERS,
+                        help="threads serving HTTP connections")
+    parser.add_argument('--process-workers', type=int, default=PROCESS_WORKERS,
+                        help="documents processed concurrently")
+    parser.add_argument('--pool', choices=['process', 'thread'], default=POOL_KIND,
+                        help="run processing in worker processes or threads")
+    parser.add_argument('--transfer', choices=TRANSFER_MODES, default=INGEST_TRANSFER,
+                        help="how originals enter packages ('link' is an alias of 'copy')")
+    parser.add_argument('--skip-duplicates', action='store_true', default=SKIP_DUPLICATES,
+                        help="do not process files whose bytes were ingested before")
+    parser.add_argument('--watch', action='store_true', default=WATCH_INCOMING,
+                        help="queue new files in incoming automatically")
+    parser.add_argument('--settle', type=float, default=WATCH_SETTLE,
+                        help="seconds a file must stay unchanged before it is queued")
+    parser.add_argument('--artifact-cache-mb', type=float, default=ARTIFACT_CACHE_BYTES / 2 ** 20,
+                        help="memory for cached package responses (0 disables)")
+    return parser.parse_args(argv)
+
+
 def main():
     """Start the server"""
+    global PORT, HTTP_WORKERS, PROCESS_WORKERS, POOL_KIND, processing_pool, job_queue
+    global WATCH_INCOMING, WATCH_SETTLE, INGEST_TRANSFER, SKIP_DUPLICATES, incoming_watcher
+    global ARTIFACT_CACHE_BYTES, artifact_cache
+
+    args = parse_args()
+    PORT = args.port
+    HTTP_WORKERS = max(1, args.http_workers)
+    PROCESS_WORKERS = max(1, args.process_workers)
+    POOL_KIND = args.pool
+    INGEST_TRANSFER = args.transfer
+    SKIP_DUPLICATES = args.skip_duplicates
+    WATCH_INCOMING = args.watch
+    WATCH_SETTLE = max(0.0, args.settle)
+    ARTIFACT_CACHE_BYTES = int(max(0.0, args.artifact_cache_mb) * 2 ** 20)
+    artifact_cache = ArtifactCache(ARTIFACT_CACHE_BYTES)
+
     print_banner()
 
-    with socketserver.TCPServer(("", PORT), PortOfEntryServer) as httpd:
+    # Packages a crash left half-built never reached complete_packages
+    abandoned = get_package_writer().recover()
+    if abandoned:
+        print(f"🧹 Removed {abandoned} abandoned staging directories")
+
+    # Index existing packages the first time the catalog is used
+    catalog = get_catalog()
+    if catalog.count() == 0 and any(COMPLETE_PACKAGES.iterdir()):
+        print(f"📇 Catalog rebuilt: {catalog.rebuild()} packages")
+
+    # Lifetime totals survive restarts
+    stats['total_processed'] = catalog.count()
+    stats['total_learned'] = get_lexicon().summary()['occurrences']
+
+    # Map the search index segments and read any pending documents
+    search_index = get_search_index()
+    search_index.refresh()
+    print(f"🔎 Search index: {search_index.document_count()} documents")
+
+    # Keep half the connection threads free of long-lived event streams
+    event_bus.max_subscribers = max(1, HTTP_WORKERS // 2)
+
+    if POOL_KIND == 'process':
+        events = multiprocessing.get_context('spawn').Queue()
+        threading.Thread(target=relay_events, args=(events,), name='event-relay',
+                         daemon=True).start()
+        processing_pool = create_process_pool(PROCESS_WORKERS, events)
+    else:
+        set_stage_listener(publish_event)
+        processing_pool = ThreadPoolExecutor(max_workers=PROCESS_WORKERS,
+                                             thread_name_prefix='process')
+    job_queue = JobQueue(JOBS_DB, run_ingest, workers=PROCESS_WORKERS)
+    resumed = job_queue.start()
+    if resumed:
+        print(f"🔁 Resumed {resumed} queued jobs")
+
+    if WATCH_INCOMING:
+        incoming_watcher = IncomingWatcher(INCOMING, job_queue.submit, settle=WATCH_SETTLE)
+        incoming_watcher.start()
+        print(f"👀 Watching incoming ({incoming_watcher.backend}, settle {WATCH_SETTLE:g}s)")
+
+    with PooledHTTPServer(("", PORT), PortOfEntryServer,
+                          workers=HTTP_WORKERS) as httpd:
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n\nShutting down server...")
+            server_stopping.set()
             httpd.shutdown()
+            if incoming_watcher:
+                incoming_watcher.stop()
+            job_queue.stop()
+            processing_pool.shutdown(wait=True)
             print("\n" + "=" * 70)
             print(f"✅ Processed {stats['session_processed']} documents this session")
             print(f"🧠 Learned {stats['total_learned']} words")
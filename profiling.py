@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Profiling
+Span recording with JSON trace export, and on-demand cProfile / sampling sessions
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+from collections import Counter, deque
+
+SPAN_HISTORY = 10000
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+MAX_PROFILE_SECONDS = 300
+
+# Leaf frames of a thread that is blocked, not working (locks, sockets, queues)
+IDLE_LEAVES = {'wait', 'select', 'poll', 'accept', 'readinto', 'recv_into', '_recv',
+               '_worker', 'get', 'sleep'}
+
+
+class SpanRecorder:
+    """The most recent finished spans, oldest first"""
+
+    def __init__(self, history=SPAN_HISTORY):
+        self.spans = deque(maxlen=history)
+        self.lock = threading.Lock()
+
+    def record(self, spans):
+        with self.lock:
+            self.spans.extend(spans)
+
+    def recent(self, limit=None, doc_id=None):
+        """Finished spans, optionally for one document, newest last"""
+        with self.lock:
+            spans = list(self.spans)
+        if doc_id:
+            spans = [span for span in spans if span.get('doc_id') == doc_id]
+        return spans[-limit:] if limit else spans
+
+
+def chrome_trace(spans):
+    """Spans as a Trace Event Format document (chrome://tracing, Perfetto)"""
+    events = []
+    for span in spans:
+        events.append({
+            'name': span['name'],
+            'cat': 'process_document',
+            'ph': 'X',
+            'ts': round(span['start'] * 1e6),
+            'dur': round(span['duration'] * 1e6),
+            'pid': span.get('pid', 0),
+            'tid': span.get('tid', 0),
+            'args': {key: span.get(key) for key in ('doc_id', 'filename', 'size', 'type')}
+        })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+class ProfileStats:
+    """Raw cProfile statistics that can cross a process boundary and load into pstats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass  # pstats.Stats calls this before reading .stats
+
+
+def profile_call(function, *args, **kwargs):
+    """Run function under cProfile; returns (result, raw stats dict)"""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+class StackSampler:
+    """Samples the stacks of every thread in this process at a fixed interval
+
+    Catches time in threads cProfile cannot see (HTTP handlers, the job
+    workers waiting on the pool) at a cost that does not grow with calls.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.idle = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                self.samples += 1
+                if frame.f_code.co_name in IDLE_LEAVES:
+                    self.idle += 1
+                    continue
+                seen = set()
+                leaf = True
+                while frame is not None:
+                    code = frame.f_code
+                    key = f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+                    if leaf:
+                        self.self_counts[key] += 1
+                        leaf = False
+                    if key not in seen:
+                        self.total_counts[key] += 1
+                        seen.add(key)
+                    frame = frame.f_back
+
+    def report(self, limit=30):
+        """Text table of the functions seen most, by own and by inclusive samples"""
+        lines = [f"{self.samples} thread samples every {self.interval * 1000:g} ms, "
+                 f"{self.idle} idle (blocked on locks, sockets or queues)", '',
+                 f"{'own':>8} {'incl':>8}  function"]
+        for key, count in self.self_counts.most_common(limit):
+            lines.append(f"{count:>8} {self.total_counts[key]:>8}  {key}")
+        return '\n'.join(lines) + '\n'
+
+
+class ProfileSession:
+    """One on-demand profiling window
+
+    Documents processed while the session is active are run under cProfile
+    (in whichever process handles them) and their statistics added here;
+    the server's own threads are sampled meanwhile.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = max(1.0, min(float(seconds), MAX_PROFILE_SECONDS))
+        self.stats = None
+        self.documents = 0
+        self.lock = threading.Lock()
+        self.sampler = StackSampler()
+
+    def add(self, raw_stats):
+        """Merge the cProfile statistics of one document"""
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(ProfileStats(raw_stats))
+            else:
+                self.stats.add(ProfileStats(raw_stats))
+            self.documents += 1
+
+    def run(self, stop_event=None):
+        """Sample for the session's length (or until stop_event is set)"""
+        self.sampler.start()
+        try:
+            (stop_event or threading.Event()).wait(self.seconds)
+        finally:
+            self.sampler.stop()
+
+    def report(self, sort='cumulative', limit=40):
+        """pstats listing of the profiled documents, then the thread samples"""
+        out = io.StringIO()
+        out.write(f"Profiled {self.documents} documents over {self.seconds:g} s\n\n")
+        with self.lock:
+            if self.stats is not None:
+                self.stats.stream = out
+                self.stats.sort_stats(sort).print_stats(limit)
+        out.write("Server threads (sampled)\n")
+        out.write(self.sampler.report(limit))
+        return out.getvalue()
+
+    def dump(self):
+        """Marshalled pstats data, loadable with pstats.Stats(path) or snakeviz"""
+        with self.lock:
+            return marshal.dumps(self.stats.stats if self.stats is not None else {})
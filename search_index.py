@@ -0,0 +1,612 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Search Index
+Incremental inverted index over completed packages, ranked with BM25
+
+Worker processes append each finished document to pending.jsonl. The
+server tails that log into a small in-memory index and periodically
+compacts it into an immutable, memory-mapped segment:
+
+    seg-NNNNNN/docs.json      doc_ids in segment order
+    seg-NNNNNN/lengths.bin    uint32 token count per document
+    seg-NNNNNN/terms.idx      uint64 offset of each entry in terms.bin (sorted by term)
+    seg-NNNNNN/terms.bin      entries: uint16 length, term (utf-8), uint64 first posting, uint32 count
+    seg-NNNNNN/postings.bin   uint32 pairs: document number, term frequency
+    manifest.json             segments that are live
+
+Each compaction merges segments of the same size tier (1-9, 10-99, ...
+documents) once MERGE_FACTOR of them have accumulated, so a query touches
+a logarithmic number of segments however long the index has been growing.
+"""
+
+import contextlib
+import heapq
+import itertools
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+TOKEN_PATTERN = re.compile(r'[^\W_]{2,64}')
+
+TERM_LENGTH = struct.Struct('<H')
+TERM_POSTINGS = struct.Struct('<QI')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+LOG_HEAD = 64  # bytes that identify a pending log; the first line holds a unique doc_id
+
+COMPACT_THRESHOLD = 2000  # pending documents before the server compacts
+MERGE_FACTOR = 10  # segments of one size tier merged into one
+
+
+def tokenize(text):
+    """Lowercase index terms of a string"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def count_terms(texts):
+    """Term frequencies and length over an iterable of text chunks"""
+    counter = TermCounter()
+    for text in texts:
+        counter.update(text)
+    return counter.result()
+
+
+class TermCounter:
+    """Term frequencies of texts, counted as they stream past"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def update(self, text):
+        self.counts.update(tokenize(text))
+
+    def tap(self, texts):
+        """Pass texts through unchanged, counting the terms of each one"""
+        for text in texts:
+            self.update(text)
+            yield text
+
+    def result(self):
+        """(term frequencies, length) so far"""
+        return self.counts, sum(self.counts.values())
+
+
+class Segment:
+    """Read-only, memory-mapped segment"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.name = self.directory.name
+        with open(self.directory / 'docs.json') as f:
+            self.doc_ids = json.load(f)
+
+        self.files = []
+        self.lengths = self.map_file('lengths.bin').cast('I')
+        self.index = self.map_file('terms.idx').cast('Q')
+        self.terms = self.map_file('terms.bin')
+        self.postings = self.map_file('postings.bin')
+        self.total_length = sum(self.lengths)
+
+    def map_file(self, name):
+        """Memory-map a segment file read-only"""
+        f = open(self.directory / name, 'rb')
+        if os.fstat(f.fileno()).st_size == 0:
+            f.close()
+            return memoryview(b'')  # mmap refuses empty files
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        self.files.append((f, mapped, view))
+        return view
+
+    def term_at(self, position):
+        """Return (term bytes, end offset) of the entry at index position"""
+        offset = self.index[position]
+        (length,) = TERM_LENGTH.unpack_from(self.terms, offset)
+        start = offset + TERM_LENGTH.size
+        return bytes(self.terms[start:start + length]), start + length
+
+    def lookup(self, term):
+        """Return an array of (document number, tf) pairs for a term, or None"""
+        key = term.encode('utf-8')
+        low, high = 0, len(self.index)
+        while low < high:
+            middle = (low + high) // 2
+            if self.term_at(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self.index):
+            return None
+
+        found, end = self.term_at(low)
+        if found != key:
+            return None
+        return self.postings_at(end)
+
+    def postings_at(self, end):
+        """The postings of the entry whose term ends at offset end"""
+        first, count = TERM_POSTINGS.unpack_from(self.terms, end)
+        postings = array('I')
+        postings.frombytes(self.postings[first * 8:(first + count) * 8])
+        return postings
+
+    def iter_terms(self):
+        """Yield (term bytes, postings) in term order"""
+        for position in range(len(self.index)):
+            term, end = self.term_at(position)
+            yield term, self.postings_at(end)
+
+    def close(self):
+        """Release the memory maps"""
+        # Casts first, then the views they were made from, then the maps
+        self.lengths.release()
+        self.index.release()
+        for f, mapped, view in self.files:
+            view.release()
+            mapped.close()
+            f.close()
+
+
+class MemoryPart:
+    """Documents read from one pending log file (tracked by inode)"""
+
+    def __init__(self):
+        self.offset = 0
+        self.doc_ids = []
+        self.lengths = []
+        self.total_length = 0
+        self.postings = defaultdict(list)  # term -> [document number, tf, ...]
+
+    def add(self, doc_id, length, terms):
+        number = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.lengths.append(length)
+        self.total_length += length
+        for term, tf in terms.items():
+            self.postings[term].extend((number, tf))
+
+    def lookup(self, term):
+        return self.postings.get(term)
+
+
+def write_segment(directory, documents):
+    """Write documents [(doc_id, length, {term: tf})] as a segment directory"""
+    postings_by_term = defaultdict(list)
+    lengths = array('I')
+    doc_ids = []
+    for number, (doc_id, length, terms) in enumerate(documents):
+        doc_ids.append(doc_id)
+        lengths.append(min(length, 0xFFFFFFFF))
+        for term, tf in terms.items():
+            postings_by_term[term].extend((number, min(tf, 0xFFFFFFFF)))
+
+    terms = ((term.encode('utf-8'), array('I', postings_by_term[term]))
+             for term in sorted(postings_by_term, key=lambda t: t.encode('utf-8')))
+    save_segment(directory, doc_ids, lengths, terms)
+
+
+def merge_segments(directory, segments):
+    """Write the documents of several segments, in order, as one segment directory
+
+    Terms are merged from each segment's sorted dictionary and postings are
+    copied with their document numbers shifted, so no document is re-counted.
+    """
+    doc_ids = []
+    lengths = array('I')
+    bases = []
+    for segment in segments:
+        bases.append(len(doc_ids))
+        doc_ids.extend(segment.doc_ids)
+        lengths.frombytes(segment.lengths.tobytes())
+
+    def entries(number, segment):
+        for term, postings in segment.iter_terms():
+            yield term, number, postings
+
+    def terms():
+        streams = [entries(number, segment) for number, segment in enumerate(segments)]
+        merged = heapq.merge(*streams, key=lambda entry: entry[:2])
+        for term, group in itertools.groupby(merged, key=lambda entry: entry[0]):
+            combined = array('I')
+            for _, number, postings in group:
+                if bases[number]:
+                    postings[0::2] = array('I', (doc + bases[number] for doc in postings[0::2]))
+                combined.extend(postings)
+            yield term, combined
+
+    save_segment(directory, doc_ids, lengths, terms())
+
+
+def save_segment(directory, doc_ids, lengths, terms):
+    """Write a segment from doc_ids, lengths and sorted (term bytes, postings) pairs"""
+    directory = Path(directory)
+    temp = directory.with_name(directory.name + '.tmp')
+    if temp.exists():
+        shutil.rmtree(temp)
+    temp.mkdir(parents=True)
+
+    index = array('Q')
+    with open(temp / 'terms.bin', 'wb') as terms_file, \
+            open(temp / 'postings.bin', 'wb') as postings_file:
+        offset = 0
+        first = 0
+        for encoded, postings in terms:
+            count = len(postings) // 2
+
+            index.append(offset)
+            entry = TERM_LENGTH.pack(len(encoded)) + encoded + TERM_POSTINGS.pack(first, count)
+            terms_file.write(entry)
+            postings.tofile(postings_file)
+
+            offset += len(entry)
+            first += count
+
+    with open(temp / 'terms.idx', 'wb') as f:
+        index.tofile(f)
+    with open(temp / 'lengths.bin', 'wb') as f:
+        lengths.tofile(f)
+    with open(temp / 'docs.json', 'w') as f:
+        json.dump(doc_ids, f)
+
+    for name in os.listdir(temp):
+        with open(temp / name, 'rb') as f:
+            os.fsync(f.fileno())
+    os.rename(temp, directory)
+
+
+class SearchIndex:
+    """Segments plus the tail of the pending log, searched together"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.pending_path = self.directory / 'pending.jsonl'
+        self.manifest_path = self.directory / 'manifest.json'
+        self.lock = threading.RLock()
+        self.compacting = threading.Lock()
+
+        self.manifest_stamp = None
+        self.segments = {}
+        self.memory = {}  # (inode, head) of a pending log -> MemoryPart
+
+    # Writing (any process)
+
+    def add_document(self, doc_id, texts):
+        """Count the terms of a document's texts and append it to the pending log"""
+        self.add_counts(doc_id, *count_terms(texts))
+
+    def add_counts(self, doc_id, terms, length):
+        """Append a document whose terms were already counted to the pending log"""
+        line = json.dumps({'doc_id': doc_id, 'length': length, 'terms': terms}) + '\n'
+        self.append_pending(line.encode('utf-8'))
+
+    def append_pending(self, data):
+        """Append to pending.jsonl, following it if the compactor rotates it"""
+        while True:
+            fd = os.open(self.pending_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    current = os.stat(self.pending_path).st_ino
+                except FileNotFoundError:
+                    current = None
+                if current == os.fstat(fd).st_ino:
+                    os.write(fd, data)
+                    return
+            finally:
+                os.close(fd)
+
+    # Reading (server)
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'segments': []}
+
+    def refresh(self):
+        """Pick up new segments and new pending documents"""
+        with self.lock:
+            try:
+                stamp = os.stat(self.manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                stamp = None
+
+            if stamp != self.manifest_stamp:
+                self.manifest_stamp = stamp
+                live = self.read_manifest()['segments']
+                for name in list(self.segments):
+                    if name not in live:
+                        self.segments.pop(name).close()
+                for name in live:
+                    if name not in self.segments:
+                        self.segments[name] = Segment(self.directory / name)
+
+            # A log is known by inode plus its first bytes (inodes get reused)
+            logs = []
+            for path in self.pending_files():
+                try:
+                    f = open(path, 'rb')
+                except FileNotFoundError:
+                    continue
+                logs.append(((os.fstat(f.fileno()).st_ino, f.read(LOG_HEAD)), f))
+
+            # Logs that were compacted into a segment leave memory
+            keys = {key for key, _ in logs}
+            for key in list(self.memory):
+                if key not in keys:
+                    del self.memory[key]
+
+            for key, f in logs:
+                with f:
+                    self.tail(f, self.memory.setdefault(key, MemoryPart()))
+
+    def pending_files(self):
+        """Pending logs whose documents are not in a live segment yet"""
+        files = [path for path in sorted(self.directory.glob('seg-*.pending'))
+                 if path.name[:-len('.pending')] not in self.segments]
+        return files + [self.pending_path]
+
+    def tail(self, f, part):
+        """Read complete lines appended to a pending log since the last refresh"""
+        f.seek(part.offset)
+        data = f.read()
+
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if line:
+                document = json.loads(line)
+                part.add(document['doc_id'], document['length'], document['terms'])
+        part.offset += end
+
+    def document_count(self):
+        """Number of searchable documents"""
+        with self.lock:
+            return (sum(len(s.doc_ids) for s in self.segments.values())
+                    + sum(len(p.doc_ids) for p in self.memory.values()))
+
+    def pending_count(self):
+        with self.lock:
+            return sum(len(p.doc_ids) for p in self.memory.values())
+
+    def search(self, query, limit=20, offset=0):
+        """Return (results [{doc_id, score}], total matches) ranked by BM25"""
+        self.refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return [], 0
+
+        with self.lock:
+            sources = list(self.segments.values()) + list(self.memory.values())
+            documents = sum(len(source.doc_ids) for source in sources)
+            if documents == 0:
+                return [], 0
+            average_length = sum(source.total_length for source in sources) / documents or 1.0
+
+            scores = defaultdict(float)
+            for term in terms:
+                found = [(number, source.lookup(term)) for number, source in enumerate(sources)]
+                found = [(number, postings) for number, postings in found if postings]
+                frequency = sum(len(postings) // 2 for _, postings in found)
+                if not frequency:
+                    continue
+                idf = math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5))
+
+                for number, postings in found:
+                    lengths = sources[number].lengths
+                    for i in range(0, len(postings), 2):
+                        doc, tf = postings[i], postings[i + 1]
+                        norm = K1 * (1 - B + B * lengths[doc] / average_length)
+                        scores[(number, doc)] += idf * tf * (K1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])
+            results = [{'doc_id': sources[number].doc_ids[doc], 'score': round(score, 4)}
+                       for (number, doc), score in best[offset:]]
+            return results, len(scores)
+
+    # Maintenance
+
+    def next_segment_name(self):
+        numbers = [int(p.name[4:10]) for p in self.directory.glob('seg-*')
+                   if p.name[4:10].isdigit()]
+        return f"seg-{max(numbers, default=0) + 1:06d}"
+
+    @contextlib.contextmanager
+    def compact_lock(self):
+        """Exclusive across processes: only one compaction or merge at a time"""
+        lock_fd = os.open(self.directory / 'compact.lock', os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(lock_fd)
+
+    def compact(self, factor=MERGE_FACTOR):
+        """Move every pending document into a new segment; returns documents moved
+
+        Segments are then merged by size tier (see merge_tiers).
+        """
+        with self.compact_lock():
+            live = self.read_manifest()['segments']
+
+            # Logs left by an interrupted compaction
+            sources = []
+            for path in sorted(self.directory.glob('seg-*.pending')):
+                if path.name[:-len('.pending')] in live:
+                    path.unlink()
+                else:
+                    sources.append(path)
+
+            name = self.next_segment_name()
+            if self.pending_path.exists() and self.pending_path.stat().st_size:
+                rotated = self.directory / f"{name}.pending"
+                fd = os.open(self.pending_path, os.O_RDONLY)
+                try:
+                    if fcntl:
+                        fcntl.flock(fd, fcntl.LOCK_EX)  # Waits for in-flight appends
+                    os.rename(self.pending_path, rotated)
+                finally:
+                    os.close(fd)
+                sources.append(rotated)
+
+            documents = []
+            for path in sources:
+                with open(path, 'rb') as f:
+                    for line in f:
+                        if line.endswith(b'\n'):
+                            document = json.loads(line)
+                            documents.append((document['doc_id'], document['length'],
+                                              document['terms']))
+            if not documents:
+                for path in sources:
+                    path.unlink()
+                return 0
+
+            write_segment(self.directory / name, documents)
+            self.write_manifest(live + [name])
+            for path in sources:
+                path.unlink()
+            self.merge_tiers(factor)
+            return len(documents)
+
+    def merge(self, factor=MERGE_FACTOR):
+        """Merge segments by size tier; factor=None merges every segment into one
+
+        Returns the number of segments merged away.
+        """
+        with self.compact_lock():
+            return self.merge_tiers(factor)
+
+    def merge_tiers(self, factor):
+        """Merge factor segments of the same tier until no tier holds that many (lock held)"""
+        live = self.read_manifest()['segments']
+
+        # Segment directories left by an interrupted merge or compaction
+        for path in self.directory.glob('seg-*'):
+            if path.is_dir() and path.name not in live:
+                shutil.rmtree(path)
+
+        sizes = {}
+        for name in live:
+            with open(self.directory / name / 'docs.json') as f:
+                sizes[name] = len(json.load(f))
+
+        removed = 0
+        while len(live) > 1:
+            if factor is None:
+                group = list(live)
+            else:
+                tiers = defaultdict(list)
+                for name in live:
+                    tiers[len(str(max(1, sizes[name])))].append(name)
+                full = [names for _, names in sorted(tiers.items()) if len(names) >= factor]
+                if not full:
+                    break
+                group = full[0][:factor]
+
+            name = self.next_segment_name()
+            segments = [Segment(self.directory / old) for old in group]
+            try:
+                merge_segments(self.directory / name, segments)
+            finally:
+                for segment in segments:
+                    segment.close()
+            sizes[name] = sum(sizes[old] for old in group)
+            position = live.index(group[0])
+            live = [old for old in live[:position] if old not in group] + [name] + \
+                [old for old in live[position:] if old not in group]
+            self.write_manifest(live)
+            for old in group:
+                # A reader may still map it; a leftover is removed by the next merge
+                shutil.rmtree(self.directory / old, ignore_errors=True)
+            removed += len(group) - 1
+        return removed
+
+    def maybe_compact(self, threshold=COMPACT_THRESHOLD):
+        """Compact once enough documents are pending, unless a compaction is running"""
+        if not self.compacting.acquire(blocking=False):
+            return 0
+        try:
+            self.refresh()
+            if self.pending_count() < threshold:
+                return 0
+            moved = self.compact()
+            self.refresh()
+            return moved
+        finally:
+            self.compacting.release()
+
+    def write_manifest(self, segments):
+        temp = self.manifest_path.with_suffix('.tmp')
+        with open(temp, 'w') as f:
+            json.dump({'segments': segments, 'updated': time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.manifest_path)
+
+    def clear(self):
+        """Remove the whole index"""
+        with self.lock:
+            for segment in self.segments.values():
+                segment.close()
+            self.segments = {}
+            self.memory = {}
+            self.manifest_stamp = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+
+def main():
+    """Search index maintenance: rebuild | compact | merge | search <query>"""
+    from advanced_processor import SEARCH_INDEX_DIR, get_catalog, package_texts
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('rebuild', 'compact', 'merge', 'search'):
+        print("Usage: python3 search_index.py rebuild|compact|merge|search <query>")
+        sys.exit(1)
+
+    index = SearchIndex(SEARCH_INDEX_DIR)
+
+    if sys.argv[1] == 'rebuild':
+        index.clear()
+        count = 0
+        for doc_id, metadata in get_catalog().scan_packages():
+            if metadata:
+                index.add_document(doc_id, package_texts(doc_id))
+                count += 1
+        index.compact()
+        print(f"✅ Search index rebuilt: {count} packages")
+    elif sys.argv[1] == 'compact':
+        print(f"✅ Compacted {index.compact()} pending documents")
+    elif sys.argv[1] == 'merge':
+        print(f"✅ Merged away {index.merge(None)} segments")
+    else:
+        started = time.perf_counter()
+        results, total = index.search(' '.join(sys.argv[2:]))
+        print(f"{total} matches in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for result in results:
+            print(f"{result['score']:>10.4f}  {result['doc_id']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Similarity Index
+MinHash signatures of document text with an LSH index for near-duplicate lookup
+"""
+
+import re
+import sqlite3
+import sys
+import threading
+import zlib
+from array import array
+from pathlib import Path
+
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 8  # Shorter texts get no signature
+
+# One-permutation MinHash: each shingle is hashed once and lands in one slot
+SLOT_BITS = 7
+SLOTS = 1 << SLOT_BITS
+VALUE_MASK = (1 << (64 - SLOT_BITS)) - 1
+
+# LSH banding: BANDS x ROWS = SLOTS; pairs above ~(1/BANDS)**(1/ROWS) similarity collide
+BANDS = 32
+ROWS = SLOTS // BANDS
+
+MIN_SIMILARITY = 0.5
+NEAREST = 5
+
+WORD_PATTERN = re.compile(r'[^\W_]+')
+MIX = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+EMPTY = MASK64
+
+
+def shingle_hash(shingle):
+    """Stable 64-bit hash of a shingle (identical in every process)"""
+    data = shingle.encode('utf-8')
+    return ((zlib.crc32(data) | zlib.crc32(data, 0x5BD1E995) << 32) * MIX) & MASK64
+
+
+class MinHashSketch:
+    """Streaming MinHash over the word shingles of a text"""
+
+    def __init__(self):
+        self.slots = [EMPTY] * SLOTS
+        self.window = []
+        self.shingles = 0
+
+    def update(self, text):
+        """Add a chunk of text (chunks continue each other)"""
+        words = self.window + WORD_PATTERN.findall(text.lower())
+        slots = self.slots
+        for i in range(len(words) - SHINGLE_WORDS + 1):
+            h = shingle_hash(' '.join(words[i:i + SHINGLE_WORDS]))
+            slot = h >> (64 - SLOT_BITS)
+            value = h & VALUE_MASK
+            if value < slots[slot]:
+                slots[slot] = value
+        self.shingles += max(0, len(words) - SHINGLE_WORDS + 1)
+        self.window = words[-(SHINGLE_WORDS - 1):]
+
+    def tap(self, texts):
+        """Pass texts through unchanged, adding each one to the sketch"""
+        for text in texts:
+            self.update(text)
+            yield text
+
+    def signature(self):
+        """Return the signature as an array of SLOTS values, or None for short texts"""
+        if self.shingles < MIN_SHINGLES:
+            return None
+
+        # Empty slots borrow the next filled slot's value (rotation densification)
+        slots = self.slots
+        signature = array('Q', slots)
+        for slot in range(SLOTS):
+            if slots[slot] == EMPTY:
+                step = 1
+                while slots[(slot + step) % SLOTS] == EMPTY:
+                    step += 1
+                signature[slot] = (slots[(slot + step) % SLOTS] + step * (VALUE_MASK + 1)) & MASK64
+        return signature
+
+
+def band_keys(signature):
+    """LSH bucket key of each band: [(band, key)], keys fit SQLite's signed 64 bits"""
+    data = signature.tobytes()
+    width = ROWS * 8
+    keys = []
+    for band in range(BANDS):
+        rows = data[band * width:(band + 1) * width]
+        keys.append((band, zlib.crc32(rows) | (zlib.crc32(rows, 0x9747B28C) & 0x7FFFFFFF) << 32))
+    return keys
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(map(int.__eq__, a, b)) / SLOTS
+
+
+class SimilarityIndex:
+    """Signatures and LSH buckets backed by SQLite"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the signatures and buckets tables"""
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS signatures (
+                    doc_id TEXT PRIMARY KEY,
+                    signature BLOB NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    band INTEGER NOT NULL,
+                    key INTEGER NOT NULL,
+                    doc_id TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS buckets_key ON buckets (band, key)")
+            self.conn.commit()
+
+    def add(self, doc_id, signature):
+        """Index a document's signature"""
+        keys = band_keys(signature)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?)",
+                              (doc_id, signature.tobytes()))
+            self.conn.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+            self.conn.executemany("INSERT INTO buckets VALUES (?, ?, ?)",
+                                  [(band, key, doc_id) for band, key in keys])
+            self.conn.commit()
+
+    def signature(self, doc_id):
+        """Stored signature of a document, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT signature FROM signatures WHERE doc_id = ?",
+                                    (doc_id,)).fetchone()
+        if row is None:
+            return None
+        signature = array('Q')
+        signature.frombytes(row[0])
+        return signature
+
+    def nearest(self, signature, limit=NEAREST, min_similarity=MIN_SIMILARITY, exclude=None):
+        """Most similar indexed documents: [{'doc_id', 'similarity'}]"""
+        keys = band_keys(signature)
+        clause = ' OR '.join(['(band = ? AND key = ?)'] * len(keys))
+        params = [value for pair in keys for value in pair]
+
+        with self.lock:
+            # Every band is looked up in one query; only bucket-mates are compared
+            rows = self.conn.execute(
+                f"SELECT s.doc_id, s.signature FROM signatures s WHERE s.doc_id IN "
+                f"(SELECT doc_id FROM buckets WHERE {clause})", params).fetchall()
+
+        matches = []
+        for doc_id, data in rows:
+            if doc_id == exclude:
+                continue
+            candidate = array('Q')
+            candidate.frombytes(data)
+            score = similarity(signature, candidate)
+            if score >= min_similarity:
+                matches.append({'doc_id': doc_id, 'similarity': round(score, 3)})
+
+        matches.sort(key=lambda m: (-m['similarity'], m['doc_id']))
+        return matches[:limit]
+
+    def clear(self):
+        """Remove every signature"""
+        with self.lock:
+            self.conn.execute("DELETE FROM signatures")
+            self.conn.execute("DELETE FROM buckets")
+            self.conn.commit()
+
+
+def main():
+    """Similarity maintenance: rebuild | similar <doc_id>"""
+    from advanced_processor import SIMILARITY_DB, document_text, get_catalog, package_original
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('rebuild', 'similar') or \
+            (sys.argv[1] == 'similar' and len(sys.argv) < 3):
+        print("Usage: python3 similarity_index.py rebuild|similar <doc_id>")
+        sys.exit(1)
+
+    index = SimilarityIndex(SIMILARITY_DB)
+
+    if sys.argv[1] == 'rebuild':
+        index.clear()
+        count = 0
+        for doc_id, metadata in get_catalog().scan_packages():
+            if not metadata:
+                continue
+            path, name = package_original(doc_id)
+            if path is None:
+                continue
+            sketch = MinHashSketch()
+            for text in document_text(path, name):
+                sketch.update(text)
+            signature = sketch.signature()
+            if signature:
+                index.add(doc_id, signature)
+                count += 1
+        print(f"✅ Similarity index rebuilt: {count} signatures")
+    else:
+        signature = index.signature(sys.argv[2])
+        if signature is None:
+            print(f"No signature for {sys.argv[2]}")
+            sys.exit(1)
+        for match in index.nearest(signature, exclude=sys.argv[2]):
+            print(f"{match['similarity']:>6.3f}  {match['doc_id']}")
+
+
+if __name__ == '__main__':
+    main()
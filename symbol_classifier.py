@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Symbol Classifier
+Economic symbol from a document's name, folder and content with one compiled regex
+"""
+
+import math
+import re
+import sys
+from bisect import bisect_right
+from collections import Counter
+from pathlib import Path
+
+# Words that vote for a category (the category name itself always does)
+CATEGORY_KEYWORDS = {
+    'research': ('study', 'paper', 'thesis', 'abstract', 'journal', 'survey', 'hypothesis',
+                 'experiment', 'methodology', 'citation', 'dissertation', 'findings'),
+    'code': ('script', 'function', 'module', 'compile', 'debug', 'refactor', 'repository',
+             'algorithm', 'python', 'javascript', 'runtime', 'variable'),
+    'financial': ('finance', 'invoice', 'budget', 'revenue', 'ledger', 'expense', 'profit',
+                  'balance', 'payroll', 'forecast', 'quarterly', 'fiscal', 'tax', 'receipt',
+                  'dividend', 'accounting'),
+    'legal': ('contract', 'agreement', 'clause', 'court', 'statute', 'liability', 'plaintiff',
+              'defendant', 'attorney', 'lawsuit', 'licence', 'license', 'terms', 'nda', 'warranty'),
+    'creative': ('story', 'poem', 'poetry', 'novel', 'lyric', 'song', 'chapter', 'fiction',
+                 'screenplay', 'verse', 'character', 'memoir'),
+    'medical': ('patient', 'clinical', 'clinic', 'diagnosis', 'prescription', 'dosage',
+                'hospital', 'symptom', 'treatment', 'therapy', 'physician', 'medication',
+                'health', 'surgery', 'pharma'),
+    'architecture': ('architect', 'blueprint', 'floorplan', 'structural', 'building',
+                     'elevation', 'facade', 'construction', 'zoning', 'renovation'),
+}
+
+FILENAME_WEIGHT = 4.0
+PATH_WEIGHT = 2.0
+EXTENSION_WEIGHT = 3.0
+CONTENT_WEIGHT = 2.0  # Times log2(1 + hits), so long documents cannot drown the name
+CONTENT_SAMPLE = 256 * 1024  # Characters of extracted text that are scored
+
+
+def trie_pattern(words):
+    """Regex alternation of words factored into a prefix trie
+
+    re tries alternatives one by one; as a trie, a position that cannot
+    start any keyword is rejected after a single character.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # End of a word
+
+    def build(node):
+        ends = '' in node
+        branches = [re.escape(char) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if ends:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+def head_text(chunks, limit=CONTENT_SAMPLE):
+    """The first limit characters of a stream of text chunks"""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk[:limit])
+        limit -= len(parts[-1])
+        if limit <= 0:
+            break
+    return ''.join(parts)
+
+
+class SymbolClassifier:
+    """Scores every category in one regex pass per field
+
+    All keywords compile into a single trie-shaped regex, so classifying
+    costs one scan of each field whatever the number of rules; the matched
+    keyword names its category. Keywords match at word starts (underscores,
+    digits and punctuation separate words) and allow up to three more letters.
+    """
+
+    def __init__(self, symbols, keywords=CATEGORY_KEYWORDS):
+        self.symbols = symbols
+        self.default = symbols['general']
+        self.categories = [category for category in keywords if category in symbols]
+        self.extensions = {key: symbol for key, symbol in symbols.items()
+                           if key not in keywords and key != 'general'}
+
+        self.keywords = {}  # keyword -> category
+        for category in self.categories:
+            for word in (category, *keywords[category]):
+                self.keywords.setdefault(word.lower(), category)
+        self.pattern = re.compile(rf"(?<![a-z])({trie_pattern(self.keywords)})[a-z]{{0,3}}(?![a-z])",
+                                  re.IGNORECASE)
+
+    def hits(self, text):
+        """Keyword hits per category in text"""
+        keywords = self.keywords
+        return Counter(keywords[word.lower()] for word in self.pattern.findall(text))
+
+    def score_joined(self, fields, weight, scores):
+        """Score many short fields with one scan of their concatenation"""
+        starts = []
+        offset = 0
+        for field in fields:
+            starts.append(offset)
+            offset += len(field or '') + 1
+        joined = '\n'.join(field or '' for field in fields)
+        for match in self.pattern.finditer(joined):
+            index = bisect_right(starts, match.start()) - 1
+            if scores[index] is None:
+                scores[index] = Counter()
+            scores[index][self.keywords[match.group(1).lower()]] += weight
+
+    def classify_many(self, names, paths=None, texts=None):
+        """Symbols for many documents in one call
+
+        names are file names, paths optional folder context (e.g. the
+        folder a file sits in) and texts optional extracted content.
+        """
+        names = list(names)
+        scores = [None] * len(names)  # Counter per document, created on its first hit
+        self.score_joined(names, FILENAME_WEIGHT, scores)
+        if paths is not None:
+            self.score_joined(list(paths), PATH_WEIGHT, scores)
+        if texts is not None:
+            for index, text in enumerate(texts):
+                if text:
+                    for category, count in self.hits(text).items():
+                        if scores[index] is None:
+                            scores[index] = Counter()
+                        scores[index][category] += CONTENT_WEIGHT * math.log2(1 + count)
+        return [self.decide(name, score) for name, score in zip(names, scores)]
+
+    def classify(self, name, path=None, text=None):
+        """Symbol for one document"""
+        return self.classify_many([name], None if path is None else [path],
+                                  None if text is None else [text])[0]
+
+    def decide(self, name, score):
+        """Highest scoring symbol; the extension is a prior and breaks ties"""
+        stem, dot, suffix = name.rpartition('.')
+        extension = self.extensions.get(suffix.lower()) if dot and stem else None
+        if not score:
+            return extension or self.default
+
+        by_symbol = Counter()
+        for category, value in score.items():
+            by_symbol[self.symbols[category]] += value
+        if extension:
+            by_symbol[extension] += EXTENSION_WEIGHT
+        return max(by_symbol, key=lambda symbol: (by_symbol[symbol], symbol == extension))
+
+
+def main():
+    """Classify files: python3 symbol_classifier.py <file>..."""
+    from advanced_processor import SYMBOL_CLASSIFIER, document_text
+
+    if len(sys.argv) < 2:
+        print("Usage: python3 symbol_classifier.py <file>...")
+        sys.exit(1)
+
+    paths = [Path(arg) for arg in sys.argv[1:]]
+    symbols = SYMBOL_CLASSIFIER.classify_many(
+        [p.name for p in paths], [p.parent.name for p in paths],
+        [head_text(document_text(p)) if p.is_file() else None for p in paths])
+    for path, symbol in zip(paths, symbols):
+        print(f"{symbol}  {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Port of Entry - Incoming Watcher Tests
+Files are reported once, only after they stop changing for the settle time
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from incoming_watcher import IncomingWatcher
+
+SETTLE = 0.3
+INTERVAL = 0.05
+
+
+class IncomingWatcherTests(unittest.TestCase):
+    use_inotify = False
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp(prefix='portofentry-watch-'))
+        self.ready = []
+        self.reported = threading.Event()
+        self.watcher = IncomingWatcher(self.root, self.on_ready, settle=SETTLE,
+                                       interval=INTERVAL, use_inotify=self.use_inotify)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def on_ready(self, paths):
+        self.ready.extend(Path(path).name for path in paths)
+        self.reported.set()
+
+    def wait_for_report(self, timeout=5.0):
+        self.assertTrue(self.reported.wait(timeout), "nothing was reported")
+        self.reported.clear()
+
+    def test_existing_files_are_picked_up(self):
+        (self.root / 'waiting.txt').write_text('ledger')
+        self.watcher.start()
+        self.wait_for_report()
+        self.assertEqual(self.ready, ['waiting.txt'])
+
+    def test_growing_file_waits_until_it_settles(self):
+        self.watcher.start()
+        path = self.root / 'growing.txt'
+        with open(path, 'w') as f:
+            written = time.monotonic()
+            for _ in range(6):
+                time.sleep(SETTLE / 3)
+                f.write('ledger\n')
+                f.flush()
+                os.fsync(f.fileno())
+            last_write = time.monotonic()
+
+        self.wait_for_report()
+        self.assertEqual(self.ready, ['growing.txt'])
+        self.assertGreater(time.monotonic() - last_write, SETTLE * 0.9)
+        self.assertGreater(last_write - written, SETTLE)
+
+    def test_files_are_reported_once_and_hidden_files_never(self):
+        self.watcher.start()
+        (self.root / '.upload-1234.part').write_text('partial')
+        (self.root / 'report.txt').write_text('ledger')
+        self.wait_for_report()
+
+        time.sleep(SETTLE * 3)
+        self.assertEqual(self.ready, ['report.txt'])
+
+    def test_replaced_file_is_reported_again(self):
+        self.watcher.start()
+        (self.root / 'report.txt').write_text('ledger')
+        self.wait_for_report()
+
+        (self.root / 'report.txt').unlink()
+        (self.root / 'report.txt').write_text('ledger, revised')
+        self.wait_for_report()
+        self.assertEqual(self.ready, ['report.txt', 'report.txt'])
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "inotify is Linux only")
+class InotifyWatcherTests(IncomingWatcherTests):
+    use_inotify = True
+
+    def test_inotify_backend_is_used(self):
+        self.watcher.start()
+        self.assertEqual(self.watcher.backend, 'inotify')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+"""
+Port of Entry - Ingest Tests
+Originals survive failed ingests and the blob store never shares a caller's inode
+"""
+
+import multiprocessing
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import advanced_processor as ap
+
+STORES = ('_catalog', '_package_archive', '_lexicon', '_blob_store', '_package_writer',
+          '_search_index', '_similarity_index', '_text_cache')
+TEXT = "budget ledger invoice revenue forecast for the quarterly fiscal review\n" * 40
+
+
+class IngestTestCase(unittest.TestCase):
+    """Points every store of advanced_processor at a temporary directory"""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp(prefix='portofentry-test-'))
+        self.saved = {name: value for name, value in vars(ap).items()
+                      if name in STORES or (isinstance(value, Path) and value != ap.BASE_DIR
+                                            and ap.BASE_DIR in value.parents)}
+        for name, value in self.saved.items():
+            setattr(ap, name, None if name in STORES else
+                    self.root / value.relative_to(ap.BASE_DIR))
+        self.incoming = self.root / 'incoming'
+        self.incoming.mkdir()
+        self.quiet = redirect_stdout(open(os.devnull, 'w'))
+        self.quiet.__enter__()
+
+    def tearDown(self):
+        self.quiet.__exit__(None, None, None)
+        for name, value in self.saved.items():
+            setattr(ap, name, value)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def incoming_file(self, name='report.txt', text=TEXT):
+        path = self.incoming / name
+        path.write_text(text)
+        return path
+
+    def packages(self):
+        return sorted(p.name for p in ap.COMPLETE_PACKAGES.iterdir())
+
+
+class FailedIngestTests(IngestTestCase):
+
+    def fail_after_store_original(self):
+        def nearest(*args, **kwargs):
+            raise RuntimeError("similarity unavailable")
+        ap.get_similarity_index().nearest = nearest
+
+    def test_moved_source_survives_failure(self):
+        source = self.incoming_file()
+        os.chmod(source, 0o640)
+        self.fail_after_store_original()
+
+        with self.assertRaises(RuntimeError):
+            ap.DocumentProcessor().process_document(source, 'move')
+
+        self.assertEqual(source.read_text(), TEXT)
+        self.assertEqual(stat.S_IMODE(source.stat().st_mode), 0o640)
+        self.assertEqual(self.packages(), [])
+        self.assertEqual(list(ap.STAGING.iterdir()), [])
+        self.assertEqual(ap.get_lexicon().summary()['occurrences'], 0)
+
+        # The orphaned blob is garbage; collecting it leaves the source alone
+        ap.get_blob_store().collect_garbage()
+        self.assertEqual(source.read_text(), TEXT)
+
+    def test_moved_duplicate_survives_failure(self):
+        ap.DocumentProcessor().process_document(self.incoming_file('first.txt'), 'copy')
+        source = self.incoming_file('second.txt')
+        self.fail_after_store_original()
+
+        with self.assertRaises(RuntimeError):
+            ap.DocumentProcessor().process_document(source, 'move')
+
+        self.assertEqual(source.read_text(), TEXT)
+        self.assertEqual(len(self.packages()), 1)
+
+    def test_moved_source_is_consumed_on_success(self):
+        source = self.incoming_file()
+        result = ap.DocumentProcessor().process_document(source, 'move')
+        self.assertTrue(result['success'])
+        self.assertFalse(source.exists())
+        self.assertEqual(self.packages(), [result['doc_id']])
+
+
+class TransferTests(IngestTestCase):
+
+    def test_kept_source_never_shares_the_blob(self):
+        for transfer in ('link', 'copy'):
+            source = self.incoming_file(f'{transfer}.txt', TEXT + transfer)
+            os.chmod(source, 0o644)
+            result = ap.DocumentProcessor().process_document(source, transfer)
+
+            blob = ap.get_blob_store().path(result['sha256'])
+            self.assertEqual(stat.S_IMODE(source.stat().st_mode), 0o644)
+            self.assertNotEqual(source.stat().st_ino, blob.stat().st_ino)
+
+            # Editing the source in place leaves the stored original alone
+            source.write_text("edited")
+            self.assertEqual(blob.read_text(), TEXT + transfer)
+
+
+class GroupCommitTests(IngestTestCase):
+
+    def test_failed_group_is_not_published(self):
+        sources = [self.incoming_file(f'{i}.txt', TEXT + str(i)) for i in range(3)]
+        with self.assertRaises(RuntimeError):
+            with ap.DocumentBatch(ap.get_package_writer(), ap.get_catalog(),
+                                  ap.get_lexicon()) as batch:
+                for source in sources:
+                    ap.DocumentProcessor().process_document(source, 'move', batch=batch)
+                raise RuntimeError("group failed")
+
+        self.assertEqual(self.packages(), [])
+        self.assertEqual(list(ap.STAGING.iterdir()), [])
+        self.assertEqual(ap.get_catalog().count(), 0)
+        self.assertEqual(ap.get_lexicon().summary()['occurrences'], 0)
+        for i, source in enumerate(sources):
+            self.assertEqual(source.read_text(), TEXT + str(i))
+
+    def test_group_words_reach_the_lexicon_on_commit(self):
+        sources = [self.incoming_file(f'{i}.txt', TEXT + str(i)) for i in range(3)]
+        ap.process_group(sources)
+        self.assertEqual(ap.get_lexicon().summary()['documents'], 3)
+
+    def test_identical_inputs_in_one_group_make_one_package(self):
+        first = self.incoming_file('first.txt')
+        second = self.incoming_file('second.txt')
+        results = dict(ap.process_group([first, second], skip_duplicates=True))
+
+        doc_id = results[str(first)]['doc_id']
+        self.assertEqual(self.packages(), [doc_id])
+        self.assertTrue(results[str(second)]['duplicate'])
+        self.assertEqual(results[str(second)]['duplicate_of'], doc_id)
+
+    def test_near_duplicates_in_one_group_are_similar(self):
+        first = self.incoming_file('first.txt')
+        second = self.incoming_file('second.txt', TEXT + "one more line\n")
+        results = dict(ap.process_group([first, second]))
+
+        self.assertEqual([m['doc_id'] for m in results[str(second)]['similar']],
+                         [results[str(first)]['doc_id']])
+
+
+class BatchGroupTests(unittest.TestCase):
+
+    def test_every_worker_gets_a_group(self):
+        paths = [f'{i}.txt' for i in range(10)]
+        groups = ap.batch_groups(paths, workers=4)
+        self.assertEqual(len(groups), 4)
+        self.assertEqual(sum(groups, []), paths)
+
+    def test_large_batches_use_full_groups(self):
+        paths = [f'{i}.txt' for i in range(1000)]
+        groups = ap.batch_groups(paths, workers=4)
+        self.assertEqual({len(group) for group in groups[:-1]}, {ap.GROUP_COMMIT_SIZE})
+        self.assertEqual(sum(groups, []), paths)
+
+
+class ConcurrencyTests(IngestTestCase):
+
+    def test_doc_ids_are_unique_and_time_sorted(self):
+        with ThreadPoolExecutor(8) as pool:
+            ids = list(pool.map(lambda _: ap.generate_doc_id(), range(2000)))
+        self.assertEqual(len(set(ids)), len(ids))
+
+        sequence = [ap.generate_doc_id() for _ in range(500)]
+        self.assertEqual(sequence, sorted(sequence))
+
+    def test_doc_ids_from_separate_processes_do_not_collide(self):
+        with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(ap.generate_doc_id) for _ in range(400)]
+            ids = [future.result() for future in futures]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_concurrent_documents_get_their_own_packages(self):
+        paths = [self.incoming_file(f'report_{i}.txt', TEXT + f"appendix {i}\n") for i in range(8)]
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(
+                lambda path: ap.DocumentProcessor().process_document(path, 'copy'), paths))
+
+        self.assertTrue(all(result['success'] for result in results))
+        doc_ids = sorted(result['doc_id'] for result in results)
+        self.assertEqual(len(set(doc_ids)), len(paths))
+        self.assertEqual(self.packages(), doc_ids)
+        self.assertEqual(ap.get_catalog().count(), len(paths))
+        for result, path in zip(results, paths):
+            metadata = ap.COMPLETE_PACKAGES / result['doc_id'] / f"{result['doc_id']}_METADATA.json"
+            self.assertIn(f'"original_filename": "{path.name}"', metadata.read_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
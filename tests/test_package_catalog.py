@@ -0,0 +1,111 @@
+"""
+Port of Entry - Package Catalog Tests
+Paging, filters, version tokens and repair of the SQLite package catalog
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from package_catalog import PackageCatalog
+
+
+def metadata(number, symbol='💰'):
+    return {
+        'document_id': f"DOC-20260101-000000-{number:06d}-0000",
+        'journey_id': f"JOURNEY-{number}",
+        'original_filename': f"report_{number}.txt",
+        'economic_symbol': symbol,
+        'processed_at': f"2026-01-{1 + number % 28:02d}T12:00:00",
+        'learned_words': ['ledger'],
+        'file_size': 100 + number,
+        'file_type': '.txt'
+    }
+
+
+class PackageCatalogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp(prefix='portofentry-catalog-'))
+        self.packages = self.root / 'complete_packages'
+        self.packages.mkdir()
+        self.catalog = PackageCatalog(self.root / 'catalog.sqlite3', self.packages)
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write_package(self, entry):
+        package_dir = self.packages / entry['document_id']
+        package_dir.mkdir()
+        (package_dir / f"{entry['document_id']}_METADATA.json").write_text(json.dumps(entry))
+
+    def test_pages_cover_every_package_once(self):
+        self.catalog.add_many([metadata(n) for n in range(25)])
+
+        seen = []
+        for offset in range(0, 25, 10):
+            page, total = self.catalog.query(limit=10, offset=offset)
+            self.assertEqual(total, 25)
+            seen += [entry['doc_id'] for entry in page]
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+        dates = [entry['processed_at'] for entry in self.catalog.query(limit=25)[0]]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_filters_and_counts(self):
+        self.catalog.add_many([metadata(n, '💰' if n % 2 else '⚖️') for n in range(10)])
+
+        page, total = self.catalog.query(symbol='💰')
+        self.assertEqual(total, 5)
+        self.assertEqual({entry['symbol'] for entry in page}, {'💰'})
+        self.assertEqual(self.catalog.count('💰'), 5)
+        self.assertEqual(self.catalog.count(), 10)
+
+        _, total = self.catalog.query(date_from='2026-01-03', date_to='2026-01-05')
+        self.assertEqual(total, 3)
+        with self.assertRaises(ValueError):
+            self.catalog.query(sort='journey_id; DROP TABLE packages')
+
+    def test_changes_since_a_version_token(self):
+        self.catalog.add_many([metadata(n) for n in range(3)])
+        token, _ = self.catalog.version()
+
+        self.catalog.add(metadata(3))
+        self.catalog.remove([metadata(0)['document_id']])
+        changed, removed = self.catalog.changes_since(token)
+        self.assertEqual([entry['doc_id'] for entry in changed], [metadata(3)['document_id']])
+        self.assertEqual(removed, [metadata(0)['document_id']])
+
+        token, _ = self.catalog.version()
+        self.assertEqual(self.catalog.changes_since(token), ([], []))
+        self.assertIsNone(self.catalog.changes_since('not-a-token'))
+
+    def test_rebuild_starts_a_new_generation(self):
+        for n in range(4):
+            self.write_package(metadata(n))
+        token, _ = self.catalog.version()
+
+        self.assertEqual(self.catalog.rebuild(), 4)
+        self.assertIsNone(self.catalog.changes_since(token))
+
+    def test_verify_finds_and_fixes_differences(self):
+        self.write_package(metadata(1))
+        self.catalog.add(metadata(2))  # Cataloged, but not on disk
+
+        report = self.catalog.verify()
+        self.assertFalse(report['ok'])
+        self.assertEqual(report['missing_from_catalog'], [metadata(1)['document_id']])
+        self.assertEqual(report['missing_on_disk'], [metadata(2)['document_id']])
+
+        self.catalog.verify(fix=True)
+        self.assertTrue(self.catalog.verify()['ok'])
+
+
+if __name__ == '__main__':
+    unittest.main()
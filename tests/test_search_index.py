@@ -0,0 +1,64 @@
+"""
+Port of Entry - Search Index Tests
+Merged segments rank exactly like the documents they were built from
+"""
+
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from search_index import SearchIndex
+
+WORDS = ('harbour', 'cargo', 'vessel', 'customs', 'manifest', 'ledger', 'quarter')
+
+
+def ranking(index, query='harbour cargo'):
+    results, total = index.search(query, limit=1000)
+    return sorted((result['doc_id'], result['score']) for result in results), total
+
+
+class SegmentMergeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp(prefix='portofentry-search-'))
+        rng = random.Random(7)
+        self.documents = [(f"doc{i:03d}", ' '.join(rng.choice(WORDS)
+                                                   for _ in range(rng.randint(3, 40))))
+                          for i in range(60)]
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def build(self, name, every=None, factor=3):
+        index = SearchIndex(self.root / name)
+        for number, (doc_id, text) in enumerate(self.documents, 1):
+            index.add_document(doc_id, [text])
+            if every and number % every == 0:
+                index.compact(factor)
+        index.compact(factor)
+        index.refresh()
+        return index
+
+    def test_compaction_merges_segments_by_tier(self):
+        index = self.build('tiered', every=3)
+        # 20 compactions of 3 documents would otherwise leave 20 segments
+        self.assertLess(len(index.read_manifest()['segments']), 6)
+        self.assertEqual(index.document_count(), len(self.documents))
+        self.assertEqual(ranking(index), ranking(self.build('single')))
+
+    def test_merge_everything_into_one_segment(self):
+        index = self.build('tiered', every=3, factor=100)
+        before = ranking(index)
+        self.assertEqual(len(index.read_manifest()['segments']), 20)
+        self.assertEqual(index.merge(None), 19)
+        self.assertEqual(index.read_manifest()['segments'], ['seg-000021'])
+        self.assertEqual(ranking(index), before)
+        self.assertEqual(sorted(p.name for p in index.directory.glob('seg-*')), ['seg-000021'])
+
+
+if __name__ == '__main__':
+    unittest.main()
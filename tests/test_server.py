@@ -0,0 +1,360 @@
+"""
+Port of Entry - Server Tests
+The HTTP API on an ephemeral port, with every store in a temporary directory
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from test_ingest import TEXT, IngestTestCase, ap
+
+# The server creates its incoming directory on import
+os.environ.setdefault('PORTOFENTRY_INCOMING', tempfile.mkdtemp(prefix='portofentry-incoming-'))
+import port_server_v0 as ps
+from artifact_cache import ArtifactCache
+from change_tracker import ChangeTracker
+from event_stream import EventBus
+from incoming_snapshot import IncomingSnapshot
+
+SERVER_STATE = ('INCOMING', 'INTERNAL', 'COMPLETE_PACKAGES', 'JOBS_DB', 'UPLOAD_MAX_BYTES',
+                'incoming_snapshot', 'artifact_cache', 'event_bus', 'stats_tracker',
+                'documents_tracker')
+
+
+class ServerTestCase(IngestTestCase):
+    """Serves PortOfEntryServer from a background thread"""
+
+    def setUp(self):
+        super().setUp()
+        self.saved_server = {name: getattr(ps, name) for name in SERVER_STATE}
+        self.saved_stats = dict(ps.stats)
+        ps.INCOMING = self.incoming
+        ps.INTERNAL = ap.INTERNAL
+        ps.COMPLETE_PACKAGES = ap.COMPLETE_PACKAGES
+        ps.JOBS_DB = ap.INTERNAL / 'jobs.sqlite3'
+        ps.incoming_snapshot = IncomingSnapshot(self.incoming, ps.describe_documents)
+        ps.artifact_cache = ArtifactCache()
+        ps.event_bus = EventBus()
+        ps.stats_tracker = ChangeTracker()
+        ps.documents_tracker = ChangeTracker()
+
+        self.server = ps.PooledHTTPServer(('127.0.0.1', 0), ps.PortOfEntryServer, workers=4)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        for name, value in self.saved_server.items():
+            setattr(ps, name, value)
+        ps.stats.update(self.saved_stats)
+        super().tearDown()
+
+    def connect(self):
+        return http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=10)
+
+    def request(self, path, method='GET', body=None, headers=None):
+        """Return (response, body bytes)"""
+        connection = self.connect()
+        try:
+            connection.request(method, path, body, headers or {})
+            response = connection.getresponse()
+            return response, response.read()
+        finally:
+            connection.close()
+
+    def get_json(self, path, headers=None):
+        response, body = self.request(path, headers=headers)
+        return response, json.loads(body) if body else None
+
+    def ingest(self, name='report.txt', text=None):
+        """Package one document and return its doc_id"""
+        path = self.incoming_file(name, text or f"ledger and invoice for {name}\n" * 40)
+        result = ap.DocumentProcessor().process_document(path, 'copy')
+        self.assertTrue(result['success'])
+        return result['doc_id']
+
+
+class ConditionalGetTests(ServerTestCase):
+
+    def test_unchanged_listing_is_not_modified(self):
+        self.ingest()
+        response, data = self.get_json('/api/complete')
+        self.assertEqual(response.status, 200)
+        etag = response.getheader('ETag')
+        self.assertTrue(etag)
+
+        response, body = self.request('/api/complete', headers={'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(response.getheader('ETag'), etag)
+
+    def test_new_package_changes_the_etag(self):
+        response, _ = self.get_json('/api/complete')
+        etag = response.getheader('ETag')
+
+        doc_id = self.ingest()
+        response, data = self.get_json('/api/complete', headers={'If-None-Match': etag})
+        self.assertEqual(response.status, 200)
+        self.assertNotEqual(response.getheader('ETag'), etag)
+        self.assertEqual([package['doc_id'] for package in data['packages']], [doc_id])
+
+    def test_each_query_gets_its_own_etag(self):
+        self.ingest()
+        first, _ = self.get_json('/api/complete?limit=1')
+        second, _ = self.get_json('/api/complete?limit=2')
+        self.assertNotEqual(first.getheader('ETag'), second.getheader('ETag'))
+
+        response, _ = self.request('/api/complete?limit=2',
+                                   headers={'If-None-Match': first.getheader('ETag')})
+        self.assertEqual(response.status, 200)
+
+    def test_since_returns_only_changes(self):
+        self.ingest('first.txt')
+        _, data = self.get_json('/api/complete')
+        version = data['version']
+
+        doc_id = self.ingest('second.txt')
+        _, delta = self.get_json(f'/api/complete?since={version}')
+        self.assertTrue(delta['delta'])
+        self.assertEqual([package['doc_id'] for package in delta['packages']], [doc_id])
+        self.assertEqual(delta['removed'], [])
+
+        _, full = self.get_json('/api/complete?since=stale.1')
+        self.assertNotIn('delta', full)
+        self.assertEqual(full['total'], 2)
+
+    def test_stats_are_not_modified_until_they_change(self):
+        response, _ = self.get_json('/api/stats')
+        etag = response.getheader('ETag')
+        response, _ = self.request('/api/stats', headers={'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+
+
+class RangeTests(ServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.text = ''.join(f"line {n:04d} of the quarterly ledger\n" for n in range(400))
+        self.doc_id = self.ingest('ledger.txt', self.text)
+        self.url = f'/api/download/{self.doc_id}/original'
+        self.data = self.text.encode()
+
+    def test_whole_file(self):
+        response, body = self.request(self.url)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Accept-Ranges'), 'bytes')
+        self.assertEqual(body, self.data)
+
+    def test_ranges(self):
+        size = len(self.data)
+        for header, start, end in (('bytes=0-99', 0, 99), ('bytes=100-', 100, size - 1),
+                                   ('bytes=-50', size - 50, size - 1),
+                                   ('bytes=10-999999', 10, size - 1)):
+            response, body = self.request(self.url, headers={'Range': header})
+            self.assertEqual(response.status, 206, header)
+            self.assertEqual(response.getheader('Content-Range'), f'bytes {start}-{end}/{size}')
+            self.assertEqual(body, self.data[start:end + 1], header)
+
+    def test_unsatisfiable_range(self):
+        size = len(self.data)
+        response, body = self.request(self.url, headers={'Range': f'bytes={size}-'})
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.getheader('Content-Range'), f'bytes */{size}')
+        self.assertEqual(body, b'')
+
+    def test_multiple_ranges_send_everything(self):
+        response, body = self.request(self.url, headers={'Range': 'bytes=0-1,5-6'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.data)
+
+    def test_head_and_conditional_download(self):
+        response, body = self.request(self.url, method='HEAD')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(int(response.getheader('Content-Length')), len(self.data))
+        self.assertEqual(body, b'')
+
+        response, _ = self.request(self.url, headers={'If-None-Match': response.getheader('ETag'),
+                                                      'Range': 'bytes=0-9'})
+        self.assertEqual(response.status, 304)
+
+    def test_ranges_of_archived_files(self):
+        response, metadata = self.request(f'/api/download/{self.doc_id}/metadata')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(ap.get_package_archive().migrate(ap.COMPLETE_PACKAGES,
+                                                          ap.get_blob_store()), 1)
+        self.assertEqual(self.packages(), [])
+
+        for url, data in ((self.url, self.data),
+                          (f'/api/download/{self.doc_id}/metadata', metadata)):
+            response, body = self.request(url, headers={'Range': 'bytes=5-24'})
+            self.assertEqual(response.status, 206, url)
+            self.assertEqual(body, data[5:25], url)
+
+    def test_unknown_package_is_not_found(self):
+        response, _ = self.request('/api/download/DOC-missing/original')
+        self.assertEqual(response.status, 404)
+        response, _ = self.request(f'/api/download/{self.doc_id}/secrets')
+        self.assertEqual(response.status, 404)
+
+
+class UploadTests(ServerTestCase):
+
+    def upload(self, path, body, headers=None):
+        response, data = self.request(path, 'POST', body, headers)
+        return response.status, json.loads(data)
+
+    def visible_files(self):
+        return sorted(p.name for p in self.incoming.iterdir())
+
+    def test_raw_upload_is_hashed_and_saved(self):
+        body = TEXT.encode() * 50
+        status, data = self.upload('/api/upload?name=report.txt', body)
+        self.assertEqual(status, 201)
+        saved = data['files'][0]
+        self.assertEqual(saved['name'], 'report.txt')
+        self.assertEqual(saved['size'], len(body))
+        self.assertEqual(saved['sha256'], hashlib.sha256(body).hexdigest())
+        self.assertEqual((self.incoming / 'report.txt').read_bytes(), body)
+
+    def test_chunked_upload(self):
+        blocks = [b'ledger ' * 1000, b'invoice ' * 3000, b'end\n']
+        status, data = self.upload('/api/upload', iter(blocks), {'X-Filename': 'chunked.txt'})
+        self.assertEqual(status, 201)
+        self.assertEqual((self.incoming / 'chunked.txt').read_bytes(), b''.join(blocks))
+
+    def test_multipart_upload(self):
+        boundary = 'portofentryboundary'
+        body = (f"--{boundary}\r\n"
+                'Content-Disposition: form-data; name="note"\r\n\r\n'
+                f"quarterly\r\n--{boundary}\r\n"
+                'Content-Disposition: form-data; name="file"; filename="a.txt"\r\n'
+                'Content-Type: text/plain\r\n\r\n'
+                f"first file\r\n--{boundary}\r\n"
+                'Content-Disposition: form-data; name="file"; filename="b.md"\r\n\r\n'
+                f"# second\r\n--{boundary}--\r\n").encode()
+        status, data = self.upload('/api/upload', body,
+                                   {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        self.assertEqual(status, 201)
+        self.assertEqual(data['count'], 2)
+        self.assertEqual((self.incoming / 'a.txt').read_text(), 'first file')
+        self.assertEqual((self.incoming / 'b.md').read_text(), '# second')
+
+    def test_existing_files_are_never_replaced(self):
+        self.upload('/api/upload?name=report.txt', b'first')
+        status, data = self.upload('/api/upload?name=report.txt', b'second')
+        self.assertEqual(status, 201)
+        self.assertNotEqual(data['files'][0]['name'], 'report.txt')
+        self.assertEqual((self.incoming / 'report.txt').read_bytes(), b'first')
+
+    def test_names_cannot_leave_incoming(self):
+        status, data = self.upload('/api/upload?name=../../escape.txt', b'ledger')
+        self.assertEqual(status, 201)
+        self.assertEqual(data['files'][0]['name'], 'escape.txt')
+        self.assertEqual(self.visible_files(), ['escape.txt'])
+
+    def test_rejected_uploads_leave_nothing_behind(self):
+        status, _ = self.upload('/api/upload', b'ledger')
+        self.assertEqual(status, 400)
+
+        ps.UPLOAD_MAX_BYTES = 1000
+        status, _ = self.upload('/api/upload?name=big.txt', b'x' * 5000)
+        self.assertEqual(status, 413)
+        status, _ = self.upload('/api/upload?name=big.txt', iter([b'x' * 600, b'x' * 600]))
+        self.assertEqual(status, 413)
+        self.assertEqual(list(self.incoming.iterdir()), [])
+
+
+class EventStreamTests(ServerTestCase):
+
+    def tearDown(self):
+        # Streams end within a second of losing their subscription
+        for subscriber in list(ps.event_bus.subscribers):
+            ps.event_bus.unsubscribe(subscriber)
+        super().tearDown()
+
+    def open_stream(self, headers=None):
+        connection = self.connect()
+        connection.request('GET', '/api/events', headers=headers or {})
+        response = connection.getresponse()
+        self.addCleanup(connection.close)
+        return response
+
+    def read_event(self, response):
+        """Next event as {id, event, data}, skipping retry hints and keepalives"""
+        fields = {}
+        while True:
+            line = response.fp.readline().decode().rstrip('\n')
+            if not line:
+                if 'event' in fields:
+                    fields['data'] = json.loads(fields['data'])
+                    return fields
+                fields = {}
+                continue
+            name, _, value = line.partition(': ')
+            fields[name] = value
+
+    def wait_for_subscribers(self, count):
+        for _ in range(100):
+            if len(ps.event_bus.subscribers) >= count:
+                return
+            threading.Event().wait(0.02)
+        self.fail("stream did not subscribe")
+
+    def test_stage_events_and_new_packages_are_streamed(self):
+        response = self.open_stream()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Content-Type'), 'text/event-stream')
+        self.wait_for_subscribers(1)
+
+        ap.set_stage_listener(ps.publish_event)
+        self.addCleanup(ap.set_stage_listener, None)
+        path = self.incoming_file()
+        ps.finish_ingest(path, ap.DocumentProcessor().process_document(path, 'copy'))
+
+        events = []
+        while not events or events[-1]['event'] != 'stats':
+            events.append(self.read_event(response))
+        stages = [event['data']['stage'] for event in events if event['event'] == 'stage']
+        self.assertEqual(stages, ap.STAGES)
+        package = [event for event in events if event['event'] == 'package']
+        self.assertEqual(len(package), 1)
+        self.assertEqual(package[0]['data']['filename'], path.name)
+        ids = [int(event['id']) for event in events]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_reconnect_replays_missed_events(self):
+        for number in range(3):
+            ps.event_bus.publish('stats', {'number': number})
+        response = self.open_stream({'Last-Event-ID': '1'})
+        self.assertEqual([self.read_event(response)['data']['number'] for _ in range(2)], [1, 2])
+
+    def test_subscribers_are_capped(self):
+        ps.event_bus.max_subscribers = 1
+        self.assertEqual(self.open_stream().status, 200)
+        self.wait_for_subscribers(1)
+        response, data = self.get_json('/api/events')
+        self.assertEqual(response.status, 503)
+        self.assertFalse(data['success'])
+
+    def test_delta_reports_the_catalog_total(self):
+        self.ingest('first.txt')
+        _, data = self.get_json('/api/complete')
+        self.ingest('second.txt')
+        _, delta = self.get_json(f"/api/complete?since={data['version']}")
+        self.assertEqual(delta['count'], 1)
+        self.assertEqual(delta['total'], 2)
+        self.assertNotEqual(delta['version'], data['version'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Port of Entry - Upload Streaming
+Bounded-memory request body readers that stream uploads into the incoming directory
+"""
+
+import hashlib
+import os
+import tempfile
+from email.message import Message
+from pathlib import Path
+
+BLOCK_SIZE = 64 * 1024
+MAX_PART_HEADER = 16 * 1024
+MAX_FIELD_SIZE = 64 * 1024
+
+
+class UploadError(ValueError):
+    """Malformed or rejected upload"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def iter_body(rfile, headers, block_size=BLOCK_SIZE):
+    """Yield the request body in blocks, for Content-Length or chunked bodies"""
+    if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+        while True:
+            line = rfile.readline(1024)
+            try:
+                size = int(line.split(b';')[0].strip(), 16)
+            except ValueError:
+                raise UploadError("Malformed chunked body")
+
+            if size == 0:
+                # Skip trailers up to the blank line
+                while rfile.readline(1024) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+
+            while size > 0:
+                block = rfile.read(min(size, block_size))
+                if not block:
+                    raise UploadError("Truncated chunked body")
+                size -= len(block)
+                yield block
+            rfile.readline(1024)  # CRLF after the chunk
+    else:
+        remaining = int(headers.get('Content-Length') or 0)
+        while remaining > 0:
+            block = rfile.read(min(remaining, block_size))
+            if not block:
+                raise UploadError("Truncated request body")
+            remaining -= len(block)
+            yield block
+
+
+def iter_multipart(blocks, boundary):
+    """Yield ('part', headers) followed by ('data', bytes) events for each part"""
+    separator = b'\r\n--' + boundary
+    blocks = iter(blocks)
+    buffer = b'\r\n'  # Lets the first boundary match the separator too
+
+    def fill():
+        nonlocal buffer
+        block = next(blocks, b'')
+        buffer += block
+        return bool(block)
+
+    # Skip the preamble
+    while True:
+        index = buffer.find(separator)
+        if index >= 0:
+            buffer = buffer[index + len(separator):]
+            break
+        buffer = buffer[-len(separator):]
+        if not fill():
+            raise UploadError("Malformed multipart body")
+
+    while True:
+        # After a boundary, '--' closes the body and anything else starts a part
+        while len(buffer) < 2:
+            if not fill():
+                raise UploadError("Malformed multipart body")
+        if buffer.startswith(b'--'):
+            return
+
+        while b'\r\n\r\n' not in buffer:
+            if len(buffer) > MAX_PART_HEADER or not fill():
+                raise UploadError("Malformed multipart part headers")
+        raw_headers, buffer = buffer.split(b'\r\n\r\n', 1)
+
+        headers = {}
+        for line in raw_headers.decode('utf-8', 'replace').split('\r\n'):
+            name, colon, value = line.partition(':')
+            if colon:
+                headers[name.strip().lower()] = value.strip()
+        yield 'part', headers
+
+        # Stream the body, holding back enough bytes to spot a split separator
+        while True:
+            index = buffer.find(separator)
+            if index >= 0:
+                if index:
+                    yield 'data', buffer[:index]
+                buffer = buffer[index + len(separator):]
+                break
+
+            keep = len(separator) - 1
+            if len(buffer) > keep:
+                yield 'data', buffer[:-keep]
+                buffer = buffer[-keep:]
+            if not fill():
+                raise UploadError("Malformed multipart body")
+
+
+def safe_filename(name):
+    """Reduce a client-supplied name to a plain, visible file name"""
+    name = Path(str(name).replace('\\', '/')).name.lstrip('.').strip()
+    if not name:
+        raise UploadError("Missing file name")
+    return name
+
+
+class UploadWriter:
+    """Hidden temp file in the target directory, hashed while it is written"""
+
+    def __init__(self, directory, max_bytes=0):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        fd, temp_path = tempfile.mkstemp(prefix='.upload-', suffix='.part', dir=str(self.directory))
+        self.file = os.fdopen(fd, 'wb')
+        self.temp_path = Path(temp_path)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        """Append a block"""
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise UploadError(f"Upload exceeds {self.max_bytes} bytes", status=413)
+        self.sha256.update(data)
+        self.file.write(data)
+
+    def commit(self, name):
+        """Make the upload visible under name (never overwriting) and return its info"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        os.fchmod(self.file.fileno(), 0o644)  # mkstemp files start out 0600
+        self.file.close()
+
+        name = safe_filename(name)
+        stem, suffix = os.path.splitext(name)
+        digest = self.sha256.hexdigest()
+        candidates = [name, f"{stem}-{digest[:8]}{suffix}"]
+        candidates += [f"{stem}-{digest[:8]}-{n}{suffix}" for n in range(1, 100)]
+
+        for candidate in candidates:
+            target = self.directory / candidate
+            try:
+                # link() fails instead of replacing an existing file
+                os.link(self.temp_path, target)
+            except FileExistsError:
+                continue
+            except OSError:
+                if target.exists():
+                    continue
+                os.replace(self.temp_path, target)
+                break
+            self.temp_path.unlink()
+            break
+        else:
+            self.abort()
+            raise UploadError("Could not find a free file name", status=409)
+
+        return {
+            'name': target.name,
+            'path': str(target),
+            'size': self.size,
+            'sha256': digest
+        }
+
+    def abort(self):
+        """Discard the temp file"""
+        if not self.file.closed:
+            self.file.close()
+        try:
+            self.temp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def save_raw(blocks, name, directory, max_bytes=0):
+    """Stream a raw request body into directory as name"""
+    name = safe_filename(name)
+    writer = UploadWriter(directory, max_bytes)
+    try:
+        for block in blocks:
+            writer.write(block)
+        return writer.commit(name)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def save_multipart(blocks, boundary, directory, max_bytes=0):
+    """Stream every file part of a multipart body into directory
+
+    Returns (saved files, form fields).
+    """
+    saved = []
+    fields = {}
+    writer = None
+    filename = None
+    field_name = None
+    field_value = b''
+
+    def finish_part():
+        nonlocal writer, field_name, field_value
+        if writer is not None:
+            saved.append(writer.commit(filename))
+            writer = None
+        elif field_name is not None:
+            fields[field_name] = field_value.decode('utf-8', 'replace')
+        field_name = None
+        field_value = b''
+
+    try:
+        for kind, value in iter_multipart(blocks, boundary):
+            if kind == 'part':
+                finish_part()
+                disposition = Message()
+                disposition['content-disposition'] = value.get('content-disposition', '')
+                filename = disposition.get_filename()
+                if filename:
+                    writer = UploadWriter(directory, max_bytes)
+                else:
+                    field_name = disposition.get_param('name', header='content-disposition')
+            elif writer is not None:
+                writer.write(value)
+            elif field_name is not None:
+                field_value += value
+                if len(field_value) > MAX_FIELD_SIZE:
+                    raise UploadError("Form field too large", status=413)
+        finish_part()
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    return saved, fields
+
+
+def multipart_boundary(content_type):
+    """Return the boundary of a multipart/form-data Content-Type, as bytes"""
+    message = Message()
+    message['content-type'] = content_type
+    boundary = message.get_param('boundary')
+    if not boundary:
+        raise UploadError("Missing multipart boundary")
+    return boundary.encode('latin-1')